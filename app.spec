@@ -1,20 +1,30 @@
 # -*- mode: python ; coding: utf-8 -*-
+from PyInstaller.utils.hooks import collect_data_files
 
 block_cipher = None
 
 a = Analysis(
-    ['full_app_code.py'],  # Replace with your main script file name
+    ['app_code.py'],  # The main script
     pathex=['.'],  # Path to search for imports
     binaries=[],
-    datas=[
-        ('path_to_qtawesome_fonts', 'qtawesome/fonts'),  # Add any additional data files or directories needed
-    ],
+    datas=collect_data_files('qtawesome'),  # The icon fonts QtAwesome loads at runtime
     hiddenimports=[
-        'pymysql', 'qtawesome'  # Add hidden imports if needed
+        # Modules loaded by name at runtime, which the analysis cannot see: the SQLAlchemy dialects and
+        # database drivers picked from the connection fields, and the readers pandas picks for .xls files
+        'sqlalchemy.dialects.mysql.pymysql', 'pymysql',
+        'sqlalchemy.dialects.postgresql.psycopg2',
+        'sqlalchemy.dialects.sqlite.pysqlite',
+        'xlrd',
     ],
     hookspath=[],
     runtime_hooks=[],
-    excludes=[],
+    excludes=[
+        # Every module left out is one less to unpack and scan on start, which matters on slow disks
+        'pandas.tests', 'pandas.io.formats.style', 'pandas.io.clipboard', 'jinja2',
+        'sqlalchemy.testing', 'sqlalchemy.ext.asyncio', 'sqlalchemy.ext.mypy',
+        'numpy.f2py', 'numpy.distutils', 'numpy.tests', 'pyarrow.tests',
+        'matplotlib', 'scipy', 'IPython', 'tkinter', 'pytest',
+    ],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -32,7 +42,7 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=False,  # UPX-packed libraries are decompressed on every start, which costs more than it saves on disk
     upx_exclude=[],
     runtime_tmpdir=None,
     console=False  # Change to True if you want a console window to be shown
@@ -44,7 +54,7 @@ coll = COLLECT(
     a.zipfiles,
     a.datas,
     strip=False,
-    upx=True,
+    upx=False,
     upx_exclude=[],
     name='DatabaseApp'  # Name of the final folder containing all files
 )
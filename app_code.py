@@ -1,17 +1,19 @@
 import sys  # Import the sys module to interact with the system
 import os  # Import the os module for interacting with the operating system
 import logging  # Import the logging module for logging errors and messages
-import pymysql  # Import pymysql for MySQL database connectivity
+import multiprocessing  # Import multiprocessing for the worker processes of out-of-core deduplication
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QLabel,
-    QSpacerItem, QSizePolicy, QMessageBox, QFileDialog, QStackedWidget, QDesktopWidget
+    QSpacerItem, QSizePolicy, QMessageBox, QFileDialog, QStackedWidget, QDesktopWidget, QComboBox, QDialog,
+    QTableView, QHeaderView
 )  # Import necessary PyQt5 widgets
 from PyQt5.QtGui import QFont, QColor  # Import QFont for setting fonts and QColor for colors
-from PyQt5.QtCore import Qt  # Import Qt for alignment and other constants
+from PyQt5.QtCore import Qt, QThreadPool, QTimer  # Import Qt for alignment and other constants, QThreadPool for background work
 from PyQt5.QtWidgets import QGraphicsDropShadowEffect  # Import QGraphicsDropShadowEffect for shadow effects
-import sqlalchemy as sal  # Import SQLAlchemy for database interactions
-import pandas as pd  # Import pandas for data manipulation
-import qtawesome as qta  # Import QtAwesome for icons
+from startup import Prewarmer, probing, report_milestone  # Import the background prewarm of the heavy modules
+
+# The database modules load pandas and SQLAlchemy, which take most of the startup time, so they are imported
+# where they are used; the Prewarmer loads them in the background as soon as the login page has been painted
 
 # Setup logging
 logging.basicConfig(filename='app.log', level=logging.ERROR, format='%(asctime)s %(levelname)s %(message)s')
@@ -23,9 +25,19 @@ class DatabaseApp(QWidget):
         Constructor method that initializes the DatabaseApp class.
         """
         super().__init__()
+        self.painted = False  # Whether the window has been painted for the first time
+        self.pending_icons = []  # (button, icon name) pairs waiting for the first paint
+        self.prewarmer = Prewarmer(self)  # Loads the heavy modules in the background after the first paint
+        self.prewarmer.finished.connect(self.prewarmed)
         self.initUI()
-        self.conn = None  # Initialize the database connection as None
+        self.engine = None  # Initialize the pooled database engine as None
         self.table_name = None  # Initialize the table name as None
+        self.thread_pool = QThreadPool.globalInstance()  # Worker pool for database operations
+        self.current_task = None  # The background operation currently running, if any
+        self.pipeline_queue = []  # Transform names queued for the cleaning pipeline
+        self.preview_model = None  # The model of the table shown on the preview page, if any
+        self.metadata = None  # The cached table list and columns of the connected database
+        self.metadata_tasks = {}  # Background reads of table metadata, by metadata cache and table name
 
     def initUI(self):
         """
@@ -39,15 +51,14 @@ class DatabaseApp(QWidget):
         # Create a QStackedWidget to hold multiple pages
         self.stacked_widget = QStackedWidget(self)
 
-        # Create the first and second pages
+        # Create the first page; the second and third pages need the heavy modules and are built by build_pages
         self.page1 = QWidget()
-        self.page2 = QWidget()
+        self.page2 = None
+        self.page3 = None
         self.create_page1()  # Create the UI for the first page
-        self.create_page2()  # Create the UI for the second page
 
-        # Add the pages to the stacked widget
+        # Add the first page to the stacked widget
         self.stacked_widget.addWidget(self.page1)
-        self.stacked_widget.addWidget(self.page2)
 
         # Set the first page as the initial page
         self.stacked_widget.setCurrentIndex(0)
@@ -58,6 +69,61 @@ class DatabaseApp(QWidget):
         self.setLayout(layout)
         self.show()  # Explicitly show the window
 
+    def build_pages(self):
+        """
+        Create the second and third pages and add them to the stacked widget, unless that was done already.
+        """
+        if self.page2 is not None:
+            return
+        self.page2 = QWidget()
+        self.page3 = QWidget()
+        self.create_page2()  # Create the UI for the second page
+        self.create_page3()  # Create the UI for the third page
+        self.stacked_widget.addWidget(self.page2)
+        self.stacked_widget.addWidget(self.page3)
+
+    def paintEvent(self, event):
+        """
+        Paint the window, and once it has been painted for the first time, carry on with the deferred startup work.
+        """
+        super().paintEvent(event)
+        if not self.painted:
+            self.painted = True
+            # Let the first frame reach the screen before doing anything else
+            QTimer.singleShot(0, self.first_painted)
+
+    def first_painted(self):
+        """
+        Load the button icons and start loading pandas, SQLAlchemy and the database modules in the background.
+        """
+        report_milestone('first_paint')
+        for button, icon_name in self.pending_icons:
+            self.set_icon(button, icon_name)
+        self.pending_icons = []
+        self.prewarmer.start()
+
+    def prewarmed(self):
+        """
+        Build the remaining pages once the heavy modules are loaded, and load the database driver entered so far.
+        """
+        self.build_pages()
+        report_milestone('ready')
+        if probing():
+            QApplication.quit()
+            return
+        self.prewarm_driver()
+        # From now on, load the driver whenever the connection fields name a new one
+        self.dialect_edit.editingFinished.connect(self.prewarm_driver)
+        self.driver_edit.editingFinished.connect(self.prewarm_driver)
+
+    def prewarm_driver(self):
+        """
+        Import the DBAPI module for the dialect and driver entered on the first page in the background.
+        """
+        dialect = self.dialect_edit.text().strip()
+        if dialect:
+            self.prewarmer.load_driver(dialect, self.driver_edit.text().strip())
+
     def center_window(self):
         """
         Center the application window on the screen.
@@ -110,9 +176,20 @@ class DatabaseApp(QWidget):
         button.setStyleSheet(button_style)
         button.setGraphicsEffect(self.create_shadow_effect(blur_radius=15, offset=(3, 3)))
         if icon_name:
-            button.setIcon(qta.icon(icon_name, color='white'))
+            self.set_icon(button, icon_name)
         return button
 
+    def set_icon(self, button, icon_name):
+        """
+        Give a button a white QtAwesome icon, or queue it until the window has been painted for the first time.
+        """
+        if not self.painted:
+            self.pending_icons.append((button, icon_name))
+            return
+        import qtawesome as qta  # Loading the icon fonts is left until after the first paint
+
+        button.setIcon(qta.icon(icon_name, color='white'))
+
     def create_page1(self):
         """
         Create the first page for database connection.
@@ -185,18 +262,54 @@ class DatabaseApp(QWidget):
         """
         Create the second page for other database interactions.
         """
+        from excel_import import DEFAULT_CHUNK_SIZE
+        from pipeline import TRANSFORMS
+
+        # Create the table picker, filled from the metadata cache
+        self.table_combo = QComboBox()
+        self.table_combo.setFont(QFont('Arial', 14))
+        self.table_combo.currentIndexChanged.connect(self.table_selected)
+        self.refresh_tables_button = self.create_styled_button('Refresh', self.refresh_tables, 'fa5s.redo')
+        self.table_info_label = QLabel('')
+        self.table_info_label.setFont(QFont('Arial', 12))
+        self.table_info_label.setStyleSheet("color: #1565C0;")
+        self.table_info_label.setWordWrap(True)
+
         # Create buttons for various database operations
         self.import_button = self.create_styled_button('Import Excel File', self.import_excel, 'fa5s.file-excel')
+        self.chunk_size_edit = self.create_input_field(f'Import Batch Size (default {DEFAULT_CHUNK_SIZE})')
+        self.incremental_button = self.create_styled_button('Incremental Import', self.import_excel_incremental, 'fa5s.sync-alt')
+        self.key_columns_edit = self.create_input_field('Key Columns for Incremental Import (comma-separated, optional)')
         self.lowercase_button = self.create_styled_button('Lowercase Headers', self.lowercase_headers, 'fa5s.text-height')
         self.replace_spaces_button = self.create_styled_button('Replace Spaces in Headers', self.replace_spaces_in_headers, 'fa5s.text-width')
         self.drop_na_button = self.create_styled_button('Drop NA', self.drop_na_values, 'fa5s.times-circle')
         self.remove_duplicates_button = self.create_styled_button('Remove Duplicates', self.remove_duplicates, 'fa5s.clone')
+        self.preview_button = self.create_styled_button('Preview Table', self.preview_table, 'fa5s.table')
         self.disconnect_button = self.create_styled_button('Disconnect from Database', self.disconnect_from_database, 'fa5s.sign-out-alt')
+        self.cancel_button = self.create_styled_button('Cancel Operation', self.cancel_task, 'fa5s.stop-circle')
+        self.cancel_button.setEnabled(False)
+
+        # Create the pipeline controls for queueing several transforms and running them in one pass
+        self.pipeline_combo = QComboBox()
+        self.pipeline_combo.setFont(QFont('Arial', 14))
+        for name, label in TRANSFORMS.items():
+            self.pipeline_combo.addItem(label, name)
+        self.queue_button = self.create_styled_button('Queue', self.queue_transform, 'fa5s.plus')
+        self.run_pipeline_button = self.create_styled_button('Run Pipeline', self.run_queued_pipeline, 'fa5s.play')
+        self.clear_pipeline_button = self.create_styled_button('Clear', self.clear_pipeline, 'fa5s.trash')
+        self.plan_label = QLabel('Pipeline: empty')
+        self.plan_label.setFont(QFont('Arial', 12))
+        self.plan_label.setStyleSheet("color: #1565C0;")
+        self.plan_label.setWordWrap(True)
 
         # Create section labels
         section_font = QFont('Verdana', 16, QFont.Bold)
         section_style = "color: #1565C0;"
 
+        table_label = QLabel('Table 📋')
+        table_label.setFont(section_font)
+        table_label.setStyleSheet(section_style)
+
         import_data_label = QLabel('Import Data 📥')
         import_data_label.setFont(section_font)
         import_data_label.setStyleSheet(section_style)
@@ -209,11 +322,16 @@ class DatabaseApp(QWidget):
         data_cleaning_label.setFont(section_font)
         data_cleaning_label.setStyleSheet(section_style)
 
+        pipeline_label = QLabel('Cleaning Pipeline 🔗')
+        pipeline_label.setFont(section_font)
+        pipeline_label.setStyleSheet(section_style)
+
         # Create a status label
         self.status_label = QLabel('Status: Ready')
         self.status_label.setFont(QFont('Arial', 16, QFont.Bold))
         self.status_label.setStyleSheet("color: #1565C0;")
         self.status_label.setAlignment(Qt.AlignCenter)
+        self.status_label.setWordWrap(True)
 
         # Set up the layout for the second page
         main_layout = QVBoxLayout()
@@ -222,8 +340,20 @@ class DatabaseApp(QWidget):
         form_layout = QVBoxLayout()
         form_layout.setSpacing(10)
 
+        form_layout.addWidget(table_label)
+        table_layout = QHBoxLayout()
+        table_layout.addWidget(self.table_combo, 1)
+        table_layout.addWidget(self.refresh_tables_button)
+        form_layout.addLayout(table_layout)
+        form_layout.addWidget(self.table_info_label)
+
+        form_layout.addSpacing(10)
+
         form_layout.addWidget(import_data_label)
+        form_layout.addWidget(self.chunk_size_edit)
         form_layout.addWidget(self.import_button)
+        form_layout.addWidget(self.key_columns_edit)
+        form_layout.addWidget(self.incremental_button)
 
         form_layout.addSpacing(10)
 
@@ -237,7 +367,24 @@ class DatabaseApp(QWidget):
         form_layout.addWidget(self.drop_na_button)
         form_layout.addWidget(self.remove_duplicates_button)
 
+        form_layout.addSpacing(10)
+
+        form_layout.addWidget(pipeline_label)
+        queue_layout = QHBoxLayout()
+        queue_layout.addWidget(self.pipeline_combo)
+        queue_layout.addWidget(self.queue_button)
+        form_layout.addLayout(queue_layout)
+        form_layout.addWidget(self.plan_label)
+        pipeline_buttons_layout = QHBoxLayout()
+        pipeline_buttons_layout.addWidget(self.run_pipeline_button)
+        pipeline_buttons_layout.addWidget(self.clear_pipeline_button)
+        form_layout.addLayout(pipeline_buttons_layout)
+
+        form_layout.addSpacing(10)
+
+        form_layout.addWidget(self.preview_button)
         form_layout.addWidget(self.disconnect_button)
+        form_layout.addWidget(self.cancel_button)
         form_layout.addWidget(self.status_label)
 
         center_layout = QHBoxLayout()
@@ -249,6 +396,38 @@ class DatabaseApp(QWidget):
 
         self.page2.setLayout(main_layout)
 
+    def create_page3(self):
+        """
+        Create the third page, which previews the rows of the selected table.
+        """
+        preview_label = QLabel('Table Preview 🔍')
+        preview_label.setFont(QFont('Verdana', 16, QFont.Bold))
+        preview_label.setStyleSheet("color: #1565C0;")
+
+        self.preview_info_label = QLabel('')
+        self.preview_info_label.setFont(QFont('Arial', 12))
+        self.preview_info_label.setStyleSheet("color: #1565C0;")
+        self.preview_info_label.setWordWrap(True)
+
+        # Rows are painted from pages read in the background, so every row has the same fixed height and
+        # the view never has to measure rows it has not read
+        self.preview_view = QTableView()
+        self.preview_view.setStyleSheet("background-color: white;")
+        self.preview_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.preview_view.verticalHeader().setDefaultSectionSize(24)
+        self.preview_view.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+
+        self.close_preview_button = self.create_styled_button('Back', self.close_preview, 'fa5s.arrow-left')
+
+        # Set up the layout for the third page
+        main_layout = QVBoxLayout()
+        main_layout.addWidget(preview_label)
+        main_layout.addWidget(self.preview_info_label)
+        main_layout.addWidget(self.preview_view)
+        main_layout.addWidget(self.close_preview_button)
+
+        self.page3.setLayout(main_layout)
+
     def create_input_field(self, placeholder_text, password=False):
         """
         Create a QLineEdit with shadow effect and border.
@@ -284,36 +463,47 @@ class DatabaseApp(QWidget):
         """
         Connect to the database using the provided connection parameters.
         """
-        # Construct the connection URL from input fields
-        connection_url = (
-            f"{self.dialect_edit.text()}+{self.driver_edit.text()}://"
-            f"{self.username_edit.text()}:{self.password_edit.text()}@"
-            f"{self.host_edit.text()}:{self.port_edit.text()}/"
-            f"{self.database_edit.text()}"
-        )
+        from database_operations import build_connection_url, get_engine
+        from metadata_cache import get_metadata_cache
 
+        self.build_pages()
         try:
-            # Create the SQLAlchemy engine and connect to the database
-            engine = sal.create_engine(connection_url)
-            self.conn = engine.connect()
-            self.status_label.setText('Status: Connected to Database')
-
-            # Handle table connection
-            self.table_name = self.table_edit.text().strip()
-            if self.table_name:
-                try:
-                    pd.read_sql_table(self.table_name, self.conn)
-                    self.status_label.setText(f'Status: Connected to Table "{self.table_name}"')
-                    self.show_message_box('Connection Successful', f'Connected to the table "{self.table_name}" successfully.', QMessageBox.Information)
-                except Exception as e:
-                    self.table_name = None
-                    self.show_message_box('Table Connection Error', f'Table "{self.table_name}" does not exist. Error: {e}', QMessageBox.Critical)
-            else:
-                self.show_message_box('Connection Successful', 'Connected to the database successfully. You can create a new table by importing an Excel file.', QMessageBox.Information)
-
+            # Construct the connection URL from input fields
+            connection_url = build_connection_url(
+                self.dialect_edit.text().strip(), self.driver_edit.text().strip(),
+                self.username_edit.text(), self.password_edit.text(),
+                self.host_edit.text().strip(), self.port_edit.text().strip(),
+                self.database_edit.text().strip()
+            )
+
+            # Reuse the pooled engine for this URL and check out a connection to validate it
+            engine = get_engine(connection_url)
+            metadata = get_metadata_cache(engine)
+            with engine.connect() as conn:
+                # Read the table list and row count estimates again, keeping the columns of unchanged tables
+                metadata.refresh(conn)
+                self.engine = engine
+                self.metadata = metadata
+                self.status_label.setText('Status: Connected to Database')
+
+                # Handle table connection
+                table_name = self.table_edit.text().strip()
+                self.table_name = None
+                if table_name:
+                    if metadata.table(conn, table_name) is not None:
+                        self.table_name = table_name
+                        self.status_label.setText(f'Status: Connected to Table "{table_name}"')
+                        self.show_message_box('Connection Successful', f'Connected to the table "{table_name}" successfully.', QMessageBox.Information)
+                    else:
+                        self.show_message_box('Table Connection Error', f'Table "{table_name}" does not exist.', QMessageBox.Critical)
+                else:
+                    self.show_message_box('Connection Successful', 'Connected to the database successfully. You can create a new table by importing an Excel file.', QMessageBox.Information)
+
+            self.update_table_combo()
             self.stacked_widget.setCurrentIndex(1)  # Switch to the second page
         except Exception as e:
-            self.conn = None
+            self.engine = None
+            self.metadata = None
             self.status_label.setText('Status: Connection Failed')
             logging.error(f'Error connecting to database: {e}')
             self.show_message_box('Connection Error', f'Error connecting to database: {e}', QMessageBox.Critical)
@@ -322,113 +512,507 @@ class DatabaseApp(QWidget):
         """
         Disconnect from the database.
         """
-        if self.conn:
-            try:
-                self.conn.close()
-                self.conn = None
-                self.table_name = None
-                self.status_label.setText('Status: Disconnected from Database')
-                self.show_message_box('Disconnection Successful', 'Disconnected from the database successfully.', QMessageBox.Information)
-                # Switch back to the first page after disconnection
-                self.stacked_widget.setCurrentIndex(0)
-            except Exception as e:
-                logging.error(f'Error disconnecting from database: {e}')
-                self.show_message_box('Disconnection Error', f'Error disconnecting from database: {e}', QMessageBox.Critical)
+        if self.engine:
+            # The engine stays in the pool manager so reconnecting to the same database is instant
+            self.engine = None
+            self.metadata = None
+            self.table_name = None
+            self.update_table_combo()
+            self.status_label.setText('Status: Disconnected from Database')
+            self.show_message_box('Disconnection Successful', 'Disconnected from the database successfully.', QMessageBox.Information)
+            # Switch back to the first page after disconnection
+            self.stacked_widget.setCurrentIndex(0)
         else:
             self.show_message_box('Disconnection Error', 'No database connection to disconnect.', QMessageBox.Warning)
 
+    def update_table_combo(self):
+        """
+        Fill the table picker from the metadata cache and select the current table, without querying the database.
+        """
+        self.table_combo.blockSignals(True)
+        self.table_combo.clear()
+        if self.metadata is not None:
+            for name in self.metadata.cached_table_names():
+                self.table_combo.addItem(name, name)
+        self.table_combo.setCurrentIndex(self.table_combo.findData(self.table_name) if self.table_name else -1)
+        self.table_combo.blockSignals(False)
+        self.show_table_info(self.table_name)
+
+    def table_selected(self, index):
+        """
+        Make the table picked in the table picker the current table.
+        """
+        table_name = self.table_combo.itemData(index)
+        if table_name is None or table_name == self.table_name:
+            return
+        self.table_name = table_name
+        self.status_label.setText(f'Status: Connected to Table "{table_name}"')
+        self.show_table_info(table_name)
+        self.update_plan_label()
+
+    def show_table_info(self, table_name):
+        """
+        Describe a table under the table picker from the metadata cache, reading its columns in the background if needed.
+        """
+        if not table_name or self.metadata is None:
+            self.table_info_label.setText('')
+            return
+        info = self.metadata.cached_table(table_name)
+        if info is not None:
+            self.table_info_label.setText(f'{info.describe()}: {", ".join(info.columns)}')
+            return
+        self.table_info_label.setText('Reading columns...')
+        self.read_table_metadata(table_name)
+
+    def read_table_metadata(self, table_name):
+        """
+        Reflect a table into the metadata cache on the worker pool, then describe it and show its plan if it is
+        still selected. Does nothing if the table is already being read.
+        """
+        from task_runner import DatabaseTask
+
+        metadata = self.metadata
+        key = (metadata, table_name)
+        if key in self.metadata_tasks:
+            return
+
+        def done(info):
+            self.metadata_tasks.pop(key, None)
+            if table_name == self.table_name and metadata is self.metadata:
+                if info is None:
+                    self.table_info_label.setText(f'Table "{table_name}" no longer exists.')
+                else:
+                    self.show_table_info(table_name)
+                self.update_plan_label(read=False)
+
+        def failed(e):
+            self.metadata_tasks.pop(key, None)
+            if table_name == self.table_name and metadata is self.metadata:
+                self.table_info_label.setText(f'Error reading table: {e}')
+                self.update_plan_label(read=False)
+
+        task = DatabaseTask(self.engine, lambda conn, progress: metadata.table(conn, table_name),
+                            'Reading table metadata', table_name, instrumented=False)
+        task.signals.finished.connect(done)
+        task.signals.failed.connect(failed)
+        self.metadata_tasks[key] = task
+        self.thread_pool.start(task)
+
+    def refresh_tables(self):
+        """
+        Read the table list, row count estimates and columns from the database again.
+        """
+        if self.metadata is None:
+            self.show_message_box('Refresh Error', 'No database connection established.', QMessageBox.Warning)
+            return
+
+        metadata = self.metadata
+
+        def read_tables(conn, progress):
+            metadata.invalidate()
+            return metadata.table_names(conn)
+
+        self.run_task(
+            'Reading tables',
+            read_tables,
+            lambda names: self.show_message_box('Refresh', f'Found {len(names)} tables.', QMessageBox.Information),
+            'Refresh Error', 'Error reading tables', writes=False
+        )
+
+    def headers_need_renaming(self, table_name, transform, title, unchanged_message):
+        """
+        Check a header rename against the cached columns and return False, after telling the user, if there is
+        nothing to rename or the new names would clash.
+        """
+        from database_operations import build_header_mapping
+
+        info = self.metadata.cached_table(table_name)
+        if info is None:
+            # The operation reflects the table itself
+            return True
+        try:
+            mapping = build_header_mapping(list(info.columns), transform)
+        except ValueError as e:
+            self.show_message_box(f'{title} Error', str(e), QMessageBox.Warning)
+            return False
+        if not mapping:
+            self.show_message_box(title, unchanged_message, QMessageBox.Information)
+            return False
+        return True
+
     def import_excel(self):
         """
         Import data from an Excel file into the database.
         """
-        if not self.conn:
+        self.start_import(incremental=False)
+
+    def import_excel_incremental(self):
+        """
+        Re-import an Excel file into its table, writing only the rows that were added, changed or removed.
+        """
+        self.start_import(incremental=True)
+
+    def start_import(self, incremental):
+        """
+        Pick an Excel file and infer its column types, then hand over to review_schema for the import itself.
+        """
+        from excel_import import infer_excel_schema
+
+        if not self.engine:
             self.show_message_box('Import Error', 'No database connection established.', QMessageBox.Warning)
             return
 
-        try:
-            # Open a file dialog to select the Excel file
-            file_path, _ = QFileDialog.getOpenFileName(self, 'Open Excel File', os.getenv('HOME'), 'Excel Files (*.xlsx *.xls)')
-            if not file_path:
-                return
-
-            df = pd.read_excel(file_path)
-            file_name = os.path.splitext(os.path.basename(file_path))[0]
-            self.table_name = file_name
-
-            # Import the Excel data into the database table
-            df.to_sql(self.table_name, con=self.conn, if_exists='replace', index=False)
-            self.show_message_box('Import Successful', f'Excel file imported successfully as table "{self.table_name}".', QMessageBox.Information)
-        except Exception as e:
-            logging.error(f'Error importing Excel file: {e}')
-            self.show_message_box('Import Error', f'Error importing Excel file: {e}', QMessageBox.Critical)
+        # Open a file dialog to select the Excel file
+        file_path, _ = QFileDialog.getOpenFileName(self, 'Open Excel File', os.getenv('HOME'), 'Excel Files (*.xlsx *.xls)')
+        if not file_path:
+            return
+
+        table_name = os.path.splitext(os.path.basename(file_path))[0]
+
+        # Sample the sheet on a worker thread, then let the user review the inferred column types
+        self.run_task(
+            'Inferring column types',
+            lambda conn, progress: infer_excel_schema(file_path),
+            lambda schema: self.review_schema(file_path, table_name, schema, incremental),
+            'Import Error', 'Error reading Excel file', table_name, writes=False
+        )
+
+    def review_schema(self, file_path, table_name, schema, incremental=False):
+        """
+        Show the inferred schema for review and import the Excel file with the column types the user accepts.
+
+        With incremental, the table is updated in place with import_excel_incremental, keyed by the columns
+        entered on the second page if any.
+        """
+        from excel_import import import_excel_file
+        from incremental_import import import_excel_incremental
+        from schema_dialog import SchemaDialog
+
+        dialog = SchemaDialog(schema, self.engine.dialect, table_name, self)
+        if dialog.exec_() != QDialog.Accepted:
+            self.status_label.setText('Status: Import cancelled')
+            return
+
+        schema = dialog.selected_schema()
+        chunk_size = self.get_chunk_size()
+
+        def imported(rows):
+            self.table_name = table_name
+            self.show_message_box('Import Successful', f'Excel file imported successfully as table "{table_name}" ({rows} rows).', QMessageBox.Information)
+
+        def updated(counts):
+            self.table_name = table_name
+            if counts['replaced']:
+                message = f'Table "{table_name}" was replaced with a full import ({counts["inserted"]} rows).'
+            else:
+                message = (f'Table "{table_name}" updated: {counts["inserted"]} rows inserted, {counts["updated"]} updated, '
+                           f'{counts["deleted"]} deleted, {counts["unchanged"]} unchanged.')
+            self.show_message_box('Import Successful', message, QMessageBox.Information)
+
+        if incremental:
+            key_columns = [name.strip() for name in self.key_columns_edit.text().split(',') if name.strip()]
+            # Diff the workbook against the row hashes stored in the table and write only the changes
+            self.run_task(
+                'Importing changed rows',
+                lambda conn, progress: import_excel_incremental(conn, file_path, table_name, key_columns, chunk_size,
+                                                                progress, schema),
+                updated, 'Import Error', 'Error importing Excel file', table_name
+            )
+            return
+
+        # Stream the Excel data into the database table in batches on a worker thread
+        self.run_task(
+            'Importing Excel file',
+            lambda conn, progress: import_excel_file(conn, file_path, table_name, chunk_size, progress, schema),
+            imported, 'Import Error', 'Error importing Excel file', table_name
+        )
+
+    def preview_table(self):
+        """
+        Show the rows of the selected table on the preview page, reading them page by page as they are scrolled to.
+        """
+        from table_pager import KeysetPager
+
+        if not self.table_name:
+            self.show_message_box('Error', 'No table name provided.', QMessageBox.Warning)
+            return
+
+        table_name = self.table_name
+
+        # Reflecting the table and counting its rows can take a while on large tables, so do it on a worker thread
+        self.run_task(
+            'Opening preview',
+            lambda conn, progress: KeysetPager(conn, table_name),
+            self.show_preview, 'Preview Error', 'Error opening preview', writes=False
+        )
+
+    def show_preview(self, pager):
+        """
+        Switch to the preview page with a model that reads pages of the table through pager.
+        """
+        from preview_model import PreviewTableModel
+
+        self.preview_model = PreviewTableModel(self.engine, pager, self.thread_pool, self)
+        self.preview_model.failed.connect(lambda e: self.preview_info_label.setText(f'Error reading rows: {e}'))
+        self.preview_view.setModel(self.preview_model)
+        self.preview_info_label.setText(f'Table "{pager.table_name}": {pager.row_count:,} rows, {pager.describe()}')
+        self.stacked_widget.setCurrentIndex(2)
+
+    def close_preview(self):
+        """
+        Leave the preview page and release the pages it holds.
+        """
+        if self.preview_model is not None:
+            self.preview_model.close()
+            self.preview_view.setModel(None)
+            self.preview_model = None
+        self.stacked_widget.setCurrentIndex(1)
+
+    def get_chunk_size(self):
+        """
+        Return the import batch size entered on the second page, or the default if it is empty or invalid.
+        """
+        from excel_import import DEFAULT_CHUNK_SIZE
+
+        text = self.chunk_size_edit.text().strip()
+        if text.isdigit() and int(text) > 0:
+            return int(text)
+        return DEFAULT_CHUNK_SIZE
 
     def lowercase_headers(self):
         """
         Lowercase the headers of a selected table in the database.
         """
-        try:
-            if not self.table_name:
-                self.show_message_box('Error', 'No table name provided.', QMessageBox.Warning)
-                return
-
-            df = pd.read_sql_table(self.table_name, self.conn)
-            df.columns = [col.lower() for col in df.columns]
-            df.to_sql(self.table_name, con=self.conn, if_exists='replace', index=False)
-            self.show_message_box('Lowercase Headers', 'Table headers lowercased successfully.', QMessageBox.Information)
-        except Exception as e:
-            logging.error(f'Error lowercasing headers: {e}')
-            self.show_message_box('Lowercase Headers Error', f'Error lowercasing headers: {e}', QMessageBox.Critical)
+        from database_operations import rename_headers
+
+        if not self.table_name:
+            self.show_message_box('Error', 'No table name provided.', QMessageBox.Warning)
+            return
+
+        table_name = self.table_name
+        if not self.headers_need_renaming(table_name, str.lower, 'Lowercase Headers', 'Table headers are already lowercase.'):
+            return
+        self.run_task(
+            'Lowercasing headers',
+            lambda conn, progress: rename_headers(conn, table_name, str.lower, progress),
+            lambda mapping: self.show_message_box('Lowercase Headers', 'Table headers lowercased successfully.', QMessageBox.Information),
+            'Lowercase Headers Error', 'Error lowercasing headers'
+        )
 
     def replace_spaces_in_headers(self):
         """
         Replace spaces in the headers of a selected table in the database with underscores.
         """
-        try:
-            if not self.table_name:
-                self.show_message_box('Error', 'No table name provided.', QMessageBox.Warning)
-                return
-
-            df = pd.read_sql_table(self.table_name, self.conn)
-            df.columns = [col.replace(' ', '_') for col in df.columns]
-            df.to_sql(self.table_name, con=self.conn, if_exists='replace', index=False)
-            self.show_message_box('Replace Spaces in Headers', 'Spaces in headers replaced successfully.', QMessageBox.Information)
-        except Exception as e:
-            logging.error(f'Error replacing spaces in headers: {e}')
-            self.show_message_box('Replace Spaces in Headers Error', f'Error replacing spaces in headers: {e}', QMessageBox.Critical)
+        from database_operations import rename_headers
+
+        if not self.table_name:
+            self.show_message_box('Error', 'No table name provided.', QMessageBox.Warning)
+            return
+
+        table_name = self.table_name
+        if not self.headers_need_renaming(table_name, lambda col: col.replace(' ', '_'), 'Replace Spaces in Headers',
+                                          'Table headers contain no spaces.'):
+            return
+        self.run_task(
+            'Replacing spaces in headers',
+            lambda conn, progress: rename_headers(conn, table_name, lambda col: col.replace(' ', '_'), progress),
+            lambda mapping: self.show_message_box('Replace Spaces in Headers', 'Spaces in headers replaced successfully.', QMessageBox.Information),
+            'Replace Spaces in Headers Error', 'Error replacing spaces in headers'
+        )
 
     def drop_na_values(self):
         """
         Drop rows with NA values from a selected table in the database.
         """
-        try:
-            if not self.table_name:
-                self.show_message_box('Error', 'No table name provided.', QMessageBox.Warning)
-                return
-
-            df = pd.read_sql_table(self.table_name, self.conn)
-            df = df.dropna()
-            df.to_sql(self.table_name, con=self.conn, if_exists='replace', index=False)
-            self.show_message_box('Drop NA Values', 'NA values dropped successfully.', QMessageBox.Information)
-        except Exception as e:
-            logging.error(f'Error dropping NA values: {e}')
-            self.show_message_box('Drop NA Values Error', f'Error dropping NA values: {e}', QMessageBox.Critical)
+        from database_operations import drop_na_rows
+
+        if not self.table_name:
+            self.show_message_box('Error', 'No table name provided.', QMessageBox.Warning)
+            return
+
+        table_name = self.table_name
+        self.run_task(
+            'Dropping NA values',
+            lambda conn, progress: drop_na_rows(conn, table_name, progress),
+            lambda removed: self.show_message_box('Drop NA Values', f'NA values dropped successfully ({removed} rows removed).', QMessageBox.Information),
+            'Drop NA Values Error', 'Error dropping NA values'
+        )
 
     def remove_duplicates(self):
         """
         Remove duplicate rows from a selected table in the database.
         """
-        try:
-            if not self.table_name:
-                self.show_message_box('Error', 'No table name provided.', QMessageBox.Warning)
-                return
-
-            df = pd.read_sql_table(self.table_name, self.conn)
-            df = df.drop_duplicates()
-            df.to_sql(self.table_name, con=self.conn, if_exists='replace', index=False)
-            self.show_message_box('Remove Duplicates', 'Duplicate rows removed successfully.', QMessageBox.Information)
-        except Exception as e:
-            logging.error(f'Error removing duplicates: {e}')
-            self.show_message_box('Remove Duplicates Error', f'Error removing duplicates: {e}', QMessageBox.Critical)
+        from database_operations import remove_duplicate_rows
+
+        if not self.table_name:
+            self.show_message_box('Error', 'No table name provided.', QMessageBox.Warning)
+            return
+
+        table_name = self.table_name
+        self.run_task(
+            'Removing duplicates',
+            lambda conn, progress: remove_duplicate_rows(conn, table_name, progress),
+            lambda removed: self.show_message_box('Remove Duplicates', f'Duplicate rows removed successfully ({removed} rows removed).', QMessageBox.Information),
+            'Remove Duplicates Error', 'Error removing duplicates'
+        )
+
+    def queue_transform(self):
+        """
+        Add the transform selected in the pipeline combo box to the queue and show the compiled plan.
+        """
+        self.pipeline_queue.append(self.pipeline_combo.currentData())
+        self.update_plan_label()
+
+    def clear_pipeline(self):
+        """
+        Empty the pipeline queue.
+        """
+        self.pipeline_queue = []
+        self.update_plan_label()
+
+    def update_plan_label(self, read=True):
+        """
+        Show the queued transforms and, when a table is selected, the execution plan they compile to.
+
+        The plan is compiled from the table's cached columns. If they are not cached and read is True, they
+        are read on the worker pool, which calls this again once they are in the cache.
+        """
+        from pipeline import TRANSFORMS, compile_plan
+
+        if not self.pipeline_queue:
+            self.plan_label.setText('Pipeline: empty')
+            return
+
+        text = 'Queued: ' + ' → '.join(TRANSFORMS[name] for name in self.pipeline_queue)
+        if self.engine and self.table_name:
+            # Compiling only needs the table's columns, so the GUI thread never waits for the database
+            info = self.metadata.cached_table(self.table_name) if self.metadata is not None else None
+            if info is not None:
+                try:
+                    text += '\n' + compile_plan(self.engine, self.table_name, self.pipeline_queue, info.columns).describe()
+                except Exception as e:
+                    text += f'\nPlan unavailable: {e}'
+            elif read and self.metadata is not None:
+                text += '\nReading the columns of the table...'
+                self.read_table_metadata(self.table_name)
+            else:
+                text += f'\nPlan unavailable: the columns of table "{self.table_name}" could not be read'
+        self.plan_label.setText(text)
+
+    def run_queued_pipeline(self):
+        """
+        Run every queued transform against the selected table as one compiled plan.
+        """
+        from pipeline import run_pipeline
+
+        if not self.table_name:
+            self.show_message_box('Error', 'No table name provided.', QMessageBox.Warning)
+            return
+        if not self.pipeline_queue:
+            self.show_message_box('Pipeline Error', 'No transforms queued.', QMessageBox.Warning)
+            return
+
+        table_name = self.table_name
+        transforms = list(self.pipeline_queue)
+
+        def finished(result):
+            plan, removed = result
+            self.clear_pipeline()
+            self.show_message_box('Run Pipeline', f'Pipeline finished successfully ({removed} rows removed).\n\n{plan.describe()}', QMessageBox.Information)
+
+        self.run_task(
+            'Running pipeline',
+            lambda conn, progress: run_pipeline(conn, table_name, transforms, progress),
+            finished, 'Pipeline Error', 'Error running pipeline'
+        )
+
+    def run_task(self, description, operation, on_success, error_title, error_prefix, table_name=None, writes=True):
+        """
+        Run operation(conn, progress) on the worker pool while keeping the window responsive.
+
+        Only one operation runs at a time; its progress is shown in the status label and it can be
+        stopped with the Cancel button. table_name, which defaults to the selected table, is recorded
+        in the operation's metrics. Unless writes is False, the table is invalidated in the metadata cache
+        when the operation ends, however it ends, and reflected again on the worker if it succeeded.
+        """
+        from task_runner import DatabaseTask
+
+        if self.current_task is not None:
+            self.show_message_box('Operation Running', 'Please wait for the current operation to finish or cancel it.', QMessageBox.Warning)
+            return
+
+        table_name = table_name or self.table_name
+        if writes and self.metadata is not None:
+            operation = self.invalidating(operation, self.metadata, table_name)
+
+        task = DatabaseTask(self.engine, operation, description, table_name)
+        task.signals.progress.connect(lambda text: self.status_label.setText(f'Status: {description}: {text}'))
+        # Show the operation's timings, row counts and memory use once it finishes
+        task.signals.finished.connect(lambda result: self.task_finished(f'Status: {task.metrics.summary()}', on_success, result))
+        task.signals.cancelled.connect(lambda: self.task_finished(f'Status: {description} cancelled'))
+        task.signals.failed.connect(lambda e: self.task_failed(e, error_title, error_prefix))
+
+        self.current_task = task
+        self.set_operations_enabled(False)
+        self.status_label.setText(f'Status: {description}...')
+        self.thread_pool.start(task)
+
+    @staticmethod
+    def invalidating(operation, metadata, table_name):
+        """
+        Wrap an operation that writes to table_name so that it keeps the metadata cache current.
+        """
+        def run(conn, progress):
+            try:
+                result = operation(conn, progress)
+            finally:
+                metadata.invalidate(table_name)
+            try:
+                # Read the changed table while still on the worker, so the GUI finds it cached
+                metadata.table(conn, table_name)
+            except Exception as e:
+                logging.error(f'Error reading the metadata of table "{table_name}": {e}')
+            return result
+
+        return run
+
+    def task_finished(self, status, on_success=None, result=None):
+        """
+        Restore the page after a background operation ends and hand its result to on_success.
+        """
+        self.current_task = None
+        self.set_operations_enabled(True)
+        self.status_label.setText(status)
+        if on_success:
+            on_success(result)
+        if self.metadata is not None:
+            self.update_table_combo()
+
+    def task_failed(self, error, error_title, error_prefix):
+        """
+        Log and report an exception raised by a background operation.
+        """
+        self.task_finished('Status: Operation Failed')
+        logging.error(f'{error_prefix}: {error}')
+        self.show_message_box(error_title, f'{error_prefix}: {error}', QMessageBox.Critical)
+
+    def cancel_task(self):
+        """
+        Ask the running background operation to stop.
+        """
+        if self.current_task is not None:
+            self.current_task.cancel()
+            self.status_label.setText('Status: Cancelling...')
+
+    def set_operations_enabled(self, enabled):
+        """
+        Enable or disable the page 2 operation buttons; the Cancel button gets the opposite state.
+        """
+        for button in (self.import_button, self.incremental_button, self.lowercase_button, self.replace_spaces_button,
+                       self.drop_na_button, self.remove_duplicates_button, self.disconnect_button,
+                       self.run_pipeline_button, self.preview_button, self.refresh_tables_button, self.table_combo):
+            button.setEnabled(enabled)
+        self.cancel_button.setEnabled(not enabled)
 
     def show_message_box(self, title, message, icon):
         """
@@ -442,6 +1026,7 @@ class DatabaseApp(QWidget):
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # Let the bundled executable start deduplication worker processes
     app = QApplication(sys.argv)
     window = DatabaseApp()
     window.show()  # Explicitly show the window
@@ -0,0 +1,341 @@
+"""
+Benchmark every DatabaseApp operation headlessly against SQLite (and optionally MySQL).
+
+Example:
+    python benchmark.py --rows 10000,1000000 --width wide --null-ratio 0.05 --dup-ratio 0.1 \
+        --output bench.json --baseline bench_baseline.json
+
+Time-to-first-paint of the app, from source or from a frozen build:
+    python benchmark.py --operations "" --startup --startup-command dist/DatabaseApp/DatabaseApp
+"""
+import argparse
+import json
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from database_operations import drop_na_rows, get_engine, remove_duplicate_rows, rename_headers
+from excel_import import DEFAULT_CHUNK_SIZE, import_excel_file, infer_excel_schema, prepare_excel_chunks
+from startup import STARTUP_PROBE_ENV_VAR, STARTUP_PROBE_PREFIX
+
+OPERATIONS = ('import_excel', 'lowercase_headers', 'replace_spaces_in_headers', 'drop_na_values', 'remove_duplicates')
+WIDTHS = {'narrow': 5, 'wide': 50}
+# Excel sheets hold at most 1,048,576 rows including the header
+EXCEL_MAX_ROWS = 1048575
+TABLE_NAME = 'Benchmark Table'
+SETUP_CHUNK_SIZE = 100000
+# Milestones printed by the app under the startup probe: the login page painted, and every page usable
+STARTUP_MILESTONES = ('first_paint', 'ready')
+# A start-up that takes longer than this is killed
+STARTUP_TIMEOUT = 120
+
+
+def generate_chunks(rows, width, null_ratio, dup_ratio, seed=0, chunk_size=SETUP_CHUNK_SIZE):
+    """
+    Yield synthetic DataFrames totalling rows rows, with mixed-case spaced headers, nulls and duplicate rows.
+    """
+    rng = np.random.default_rng(seed)
+    kinds = ['Int', 'Float', 'Text', 'Date', 'Flag']
+    columns = [f'{kinds[i % len(kinds)]} Column {i}' for i in range(width)]
+    for start in range(0, rows, chunk_size):
+        n = min(chunk_size, rows - start)
+        data = {}
+        for i, col in enumerate(columns):
+            kind = i % 5
+            if kind == 0:
+                data[col] = rng.integers(0, 1000000, n)
+            elif kind == 1:
+                data[col] = rng.random(n) * 1000
+            elif kind == 2:
+                data[col] = np.char.add('item-', rng.integers(0, 5000, n).astype(str)).astype(object)
+            elif kind == 3:
+                data[col] = pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 1500, n), unit='D')
+            else:
+                data[col] = rng.random(n) < 0.5
+        # Point a share of the rows at other rows of the chunk to create exact duplicates
+        source = np.arange(n)
+        dups = rng.random(n) < dup_ratio
+        source[dups] = rng.integers(0, n, dups.sum())
+        df = pd.DataFrame(data).iloc[source].reset_index(drop=True)
+        if null_ratio:
+            df = df.mask(rng.random(df.shape) < null_ratio)
+        yield df
+
+
+def write_workbook(path, rows, width, null_ratio, dup_ratio):
+    """
+    Write a synthetic workbook with openpyxl's streaming writer.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    header_written = False
+    for chunk in generate_chunks(rows, width, null_ratio, dup_ratio):
+        if not header_written:
+            sheet.append(list(chunk.columns))
+            header_written = True
+        for row in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None):
+            sheet.append([value.to_pydatetime() if isinstance(value, pd.Timestamp) else value for value in row])
+    workbook.save(path)
+
+
+def load_table(url, rows, width, null_ratio, dup_ratio):
+    """
+    Replace the benchmark table with synthetic data, outside the timed section.
+    """
+    with get_engine(url).begin() as conn:
+        for i, chunk in enumerate(generate_chunks(rows, width, null_ratio, dup_ratio)):
+            chunk.to_sql(TABLE_NAME, con=conn, if_exists='replace' if i == 0 else 'append', index=False)
+
+
+def _io_bytes():
+    """
+    Return the bytes this process has read and written so far (Linux only), or None.
+    """
+    try:
+        with open('/proc/self/io') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+        return int(counters['rchar']) + int(counters['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _mysql_bytes(conn):
+    """
+    Return the bytes sent and received by this MySQL session.
+    """
+    rows = conn.exec_driver_sql("SHOW SESSION STATUS WHERE Variable_name IN ('Bytes_sent', 'Bytes_received')")
+    return sum(int(value) for _, value in rows)
+
+
+def prime_parse_cache(file_path):
+    """
+    Parse a workbook once so later imports of it are served from the parse cache.
+    """
+    # Parsing the sheet fills the cache; the iterator it returns over the cached entry is not needed
+    prepare_excel_chunks(file_path, schema=infer_excel_schema(file_path))
+
+
+def run_operation(url, operation, file_path, chunk_size, parse_cache=False):
+    """
+    Run one operation in a fresh process and return its wall time, peak RSS and bytes transferred.
+    """
+    with get_engine(url).connect() as conn:
+        is_mysql = conn.dialect.name == 'mysql'
+        bytes_before = _mysql_bytes(conn) if is_mysql else _io_bytes()
+        started = time.perf_counter()
+        if operation == 'import_excel':
+            import_excel_file(conn, file_path, TABLE_NAME, chunk_size, use_cache=parse_cache)
+        elif operation == 'lowercase_headers':
+            rename_headers(conn, TABLE_NAME, str.lower)
+        elif operation == 'replace_spaces_in_headers':
+            rename_headers(conn, TABLE_NAME, lambda col: col.replace(' ', '_'))
+        elif operation == 'drop_na_values':
+            drop_na_rows(conn, TABLE_NAME)
+        elif operation == 'remove_duplicates':
+            remove_duplicate_rows(conn, TABLE_NAME)
+        seconds = time.perf_counter() - started
+        bytes_after = _mysql_bytes(conn) if is_mysql else _io_bytes()
+
+    peak_rss_mb = None
+    if resource is not None:
+        # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024) / 2 ** 20
+    return {
+        'seconds': seconds,
+        'peak_rss_mb': peak_rss_mb,
+        'bytes_transferred': None if bytes_before is None else bytes_after - bytes_before,
+    }
+
+
+def run_benchmarks(backends, sizes, width, null_ratio, dup_ratio, operations, chunk_size, workdir, parse_cache=False):
+    """
+    Run every operation for every backend and size and return the list of result records.
+
+    With parse_cache, imports are timed as re-imports of a workbook already in the parse cache.
+    """
+    results = []
+    # A spawned process per operation keeps the peak RSS of one run from leaking into the next
+    context = get_context('spawn')
+    for rows in sizes:
+        workbook = None
+        if 'import_excel' in operations:
+            if rows > EXCEL_MAX_ROWS:
+                print(f'Skipping import_excel at {rows:,} rows: Excel sheets are limited to {EXCEL_MAX_ROWS:,} rows', file=sys.stderr)
+            else:
+                workbook = os.path.join(workdir, f'benchmark_{rows}_{width}.xlsx')
+                if not os.path.exists(workbook):
+                    write_workbook(workbook, rows, WIDTHS[width], null_ratio, dup_ratio)
+                if parse_cache:
+                    prime_parse_cache(workbook)
+
+        for backend, url in backends.items():
+            for operation in operations:
+                if operation == 'import_excel' and workbook is None:
+                    continue
+                if operation != 'import_excel':
+                    load_table(url, rows, WIDTHS[width], null_ratio, dup_ratio)
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    metrics = executor.submit(run_operation, url, operation, workbook, chunk_size, parse_cache).result()
+                record = {
+                    'backend': backend, 'operation': operation, 'rows': rows, 'width': width,
+                    'null_ratio': null_ratio, 'dup_ratio': dup_ratio, 'parse_cache': parse_cache, **metrics,
+                    'rows_per_second': rows / metrics['seconds'] if metrics['seconds'] else None,
+                }
+                results.append(record)
+                print(f'{backend:<7} {operation:<26} {rows:>11,} rows  {metrics["seconds"]:>9.3f}s  '
+                      f'{record["rows_per_second"] or 0:>12,.0f} rows/s  {metrics["peak_rss_mb"] or 0:>8.1f} MB')
+    return results
+
+
+def time_startup(command, workdir):
+    """
+    Launch the app once with the startup probe and return {milestone: seconds from launch}.
+    """
+    env = dict(os.environ, **{STARTUP_PROBE_ENV_VAR: '1'})
+    if sys.platform.startswith('linux') and not (env.get('DISPLAY') or env.get('WAYLAND_DISPLAY')):
+        # Headless machines such as CI runners paint to an offscreen surface
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    times = {}
+    started = time.perf_counter()
+    # The app writes app.log to its working directory, so it runs in workdir
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                               text=True)
+    watchdog = threading.Timer(STARTUP_TIMEOUT, process.kill)
+    watchdog.start()
+    try:
+        for line in process.stdout:
+            if line.startswith(STARTUP_PROBE_PREFIX):
+                times[line[len(STARTUP_PROBE_PREFIX):].strip()] = time.perf_counter() - started
+        process.wait()
+    finally:
+        watchdog.cancel()
+    missing = [name for name in STARTUP_MILESTONES if name not in times]
+    if missing:
+        raise RuntimeError(f'The app exited with code {process.returncode} before reaching {", ".join(missing)}')
+    return times
+
+
+def run_startup_benchmark(command, runs, workdir, backend='app'):
+    """
+    Launch the app runs times and return a result record per startup milestone with the median time.
+
+    The first launch also pays for reading the app from disk, which the median of several launches evens out.
+    """
+    samples = [time_startup(command, workdir) for _ in range(runs)]
+    results = []
+    for milestone in STARTUP_MILESTONES:
+        seconds = statistics.median(sample[milestone] for sample in samples)
+        results.append({
+            'backend': backend, 'operation': f'startup_{milestone}', 'rows': 0, 'width': None,
+            'null_ratio': None, 'dup_ratio': None, 'parse_cache': False, 'seconds': seconds,
+            'peak_rss_mb': None, 'bytes_transferred': None, 'rows_per_second': None, 'runs': runs,
+        })
+        print(f'{backend:<7} {"startup_" + milestone:<26} {runs:>6} launches  {seconds:>9.3f}s median  '
+              f'{min(sample[milestone] for sample in samples):>8.3f}s best')
+    return results
+
+
+def result_key(record):
+    """
+    Return the fields that identify a benchmark case across runs.
+    """
+    return (record['backend'], record['operation'], record['rows'], record['width'],
+            record['null_ratio'], record['dup_ratio'], record.get('parse_cache', False))
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Return a description of every case that is slower than its baseline by more than tolerance.
+    """
+    previous = {result_key(record): record for record in baseline}
+    regressions = []
+    for record in results:
+        old = previous.get(result_key(record))
+        if old and record['seconds'] > old['seconds'] * (1 + tolerance):
+            regressions.append(
+                f'{record["backend"]} {record["operation"]} at {record["rows"]:,} rows: '
+                f'{old["seconds"]:.3f}s -> {record["seconds"]:.3f}s (+{record["seconds"] / old["seconds"] - 1:.0%})'
+            )
+    return regressions
+
+
+def parse_args(argv=None):
+    """
+    Parse the command line.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark DatabaseApp operations against SQLite and optionally MySQL.')
+    parser.add_argument('--rows', default='10000', help='Comma-separated table sizes, e.g. 10000,1000000,10000000')
+    parser.add_argument('--width', choices=WIDTHS, default='narrow', help='Narrow (5) or wide (50) column schema')
+    parser.add_argument('--null-ratio', type=float, default=0.05, help='Share of cells set to NULL')
+    parser.add_argument('--dup-ratio', type=float, default=0.1, help='Share of rows that duplicate another row')
+    parser.add_argument('--operations', default=','.join(OPERATIONS), help='Comma-separated operations to run')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Import batch size')
+    parser.add_argument('--parse-cache', action='store_true', help='Time imports as re-imports served from the parse cache')
+    parser.add_argument('--mysql-url', help='Also benchmark against this MySQL URL, e.g. a local container')
+    parser.add_argument('--startup', action='store_true', help='Also time how long the app takes to paint its first window')
+    parser.add_argument('--startup-runs', type=int, default=5, help='Launches of the app to take the median startup time over')
+    parser.add_argument('--startup-command', help='Command that launches the app, e.g. a frozen build (default: app_code.py)')
+    parser.add_argument('--workdir', help='Directory for the SQLite database and generated workbooks')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare the results against this JSON file and flag regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown against the baseline')
+    args = parser.parse_args(argv)
+    args.rows = [int(value) for value in args.rows.split(',') if value]
+    args.operations = [name.strip() for name in args.operations.split(',') if name.strip()]
+    unknown = [name for name in args.operations if name not in OPERATIONS]
+    if unknown:
+        parser.error(f'unknown operations: {", ".join(unknown)}')
+    return args
+
+
+def main(argv=None):
+    """
+    Run the benchmarks and return 1 if any case regressed against the baseline.
+    """
+    args = parse_args(argv)
+    workdir = args.workdir or tempfile.mkdtemp(prefix='sqlmanager-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    backends = {'sqlite': f'sqlite:///{os.path.join(workdir, "benchmark.db")}'}
+    if args.mysql_url:
+        backends['mysql'] = args.mysql_url
+
+    results = run_benchmarks(backends, args.rows, args.width, args.null_ratio, args.dup_ratio,
+                             args.operations, args.chunk_size, workdir, args.parse_cache)
+    if args.startup:
+        if args.startup_command:
+            command, backend = shlex.split(args.startup_command), 'frozen'
+        else:
+            command, backend = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app_code.py')], 'app'
+        results += run_startup_benchmark(command, args.startup_runs, workdir, backend)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION: {regression}')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
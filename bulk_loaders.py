@@ -0,0 +1,238 @@
+import csv
+import datetime
+import decimal
+import logging
+import os
+import tempfile
+
+import pandas as pd
+import sqlalchemy as sal
+
+# Extra connect arguments that let each MySQL driver send LOAD DATA LOCAL INFILE files to the server
+LOCAL_INFILE_CONNECT_ARGS = {
+    'pymysql': {'local_infile': True},
+    'mysqldb': {'local_infile': 1},
+    'mysqlconnector': {'allow_local_infile': True},
+}
+# MySQL errors meaning LOCAL INFILE is switched off on the client or the server
+LOCAL_INFILE_DISABLED_ERRORS = (1148, 2068, 3948)
+# Marker written for NULL in the CSV streamed to LOAD DATA and COPY
+CSV_NULL = '\\N'
+# CSV data PostgreSQL COPY keeps in memory before spilling it to a temporary file
+COPY_SPOOL_BYTES = 64 * 2 ** 20
+COPY_BLOCK_BYTES = 2 ** 20
+# Bind parameters per multi-row INSERT, kept under SQL Server's limit of 2100
+MULTI_ROW_MAX_PARAMS = 2000
+# Rows per multi-row INSERT, kept at SQL Server's limit of 1000 row value expressions per VALUES clause
+MULTI_ROW_MAX_ROWS = 1000
+# SQLite settings used while a batch is inserted, restored afterwards. Only settings that may change inside
+# the write transaction are allowed here (not synchronous or temp_store); a large page cache (in KiB when
+# negative) keeps the staging table's pages in memory until the commit
+SQLITE_BULK_PRAGMAS = {'cache_size': -200000}
+# Format SQLAlchemy uses to store DATETIME values in SQLite
+SQLITE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def _quote(conn, name):
+    """
+    Quote a table or column name for the connection's dialect.
+    """
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def _columns(conn, df):
+    """
+    Return the quoted, comma-separated column names of a DataFrame.
+    """
+    return ', '.join(_quote(conn, col) for col in df.columns)
+
+
+def _date_columns(df, dtype):
+    """
+    Return the datetime columns of a DataFrame that the table stores as dates without a time.
+    """
+    dates = set()
+    for col, sql_type in (dtype or {}).items():
+        sql_type = sal.types.to_instance(sql_type)
+        if (col in df.columns and isinstance(sql_type, sal.Date) and not isinstance(sql_type, sal.DateTime)
+                and pd.api.types.is_datetime64_any_dtype(df[col])):
+            dates.add(col)
+    return dates
+
+
+def _csv_frame(df, escape_backslashes=False, dtype=None):
+    """
+    Prepare a DataFrame for CSV loading so every value reads back as the type the table expects.
+
+    Booleans become 0/1, DATE columns in dtype lose their time and float columns that only hold whole numbers
+    (integer columns with gaps) are written without a decimal point, which integer columns accept. With
+    escape_backslashes, backslashes in text are doubled for MySQL, which treats them as escape characters.
+    """
+    df = df.copy()
+    dates = _date_columns(df, dtype)
+    for col in df.columns:
+        series = df[col]
+        if col in dates:
+            df[col] = series.dt.strftime(DATE_FORMAT)
+        elif pd.api.types.is_bool_dtype(series):
+            df[col] = series.astype('Int8')
+        elif pd.api.types.is_float_dtype(series):
+            values = series.dropna()
+            if len(values) and (values == values.round()).all() and values.abs().max() < 2 ** 53:
+                df[col] = series.astype('Int64')
+        elif escape_backslashes and (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+                                     or isinstance(series.dtype, pd.CategoricalDtype)):
+            df[col] = series.map(lambda value: value.replace('\\', '\\\\') if isinstance(value, str) else value)
+    return df
+
+
+def _write_csv(df, f, escape_backslashes=False, dtype=None):
+    """
+    Write the rows of a DataFrame to a text file as headerless CSV, with CSV_NULL for missing values.
+    """
+    _csv_frame(df, escape_backslashes, dtype).to_csv(
+        f, header=False, index=False, na_rep=CSV_NULL, lineterminator='\n', quoting=csv.QUOTE_MINIMAL
+    )
+
+
+def load_mysql_infile(conn, table_name, df, dtype=None):
+    """
+    Load a DataFrame into a MySQL table with LOAD DATA LOCAL INFILE from a temporary CSV file.
+
+    Falls back to multi-row inserts if LOCAL INFILE is disabled on the client or the server; the outcome is
+    remembered on the pooled connection so the failing statement is not retried for every batch.
+    """
+    if conn.info.get('local_infile_disabled'):
+        return load_multi_row_insert(conn, table_name, df, dtype)
+
+    # The drivers open the file by name, so it has to exist on disk rather than in memory
+    f = tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', newline='', delete=False)
+    try:
+        with f:
+            _write_csv(df, f, escape_backslashes=True, dtype=dtype)
+        path = f.name.replace('\\', '/').replace("'", "\\'")
+        statement = (
+            f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE {_quote(conn, table_name)} CHARACTER SET utf8mb4 "
+            f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+            f"({_columns(conn, df)})"
+        )
+        try:
+            conn.exec_driver_sql(statement)
+        except Exception as e:
+            code = getattr(getattr(e, 'orig', None), 'args', (None,))[0]
+            if code not in LOCAL_INFILE_DISABLED_ERRORS:
+                raise
+            logging.warning(f'LOAD DATA LOCAL INFILE is disabled ({e}), loading "{table_name}" with multi-row inserts')
+            conn.info['local_infile_disabled'] = True
+            return load_multi_row_insert(conn, table_name, df, dtype)
+    finally:
+        os.remove(f.name)
+    return len(df)
+
+
+def load_postgresql_copy(conn, table_name, df, dtype=None):
+    """
+    Load a DataFrame into a PostgreSQL table with COPY FROM STDIN, streaming the rows as CSV.
+    """
+    statement = (
+        f"COPY {_quote(conn, table_name)} ({_columns(conn, df)}) FROM STDIN "
+        f"WITH (FORMAT csv, NULL '{CSV_NULL}')"
+    )
+    with tempfile.SpooledTemporaryFile(max_size=COPY_SPOOL_BYTES, mode='w+', encoding='utf-8', newline='') as f:
+        _write_csv(df, f, dtype=dtype)
+        f.seek(0)
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            if hasattr(cursor, 'copy_expert'):
+                # psycopg2
+                cursor.copy_expert(statement, f)
+            else:
+                # psycopg 3
+                with cursor.copy(statement) as copy:
+                    while block := f.read(COPY_BLOCK_BYTES):
+                        copy.write(block)
+        finally:
+            cursor.close()
+    return len(df)
+
+
+def _sqlite_value(value):
+    """
+    Convert a Python value to one the sqlite3 module binds the way SQLAlchemy would store it.
+    """
+    if isinstance(value, datetime.datetime):
+        return value.strftime(SQLITE_DATETIME_FORMAT)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    return value
+
+
+def load_sqlite_executemany(conn, table_name, df, dtype=None):
+    """
+    Load a DataFrame into a SQLite table with one executemany, with SQLITE_BULK_PRAGMAS applied meanwhile.
+
+    Runs inside the caller's transaction, so the batch is committed with the rest of the write.
+    """
+    df = df.copy()
+    dates = _date_columns(df, dtype)
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime(DATE_FORMAT if col in dates else SQLITE_DATETIME_FORMAT)
+        elif pd.api.types.is_timedelta64_dtype(df[col]):
+            df[col] = df[col].astype('int64')
+    values = df.astype(object).where(df.notna(), None)
+    for col in df.columns:
+        # Dates, times and decimals can only hide in object columns; the others already hold plain values
+        if pd.api.types.is_object_dtype(df[col]):
+            values[col] = values[col].map(_sqlite_value)
+    rows = list(values.itertuples(index=False, name=None))
+    statement = (
+        f'INSERT INTO {_quote(conn, table_name)} ({_columns(conn, df)}) '
+        f'VALUES ({", ".join("?" * len(df.columns))})'
+    )
+    previous = {name: conn.exec_driver_sql(f'PRAGMA {name}').scalar() for name in SQLITE_BULK_PRAGMAS}
+    try:
+        for name, value in SQLITE_BULK_PRAGMAS.items():
+            conn.exec_driver_sql(f'PRAGMA {name} = {value}')
+        if rows:
+            conn.exec_driver_sql(statement, rows)
+    finally:
+        for name, value in previous.items():
+            conn.exec_driver_sql(f'PRAGMA {name} = {value}')
+    return len(df)
+
+
+def load_multi_row_insert(conn, table_name, df, dtype=None):
+    """
+    Load a DataFrame with multi-row INSERT statements, for dialects without a native bulk loader.
+    """
+    rows_per_statement = max(1, min(MULTI_ROW_MAX_ROWS, MULTI_ROW_MAX_PARAMS // max(1, len(df.columns))))
+    df.to_sql(table_name, con=conn, if_exists='append', index=False, method='multi', chunksize=rows_per_statement,
+              dtype=dtype)
+    return len(df)
+
+
+# Native loaders by (dialect, driver), as chosen on the connection page
+LOADERS = {
+    ('mysql', 'pymysql'): load_mysql_infile,
+    ('mysql', 'mysqldb'): load_mysql_infile,
+    ('mysql', 'mysqlconnector'): load_mysql_infile,
+    ('postgresql', 'psycopg2'): load_postgresql_copy,
+    ('postgresql', 'psycopg'): load_postgresql_copy,
+    ('sqlite', 'pysqlite'): load_sqlite_executemany,
+}
+
+
+def bulk_load(conn, table_name, df, dtype=None):
+    """
+    Append the rows of a DataFrame to an existing table with the fastest loader for the connection.
+
+    The loader is picked from LOADERS by the dialect and driver of the connection, falling back to multi-row
+    inserts. dtype gives the SQLAlchemy types of the table's columns where known. Returns the number of rows
+    loaded.
+    """
+    loader = LOADERS.get((conn.dialect.name, conn.dialect.driver), load_multi_row_insert)
+    return loader(conn, table_name, df, dtype)
@@ -0,0 +1,605 @@
+import logging
+import threading
+
+import pandas as pd
+import sqlalchemy as sal
+
+from bulk_loaders import LOCAL_INFILE_CONNECT_ARGS, bulk_load
+from instrumentation import phase, record_rows, timed_iter
+from progress import check_cancelled, track
+
+# Connection pool settings for engines created by get_engine
+POOL_SIZE = 5
+POOL_MAX_OVERFLOW = 10
+POOL_RECYCLE_SECONDS = 1800
+# How long a SQLite connection waits for another writer (e.g. a parallel batch import) to release the database
+SQLITE_BUSY_TIMEOUT_SECONDS = 300
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def build_connection_url(dialect, driver, username, password, host, port, database):
+    """
+    Build a SQLAlchemy URL from the connection form fields, leaving out the ones that are empty.
+    """
+    return sal.engine.URL.create(
+        f'{dialect}+{driver}' if driver else dialect,
+        username=username or None,
+        password=password or None,
+        host=host or None,
+        port=int(port) if port else None,
+        database=database or None,
+    )
+
+
+def get_engine(url):
+    """
+    Return the pooled engine for a connection URL, creating it the first time the URL is seen.
+
+    Engines are kept for the life of the process so reconnecting reuses warm pooled connections. Pooled
+    connections are pinged before use and recycled after POOL_RECYCLE_SECONDS to survive server timeouts.
+    """
+    url = sal.engine.make_url(url)
+    key = url.render_as_string(hide_password=False)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            options = {'pool_pre_ping': True, 'pool_recycle': POOL_RECYCLE_SECONDS}
+            if url.get_backend_name() == 'sqlite':
+                options['connect_args'] = {'timeout': SQLITE_BUSY_TIMEOUT_SECONDS}
+            else:
+                options.update(pool_size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW)
+                if url.get_backend_name() == 'mysql':
+                    # Needed by the LOAD DATA LOCAL INFILE bulk loader
+                    options['connect_args'] = dict(LOCAL_INFILE_CONNECT_ARGS.get(url.get_driver_name(), {}))
+            engine = sal.create_engine(url, **options)
+            _engines[key] = engine
+    return engine
+
+
+def dispose_engines():
+    """
+    Close every pooled connection and forget the cached engines.
+    """
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+
+def describe_table(conn, table_name):
+    """
+    Return the reflected columns of a table, or None if it does not exist, without reading any rows.
+    """
+    inspector = sal.inspect(conn)
+    if not inspector.has_table(table_name):
+        return None
+    return inspector.get_columns(table_name)
+
+
+def begin_transaction(conn):
+    """
+    Begin a transaction on the connection, committing any implicit one left open by an earlier read.
+    """
+    if conn.in_transaction():
+        conn.commit()
+    transaction = conn.begin()
+    if conn.dialect.name == 'sqlite' and not getattr(conn.connection.dbapi_connection, 'in_transaction', True):
+        # pysqlite only opens a transaction before DML, so open it explicitly to cover DDL as well. IMMEDIATE
+        # takes the write lock up front, so concurrent writers wait for the busy timeout instead of deadlocking
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+    return transaction
+
+
+def quote_identifier(conn, name):
+    """
+    Quote a table or column name for the connection's dialect.
+    """
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def build_header_mapping(columns, transform):
+    """
+    Apply transform to each column name and return the {old: new} mapping of the names that change.
+    """
+    mapping = {col: transform(col) for col in columns if transform(col) != col}
+    new_names = [mapping.get(col, col) for col in columns]
+    # Most databases compare column names case-insensitively, so check collisions the same way
+    seen = set()
+    duplicates = []
+    for name in new_names:
+        if name.lower() in seen:
+            duplicates.append(name)
+        seen.add(name.lower())
+    if duplicates:
+        raise ValueError(f'Renaming would produce duplicate column names: {", ".join(duplicates)}')
+    return mapping
+
+
+def can_rename_columns(dialect):
+    """
+    Return True if the dialect supports renaming a column in place.
+    """
+    if dialect.name == 'sqlite':
+        # ALTER TABLE ... RENAME COLUMN was added in SQLite 3.25
+        return (dialect.server_version_info or (0,)) >= (3, 25, 0)
+    return dialect.name in ('mysql', 'postgresql', 'oracle', 'mssql')
+
+
+def _mysql_has_rename_column(dialect):
+    """
+    Return True if the MySQL server understands RENAME COLUMN (MySQL 8.0, MariaDB 10.5.2).
+    """
+    version = dialect.server_version_info or (0,)
+    if getattr(dialect, 'is_mariadb', False):
+        return version >= (10, 5, 2)
+    return version >= (8, 0)
+
+
+def _parse_mysql_column_definitions(create_table):
+    """
+    Return {column name: definition} from the output of MySQL's SHOW CREATE TABLE.
+
+    The definitions are the server's own text, with charset, collation, ON UPDATE clause, generation
+    expression and comment, and with every literal already escaped, so they can be repeated in a CHANGE
+    clause without altering the column.
+    """
+    definitions = {}
+    for line in create_table.splitlines()[1:]:
+        line = line.strip()
+        # Column lines start with the quoted name; keys, constraints and the closing line do not
+        if not line.startswith('`'):
+            continue
+        name = []
+        i = 1
+        while i < len(line):
+            if line[i] == '`':
+                if line[i + 1:i + 2] != '`':
+                    break
+                # A doubled backtick stands for one in the name
+                i += 1
+            name.append(line[i])
+            i += 1
+        definition = line[i + 1:].strip()
+        definitions[''.join(name)] = definition[:-1] if definition.endswith(',') else definition
+    return definitions
+
+
+def _mysql_column_definitions(conn, table_name):
+    """
+    Return {column name: definition} for a MySQL table, read with SHOW CREATE TABLE.
+    """
+    create_table = conn.exec_driver_sql(f'SHOW CREATE TABLE {quote_identifier(conn, table_name)}').first()[1]
+    return _parse_mysql_column_definitions(create_table)
+
+
+def _rename_column_statements(conn, table_name, mapping):
+    """
+    Build the dialect-specific statements that rename the columns in mapping.
+    """
+    dialect = conn.dialect
+    table = quote_identifier(conn, table_name)
+
+    if dialect.name == 'mysql':
+        # MySQL accepts several rename clauses in one ALTER TABLE, which keeps the change atomic
+        if _mysql_has_rename_column(dialect):
+            clauses = [
+                f'RENAME COLUMN {quote_identifier(conn, old)} TO {quote_identifier(conn, new)}'
+                for old, new in mapping.items()
+            ]
+        else:
+            # CHANGE restates the whole column, so repeat the server's own definition of it
+            definitions = _mysql_column_definitions(conn, table_name)
+            clauses = [
+                f'CHANGE {quote_identifier(conn, old)} {quote_identifier(conn, new)} {definitions[old]}'
+                for old, new in mapping.items()
+            ]
+        return [(f'ALTER TABLE {table} ' + ', '.join(clauses), None)]
+
+    if dialect.name == 'mssql':
+        return [
+            ("EXEC sp_rename :old_name, :new_name, 'COLUMN'",
+             {'old_name': f'{table}.{quote_identifier(conn, old)}', 'new_name': new})
+            for old, new in mapping.items()
+        ]
+
+    return [
+        (f'ALTER TABLE {table} RENAME COLUMN {quote_identifier(conn, old)} TO {quote_identifier(conn, new)}', None)
+        for old, new in mapping.items()
+    ]
+
+
+def execute_renames(conn, table_name, mapping):
+    """
+    Rename columns in place inside the caller's transaction.
+    """
+    for statement, params in _rename_column_statements(conn, table_name, mapping):
+        if params is None:
+            # Run quoted identifiers verbatim so colons in column names are not read as bind parameters
+            conn.exec_driver_sql(statement)
+        else:
+            conn.execute(sal.text(statement), params)
+
+
+def reflect_columns(conn, table_name):
+    """
+    Return the reflected columns of a table as an ordered {name: column} dictionary.
+    """
+    return {col['name']: col for col in sal.inspect(conn).get_columns(table_name)}
+
+
+def rename_headers(conn, table_name, transform, progress=None):
+    """
+    Rename the columns of a table with transform and return the {old: new} mapping that was applied.
+
+    Columns are renamed in place with ALTER TABLE inside one transaction, so the cost depends on the number
+    of columns rather than the number of rows. Dialects that cannot rename columns fall back to copying the table.
+    """
+    with phase('reflect'):
+        columns = reflect_columns(conn, table_name)
+    mapping = build_header_mapping(list(columns), transform)
+    if not mapping:
+        return mapping
+
+    check_cancelled(progress)
+    if not can_rename_columns(conn.dialect):
+        logging.warning(f'Dialect {conn.dialect.name} cannot rename columns, copying table "{table_name}" instead')
+        rewrite_with_pandas(conn, table_name, lambda df: df.rename(columns=mapping), progress, mapping)
+        return mapping
+
+    with phase('alter'), begin_transaction(conn):
+        execute_renames(conn, table_name, mapping)
+    return mapping
+
+
+# Dialects whose SQL is rich enough to run the row cleaning operations on the server
+PUSHDOWN_DIALECTS = ('mysql', 'postgresql', 'sqlite', 'mssql', 'oracle')
+
+# Bookkeeping columns added by incremental imports (see incremental_import). Rows that only differ in
+# these columns are still duplicates of each other
+ROW_KEY_COLUMN = '_row_key'
+ROW_HASH_COLUMN = '_row_hash'
+ROW_HASH_COLUMNS = (ROW_KEY_COLUMN, ROW_HASH_COLUMN)
+
+
+def data_columns(columns):
+    """
+    Return the column names without the incremental import bookkeeping columns.
+    """
+    return [col for col in columns if col not in ROW_HASH_COLUMNS]
+
+
+def drop_duplicate_frame_rows(df):
+    """
+    Drop duplicate rows of a DataFrame, keeping the first, ignoring the bookkeeping columns.
+    """
+    return df.drop_duplicates(subset=data_columns(df.columns))
+
+
+def count_rows(conn, table_name):
+    """
+    Return the number of rows in a table.
+    """
+    return conn.exec_driver_sql(f'SELECT COUNT(*) FROM {quote_identifier(conn, table_name)}').scalar()
+
+
+def column_list(conn, columns):
+    """
+    Return the quoted, comma-separated list of the given column names.
+    """
+    return ', '.join(quote_identifier(conn, col) for col in columns)
+
+
+def null_condition(conn, columns):
+    """
+    Return a condition that is true for rows with a NULL in any of the given columns.
+    """
+    return ' OR '.join(f'{quote_identifier(conn, col)} IS NULL' for col in columns)
+
+
+def supports_windowed_delete(dialect, columns=None):
+    """
+    Return True if duplicates can be deleted in place with ROW_NUMBER() over a row identifier.
+
+    columns are the reflected columns of the table, if known.
+    """
+    if dialect.name == 'sqlite':
+        # A table with a primary key may be WITHOUT ROWID, which leaves no rowid to number the rows by
+        if columns and any(col.get('primary_key') for col in columns.values()):
+            return False
+        # Window functions arrived in SQLite 3.25
+        return (dialect.server_version_info or (0,)) >= (3, 25, 0)
+    return dialect.name in ('postgresql', 'mssql')
+
+
+# Suffix that distinguishes index names on a staging table in dialects where index names are schema-wide
+STAGED_INDEX_SUFFIX = '__staged'
+
+
+def _staging_index_name(conn, name):
+    """
+    Return the name an index gets while it lives on a staging table.
+    """
+    if conn.dialect.name in ('mysql', 'mssql'):
+        # Index names are scoped to their table, so the original name can be reused
+        return name
+    if conn.dialect.name == 'sqlite':
+        # The original index is dropped first (see _create_indexes); indexes staged by older versions get their name back
+        return name[:-len(STAGED_INDEX_SUFFIX)] if name.endswith(STAGED_INDEX_SUFFIX) else name
+    if name.endswith(STAGED_INDEX_SUFFIX):
+        return name[:-len(STAGED_INDEX_SUFFIX)]
+    return name + STAGED_INDEX_SUFFIX
+
+
+def reflect_keys(conn, table_name, mapping=None):
+    """
+    Return the primary key and index definitions of table_name with column names passed through mapping.
+
+    Returns (primary key dict, list of index dicts); both are empty if the table does not exist. Expression
+    indexes, which cannot be recreated from column names, are skipped.
+    """
+    mapping = mapping or {}
+    inspector = sal.inspect(conn)
+    if not inspector.has_table(table_name):
+        return {}, []
+    primary_key = inspector.get_pk_constraint(table_name) or {}
+    primary_key = {
+        'name': primary_key.get('name'),
+        'columns': [mapping.get(col, col) for col in primary_key.get('constrained_columns') or []],
+    }
+    indexes = [
+        {'name': index['name'], 'unique': index['unique'],
+         'columns': [mapping.get(col, col) for col in index['column_names']]}
+        for index in inspector.get_indexes(table_name)
+        if index.get('name') and all(index['column_names'])
+    ]
+    return primary_key, indexes
+
+
+def _create_indexes(conn, staging_name, indexes, columns):
+    """
+    Build the given indexes on the staging table, skipping any whose columns no longer exist.
+    """
+    staging = quote_identifier(conn, staging_name)
+    for index in indexes:
+        if not set(index['columns']) <= set(columns):
+            logging.warning(f'Not copying index "{index["name"]}": its columns are missing from the new data')
+            continue
+        if conn.dialect.name == 'sqlite':
+            # SQLite cannot rename an index, but its DDL is transactional: dropping the original table's index in
+            # the caller's transaction frees its name for the copy, and a failed write brings it back
+            conn.exec_driver_sql(f'DROP INDEX IF EXISTS {quote_identifier(conn, index["name"])}')
+        name = quote_identifier(conn, _staging_index_name(conn, index['name']))
+        unique = 'UNIQUE ' if index['unique'] else ''
+        conn.exec_driver_sql(f'CREATE {unique}INDEX {name} ON {staging} ({column_list(conn, index["columns"])})')
+
+
+def drop_table_if_exists(conn, table_name):
+    """
+    Drop a table if it exists.
+    """
+    if sal.inspect(conn).has_table(table_name):
+        conn.exec_driver_sql(f'DROP TABLE {quote_identifier(conn, table_name)}')
+
+
+def swap_tables(conn, table_name, staging_name, primary_key=None, indexes=()):
+    """
+    Atomically put staging_name in place of table_name and drop the old table, inside the caller's transaction.
+
+    On PostgreSQL and Oracle, where index names are schema-wide, the copied indexes and primary key are
+    renamed back to their original names once the old table is gone. SQL Server scopes index names to their
+    table but constraint names to the schema, so there only the primary key is renamed back.
+    """
+    dialect = conn.dialect.name
+    table = quote_identifier(conn, table_name)
+    staging = quote_identifier(conn, staging_name)
+    old = quote_identifier(conn, f'{table_name}__old')
+    exists = sal.inspect(conn).has_table(table_name)
+    if dialect == 'mysql':
+        # MySQL renames both tables in one atomic statement
+        conn.exec_driver_sql(f'RENAME TABLE {table} TO {old}, {staging} TO {table}' if exists
+                             else f'RENAME TABLE {staging} TO {table}')
+    elif dialect == 'mssql':
+        # SQL Server has no ALTER TABLE ... RENAME; sp_rename takes the new name unquoted
+        if exists:
+            conn.execute(sal.text('EXEC sp_rename :old_name, :new_name'),
+                         {'old_name': table, 'new_name': f'{table_name}__old'})
+        conn.execute(sal.text('EXEC sp_rename :old_name, :new_name'), {'old_name': staging, 'new_name': table_name})
+    else:
+        if exists:
+            conn.exec_driver_sql(f'ALTER TABLE {table} RENAME TO {old}')
+        conn.exec_driver_sql(f'ALTER TABLE {staging} RENAME TO {table}')
+    if exists:
+        conn.exec_driver_sql(f'DROP TABLE {old}')
+
+    if dialect in ('postgresql', 'oracle'):
+        for index in indexes:
+            staged = _staging_index_name(conn, index['name'])
+            if not index['name'].endswith(STAGED_INDEX_SUFFIX):
+                conn.exec_driver_sql(
+                    f'ALTER INDEX {quote_identifier(conn, staged)} RENAME TO {quote_identifier(conn, index["name"])}'
+                )
+    if dialect in ('postgresql', 'mssql') and primary_key and primary_key.get('name') and primary_key.get('columns'):
+        staged_pk = sal.inspect(conn).get_pk_constraint(table_name).get('name')
+        if staged_pk and staged_pk != primary_key['name']:
+            if dialect == 'mssql':
+                conn.execute(sal.text("EXEC sp_rename :old_name, :new_name, 'OBJECT'"),
+                             {'old_name': quote_identifier(conn, staged_pk), 'new_name': primary_key['name']})
+            else:
+                conn.exec_driver_sql(
+                    f'ALTER TABLE {table} RENAME CONSTRAINT {quote_identifier(conn, staged_pk)} '
+                    f'TO {quote_identifier(conn, primary_key["name"])}'
+                )
+
+
+def write_table(conn, table_name, chunks, dtype=None, mapping=None, progress=None):
+    """
+    Replace table_name with the rows of an iterable of DataFrames and return the number of rows written.
+
+    Rows are loaded with the connection's bulk loader (see bulk_loaders) into a staging table that gets the
+    original table's primary key and indexes (with column names passed through mapping), and the staging table
+    is then swapped in with an atomic rename, so readers never see a missing or half-filled table. If anything fails, the staging table is dropped
+    and the original table is left untouched.
+    """
+    primary_key, indexes = reflect_keys(conn, table_name, mapping)
+    staging_name = f'{table_name}__staging'
+    written = 0
+    try:
+        with begin_transaction(conn):
+            drop_table_if_exists(conn, staging_name)
+            columns = []
+            for i, chunk in enumerate(timed_iter(chunks, 'read')):
+                if i == 0:
+                    columns = list(chunk.columns)
+                    chunk_dtype = {col: dtype[col] for col in columns if col in dtype} if dtype else None
+                    keys = primary_key.get('columns')
+                    if keys and not set(keys) <= set(columns):
+                        logging.warning(f'Not copying the primary key of "{table_name}": its columns are missing from the new data')
+                        keys = None
+                    conn.exec_driver_sql(pd.io.sql.get_schema(chunk, staging_name, keys=keys or None, con=conn, dtype=chunk_dtype))
+                with phase('write'):
+                    bulk_load(conn, staging_name, chunk, chunk_dtype)
+                written += len(chunk)
+                record_rows(rows_out=len(chunk))
+                track(progress, len(chunk))
+            with phase('index'):
+                _create_indexes(conn, staging_name, indexes, columns)
+            with phase('swap'):
+                swap_tables(conn, table_name, staging_name, primary_key, indexes)
+    except BaseException:
+        # DDL is not transactional everywhere (MySQL), so make sure no staging table is left behind
+        with begin_transaction(conn):
+            drop_table_if_exists(conn, staging_name)
+        raise
+    return written
+
+
+def rebuild_table(conn, table_name, mapping=None, distinct=False, where=None):
+    """
+    Rebuild a table from one INSERT ... SELECT over itself and swap it in, returning the number of rows removed.
+
+    Runs inside the caller's transaction. The staging table keeps the column types, primary key and indexes
+    of the original, with columns renamed through mapping in the same pass.
+    """
+    mapping = mapping or {}
+    staging_name = f'{table_name}__rebuild'
+    primary_key, indexes = reflect_keys(conn, table_name, mapping)
+    source = sal.Table(table_name, sal.MetaData(), autoload_with=conn)
+    staging = sal.Table(staging_name, sal.MetaData(), *[
+        sal.Column(mapping.get(col.name, col.name), col.type, nullable=col.nullable, primary_key=col.primary_key)
+        for col in source.columns
+    ])
+    old_columns = [col.name for col in source.columns]
+    new_columns = [mapping.get(col, col) for col in old_columns]
+
+    if distinct and len(data_columns(old_columns)) < len(old_columns):
+        # The bookkeeping columns differ between duplicates, so group on the others and keep the smallest hashes
+        select = ', '.join(
+            f'MIN({quote_identifier(conn, col)})' if col in ROW_HASH_COLUMNS else quote_identifier(conn, col)
+            for col in old_columns
+        )
+        group_by = f' GROUP BY {column_list(conn, data_columns(old_columns))}'
+    else:
+        select = f'{"DISTINCT " if distinct else ""}{column_list(conn, old_columns)}'
+        group_by = ''
+    query = (
+        f'INSERT INTO {quote_identifier(conn, staging_name)} ({column_list(conn, new_columns)}) '
+        f'SELECT {select} FROM {quote_identifier(conn, table_name)}'
+    )
+    if where:
+        query += f' WHERE {where}'
+    query += group_by
+    before = count_rows(conn, table_name)
+    drop_table_if_exists(conn, staging_name)
+    staging.create(conn)
+    with phase('copy'):
+        inserted = conn.exec_driver_sql(query).rowcount
+    with phase('index'):
+        _create_indexes(conn, staging_name, indexes, new_columns)
+    with phase('swap'):
+        swap_tables(conn, table_name, staging_name, primary_key, indexes)
+    record_rows(rows_in=before, rows_out=inserted)
+    return before - inserted
+
+
+def rewrite_with_pandas(conn, table_name, transform, progress=None, mapping=None):
+    """
+    Read the whole table, apply transform to the DataFrame and write it back; return the rows removed.
+
+    Only used for dialects that cannot run the operation in SQL. mapping describes any column renames
+    transform makes, so the column types, primary key and indexes can follow the renamed columns.
+    """
+    mapping = mapping or {}
+    dtype = {mapping.get(name, name): col['type'] for name, col in reflect_columns(conn, table_name).items()}
+    with phase('read'):
+        df = pd.read_sql_table(table_name, conn)
+    record_rows(rows_in=len(df))
+    track(progress, len(df))
+    with phase('transform'):
+        cleaned = transform(df)
+    write_table(conn, table_name, [cleaned], dtype=dtype, mapping=mapping)
+    return len(df) - len(cleaned)
+
+
+def drop_na_rows(conn, table_name, progress=None):
+    """
+    Delete every row that has a NULL in any column and return the number of rows removed.
+    """
+    check_cancelled(progress)
+    if conn.dialect.name not in PUSHDOWN_DIALECTS:
+        return rewrite_with_pandas(conn, table_name, lambda df: df.dropna(), progress)
+
+    condition = null_condition(conn, reflect_columns(conn, table_name))
+    with phase('delete'), begin_transaction(conn):
+        removed = conn.exec_driver_sql(f'DELETE FROM {quote_identifier(conn, table_name)} WHERE {condition}').rowcount
+    record_rows(rows_affected=removed)
+    return removed
+
+
+def row_number_delete(conn, table_name, columns, extra_condition=None):
+    """
+    Build a DELETE that keeps the first physical row of every group of identical rows.
+
+    Rows matching extra_condition are deleted by the same statement.
+    """
+    table = quote_identifier(conn, table_name)
+    partition = column_list(conn, columns)
+    if conn.dialect.name == 'mssql':
+        condition = 'rn > 1' + (f' OR {extra_condition}' if extra_condition else '')
+        return (
+            f'WITH numbered AS (SELECT *, ROW_NUMBER() OVER (PARTITION BY {partition} ORDER BY (SELECT NULL)) AS rn '
+            f'FROM {table}) DELETE FROM numbered WHERE {condition}'
+        )
+    row_id = {'sqlite': 'rowid', 'postgresql': 'ctid'}[conn.dialect.name]
+    condition = f'{extra_condition} OR ' if extra_condition else ''
+    return (
+        f'DELETE FROM {table} WHERE {condition}{row_id} IN ('
+        f'SELECT {row_id} FROM (SELECT {row_id}, ROW_NUMBER() OVER (PARTITION BY {partition} ORDER BY {row_id}) AS rn '
+        f'FROM {table}) numbered WHERE rn > 1)'
+    )
+
+
+def remove_duplicate_rows(conn, table_name, progress=None):
+    """
+    Remove duplicate rows, keeping the first occurrence, and return the number of rows removed.
+
+    Dialects with window functions and a row identifier delete the extra rows with ROW_NUMBER(); other SQL
+    dialects rebuild the table with INSERT ... SELECT DISTINCT into a staging table and swap it in. Dialects
+    outside PUSHDOWN_DIALECTS are deduplicated in pandas, out of core once the table outgrows the memory
+    budget (see external_dedup).
+    """
+    check_cancelled(progress)
+    if conn.dialect.name not in PUSHDOWN_DIALECTS:
+        # Imported here because external_dedup builds on this module
+        from external_dedup import remove_duplicates_out_of_core
+        return remove_duplicates_out_of_core(conn, table_name, progress)
+
+    columns = reflect_columns(conn, table_name)
+    with begin_transaction(conn):
+        if supports_windowed_delete(conn.dialect, columns):
+            with phase('delete'):
+                removed = conn.exec_driver_sql(row_number_delete(conn, table_name, data_columns(columns))).rowcount
+            record_rows(rows_affected=removed)
+            return removed
+        return rebuild_table(conn, table_name, distinct=True)
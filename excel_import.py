@@ -0,0 +1,245 @@
+import itertools
+import os
+import pickle
+import tempfile
+
+import pandas as pd
+
+from database_operations import write_table
+import parse_cache
+from instrumentation import phase
+from progress import check_cancelled
+from schema_inference import SAMPLE_ROWS, apply_schema, infer_schema, sql_dtypes, widen_schema
+
+# Number of rows parsed and inserted per batch when importing a workbook
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def _header_names(values):
+    """
+    Turn the first sheet row into column names the way pandas.read_excel does.
+    """
+    names = []
+    counts = {}
+    for i, value in enumerate(values):
+        name = f'Unnamed: {i}' if value is None else str(value)
+        if name in counts:
+            counts[name] += 1
+            name = f'{name}.{counts[name]}'
+        else:
+            counts[name] = 0
+        names.append(name)
+    return names
+
+
+def _open_sheet_rows(file_path):
+    """
+    Return an iterator over the rows of the first sheet and the row count the file records, if any.
+
+    .xlsx workbooks are read lazily in openpyxl read-only mode.
+    """
+    if os.path.splitext(file_path)[1].lower() == '.xls':
+        # openpyxl cannot read the legacy binary format, so let pandas parse it in one go
+        df = pd.read_excel(file_path, header=None)
+        rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+        return (row for row in rows), len(df)
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    sheet = workbook.worksheets[0]
+
+    def rows():
+        try:
+            yield from sheet.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+    return rows(), sheet.max_row
+
+
+def _pad_row(row, width):
+    """
+    Cut or pad a sheet row with None to the width of the header row.
+    """
+    return tuple(row[:width]) + (None,) * (width - len(row))
+
+
+def infer_excel_schema(file_path, sample_rows=SAMPLE_ROWS, use_cache=True):
+    """
+    Infer the column types of the first sheet of a workbook from its first sample_rows data rows.
+
+    With use_cache, the schema inferred the last time an unchanged workbook was imported is reused
+    without opening the workbook.
+    """
+    use_cache = use_cache and sample_rows == SAMPLE_ROWS and parse_cache.enabled()
+    if use_cache:
+        schema = parse_cache.load_schema(file_path)
+        if schema is not None:
+            return schema
+
+    rows, _ = _open_sheet_rows(file_path)
+    try:
+        columns = _header_names(next(rows, ()))
+        sample = [_pad_row(row, len(columns)) for row in itertools.islice(rows, sample_rows)]
+        # The sample covers the sheet if nothing but blank rows follows it
+        fully_sampled = all(all(value is None for value in row) for row in rows)
+    finally:
+        rows.close()
+    schema = infer_schema(columns, sample, fully_sampled)
+    if use_cache:
+        parse_cache.store_schema(file_path, schema)
+    return schema
+
+
+def _parse_excel_chunks(file_path, chunk_size, progress, schema):
+    """
+    Yield the first sheet of a workbook as DataFrames of at most chunk_size rows.
+
+    Only one batch of rows is held in memory at a time. At least one (possibly empty) DataFrame is yielded
+    so callers can always create the table from the header row. If progress is given, its total is set
+    to the number of data rows the workbook declares. With a schema, each batch is cast to its dtypes.
+    """
+    rows, row_count = _open_sheet_rows(file_path)
+    if progress is not None and row_count:
+        progress.set_total(max(row_count - 1, 0))
+    columns = _header_names(next(rows, ()))
+    width = len(columns)
+    batch = []
+    blank_rows = []
+    yielded = False
+
+    def frame(batch_rows):
+        df = pd.DataFrame(batch_rows, columns=columns)
+        return apply_schema(df, schema) if schema else df
+
+    for row in rows:
+        row = _pad_row(row, width)
+        if all(value is None for value in row):
+            # Blank rows are only kept if more data follows, matching read_excel's trimming of the sheet end
+            blank_rows.append(row)
+            continue
+        batch.extend(blank_rows)
+        blank_rows.clear()
+        batch.append(row)
+        while len(batch) >= chunk_size:
+            yield frame(batch[:chunk_size])
+            batch = batch[chunk_size:]
+            yielded = True
+
+    if batch or not yielded:
+        yield frame(batch)
+
+
+def _reporting(chunks, progress):
+    """
+    Yield chunks unchanged, reporting the rows parsed so far to an optional progress tracker.
+    """
+    rows = 0
+    for df in chunks:
+        rows += len(df)
+        if progress is not None:
+            progress.report(f'{rows:,} rows parsed')
+        yield df
+
+
+def _read_spool(spool):
+    """
+    Yield the DataFrames pickled into a spool file, closing (and so deleting) it at the end.
+    """
+    with spool:
+        while True:
+            try:
+                yield pickle.load(spool)
+            except EOFError:
+                return
+
+
+def _spooled(chunks):
+    """
+    Pickle every DataFrame of chunks into an anonymous temporary file and return an iterator reading them back.
+
+    The file is deleted when the iterator is exhausted, closed or garbage collected.
+    """
+    spool = tempfile.TemporaryFile(prefix='sqlmanager-spool-')
+    try:
+        for df in chunks:
+            pickle.dump(df, spool, protocol=pickle.HIGHEST_PROTOCOL)
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    return _read_spool(spool)
+
+
+def _widened(file_path, chunk_size, progress, schema):
+    """
+    Spool the raw DataFrames of a workbook, widening the columns of schema to hold every value on the way.
+
+    Return the widened schema and an iterator over the raw DataFrames.
+    """
+    widened = dict(schema)
+
+    def widening(chunks):
+        nonlocal widened
+        for df in chunks:
+            widened = widen_schema(widened, df)
+            yield df
+
+    raw = _spooled(widening(_reporting(_parse_excel_chunks(file_path, chunk_size, progress, None), progress)))
+    return widened, raw
+
+
+def prepare_excel_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE, progress=None, schema=None, use_cache=True):
+    """
+    Parse the whole first sheet of a workbook up front and return the schema it was parsed with and an
+    iterator over its DataFrames.
+
+    Importers call this before they open their write transaction, so the slow part of an import never runs
+    while the database is locked and parallel imports into SQLite parse their workbooks at the same time.
+    When schema was inferred from the top of the sheet, its columns are first widened to hold the values
+    of every row (see ColumnSchema.widen), so the returned schema, which the table must be created with,
+    can be wider than the one given. With a schema and use_cache, the parsed sheet is written to the parse
+    cache and read back from its memory-mapped Arrow file; otherwise it is spooled to a temporary file.
+    """
+    check_cancelled(progress)
+    caching = schema and use_cache and parse_cache.enabled()
+    if caching:
+        cached = parse_cache.cached_chunks(file_path, schema, chunk_size, progress)
+        if cached is not None:
+            return cached
+    if schema and not all(column.fully_sampled for column in schema.values()):
+        parsed_schema, raw = _widened(file_path, chunk_size, progress, schema)
+        parsed = (apply_schema(df, parsed_schema) for df in raw)
+    else:
+        parsed_schema = schema
+        parsed = _reporting(_parse_excel_chunks(file_path, chunk_size, progress, schema), progress)
+    if caching:
+        for _ in parse_cache.cache_chunks(file_path, schema, parsed, parsed_schema):
+            pass
+        cached = parse_cache.cached_chunks(file_path, schema, chunk_size, progress)
+        if cached is not None:
+            return cached
+        # The cache could not be written (e.g. the disk is full), so parse the sheet again into a spool file
+        return prepare_excel_chunks(file_path, chunk_size, progress, schema, use_cache=False)
+    return parsed_schema, _spooled(parsed)
+
+
+def import_excel_file(conn, file_path, table_name, chunk_size=DEFAULT_CHUNK_SIZE, progress=None, schema=None,
+                      use_cache=True):
+    """
+    Stream an Excel workbook into table_name, replacing the table, and return the number of rows imported.
+
+    Columns are created with the types of schema, a {name: ColumnSchema} mapping that is inferred from a
+    sample of the sheet when not given, and each batch is held in memory with the matching compact dtypes.
+    The workbook is parsed in full with prepare_excel_chunks before the write transaction starts, and its rows
+    are then loaded in batches of chunk_size with the connection's bulk loader. The batches go into a
+    staging table that is swapped in once the whole workbook has loaded, keeping the primary key and
+    indexes of the table it replaces. With use_cache, an unchanged workbook is read from the parse cache.
+    """
+    if schema is None:
+        with phase('infer'):
+            schema = infer_excel_schema(file_path, use_cache=use_cache)
+    with phase('parse'):
+        schema, chunks = prepare_excel_chunks(file_path, chunk_size, progress, schema, use_cache)
+    return write_table(conn, table_name, chunks, dtype=sql_dtypes(schema), progress=progress)
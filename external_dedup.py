@@ -0,0 +1,266 @@
+import logging
+import math
+import os
+import pickle
+import shutil
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from database_operations import count_rows, data_columns, reflect_columns, write_table
+from instrumentation import phase, record_rows
+from metadata_cache import estimate_row_counts
+from progress import check_cancelled, track
+from row_hashing import hash_rows
+
+# Set this environment variable to the number of MiB deduplication may hold in memory
+MEMORY_BUDGET_ENV_VAR = 'SQLMANAGER_MEMORY_BUDGET_MB'
+DEFAULT_MEMORY_BUDGET_MB = 1024
+# Rows read from the table per batch
+READ_CHUNK_ROWS = 50000
+# drop_duplicates needs about this multiple of a DataFrame's size while it runs
+DEDUP_MEMORY_FACTOR = 3
+# Upper bound on the spill files open at once
+MAX_BUCKETS = 256
+# Column recording the position of every row in the table, so the survivors can be written back in order
+SEQUENCE_COLUMN = '__seq'
+
+
+def memory_budget():
+    """
+    Return the memory budget for deduplication in bytes, from MEMORY_BUDGET_ENV_VAR or the default.
+    """
+    value = os.environ.get(MEMORY_BUDGET_ENV_VAR, '').strip()
+    if value:
+        try:
+            if float(value) > 0:
+                return int(float(value) * 2 ** 20)
+        except ValueError:
+            pass
+        logging.warning(f'Ignoring invalid {MEMORY_BUDGET_ENV_VAR}={value!r}')
+    return DEFAULT_MEMORY_BUDGET_MB * 2 ** 20
+
+
+def _frame_bytes(df):
+    """
+    Return the memory a DataFrame takes, including the strings it holds.
+    """
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+
+def read_chunks(conn, table_name, chunk_size=READ_CHUNK_ROWS):
+    """
+    Yield a table as DataFrames of at most chunk_size rows, streamed from the server where the driver allows.
+    """
+    previous = conn.get_execution_options().get('stream_results', False)
+    conn.execution_options(stream_results=True)
+    try:
+        yield from pd.read_sql_table(table_name, conn, chunksize=chunk_size)
+    finally:
+        conn.execution_options(stream_results=previous)
+
+
+def _dump(f, df):
+    """
+    Append a DataFrame to an open spill file.
+    """
+    pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load(path):
+    """
+    Yield the DataFrames appended to a spill file, in the order they were written.
+    """
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def dedup_bucket(path, columns, block_rows):
+    """
+    Drop the duplicate rows of one spill file, keeping the first, and write the survivors to a new file.
+
+    Runs in a worker process. The rows of a bucket are in table order, so the survivors are too; they are
+    written in blocks of block_rows for the ordered merge. Returns (survivors path, rows in, rows out).
+    """
+    frames = list(_load(path))
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    os.remove(path)
+    rows_in = len(df)
+    if rows_in:
+        df = df.drop_duplicates(subset=columns)
+    out_path = f'{path}.out'
+    with open(out_path, 'wb') as f:
+        for start in range(0, len(df), block_rows):
+            _dump(f, df.iloc[start:start + block_rows])
+    return out_path, rows_in, len(df)
+
+
+def merge_in_order(paths):
+    """
+    Yield the rows of several survivor files, each in table order, as DataFrames in overall table order.
+
+    Holds one block per file at a time. Every round emits the rows of all current blocks up to the smallest
+    last position among them, which takes at least one whole block, so the merge always advances.
+    """
+    heads = {}
+    for path in paths:
+        blocks = _load(path)
+        block = next(blocks, None)
+        if block is not None:
+            heads[path] = (block, blocks)
+    while heads:
+        limit = min(block[SEQUENCE_COLUMN].iloc[-1] for block, _ in heads.values())
+        parts = []
+        for path, (block, blocks) in list(heads.items()):
+            taken = int(block[SEQUENCE_COLUMN].searchsorted(limit, side='right'))
+            parts.append(block.iloc[:taken])
+            block = block.iloc[taken:]
+            if not len(block):
+                block = next(blocks, None)
+            if block is None:
+                del heads[path]
+            else:
+                heads[path] = (block, blocks)
+        merged = pd.concat(parts).sort_values(SEQUENCE_COLUMN, kind='stable').drop(columns=SEQUENCE_COLUMN)
+        # Hand the rows on in read-sized batches, so the bulk loader never converts a large batch at once
+        for start in range(0, len(merged), READ_CHUNK_ROWS):
+            yield merged.iloc[start:start + READ_CHUNK_ROWS].reset_index(drop=True)
+
+
+def _bucket_count(total_bytes, budget, workers):
+    """
+    Return how many buckets keep every bucket deduplicated at once by the workers within budget.
+    """
+    return max(workers, min(MAX_BUCKETS, math.ceil(total_bytes * DEDUP_MEMORY_FACTOR * workers / budget)))
+
+
+class _Spill:
+    """
+    Hash-partitioned spill files under a temporary directory, one per bucket.
+    """
+
+    def __init__(self, directory, buckets, columns):
+        self.columns = columns
+        self.paths = [os.path.join(directory, f'bucket{i:03d}.pkl') for i in range(buckets)]
+        self.files = [open(path, 'wb') for path in self.paths]
+
+    def write(self, df):
+        """
+        Append the rows of df to the buckets their hashes fall in, keeping their order within each bucket.
+        """
+        buckets = hash_rows(df, self.columns) % np.uint64(len(self.files))
+        order = np.argsort(buckets, kind='stable')
+        bounds = np.searchsorted(buckets[order], np.arange(len(self.files) + 1))
+        for i, f in enumerate(self.files):
+            if bounds[i] < bounds[i + 1]:
+                _dump(f, df.iloc[order[bounds[i]:bounds[i + 1]]])
+
+    def close(self):
+        """
+        Close every spill file.
+        """
+        for f in self.files:
+            f.close()
+
+
+def _dedup_buckets(paths, columns, workers, block_rows, progress=None):
+    """
+    Deduplicate the spill files in parallel worker processes and return the paths of the survivor files.
+    """
+    survivors = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+        pending = {executor.submit(dedup_bucket, path, columns, block_rows) for path in paths}
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                survivors += [future.result()[0] for future in done]
+                if progress is not None:
+                    progress.report(f'{len(survivors)}/{len(paths)} buckets deduplicated')
+        except BaseException:
+            executor.shutdown(cancel_futures=True)
+            raise
+    return survivors
+
+
+def remove_duplicates_out_of_core(conn, table_name, progress=None, transform=None, mapping=None, budget=None,
+                                  workers=None):
+    """
+    Remove duplicate rows from a table of any size, keeping the first occurrence; return the rows removed.
+
+    The table is streamed in chunks, passed through transform (a row-wise DataFrame function such as renames
+    and dropna, with its renames described by mapping) and kept in memory while it fits in budget bytes, in
+    which case it is deduplicated like the in-memory path. A larger table is hash-partitioned into spill files
+    by the values of its rows, so duplicates always share a bucket; the buckets are deduplicated in parallel
+    worker processes and the survivors are merged back into table order and written with write_table. The
+    result is the same as drop_duplicates over the whole table.
+    """
+    mapping = mapping or {}
+    budget = budget or memory_budget()
+    workers = max(1, workers or os.cpu_count() or 1)
+    dtype = {mapping.get(name, name): col['type'] for name, col in reflect_columns(conn, table_name).items()}
+    # Sizes the buckets if the table has to be spilled. It is read before streaming starts, as most drivers
+    # cannot run another query while a streaming cursor is open; the catalog estimate spares a full scan
+    expected_rows = estimate_row_counts(conn, [table_name]).get(table_name)
+    if expected_rows is None:
+        expected_rows = count_rows(conn, table_name)
+    rows_in = 0
+    position = 0
+    held = []
+    held_bytes = 0
+    spill = None
+    directory = None
+    try:
+        with phase('read'):
+            for chunk in read_chunks(conn, table_name):
+                rows_in += len(chunk)
+                track(progress, len(chunk))
+                if transform is not None:
+                    chunk = transform(chunk)
+                chunk[SEQUENCE_COLUMN] = np.arange(position, position + len(chunk))
+                position += len(chunk)
+                if spill is not None:
+                    spill.write(chunk)
+                    continue
+                held.append(chunk)
+                held_bytes += _frame_bytes(chunk)
+                if held_bytes * DEDUP_MEMORY_FACTOR <= budget:
+                    continue
+                # The table does not fit: size the buckets from the bytes per row seen so far and spill
+                row_bytes = held_bytes / max(position, 1)
+                buckets = _bucket_count(row_bytes * max(expected_rows, position), budget, workers)
+                directory = tempfile.mkdtemp(prefix='sqlmanager-dedup-')
+                logging.info(f'Deduplicating "{table_name}" out of core in {buckets} buckets under {directory}')
+                spill = _Spill(directory, buckets, data_columns(chunk.columns.drop(SEQUENCE_COLUMN)))
+                with phase('partition'):
+                    for df in held:
+                        spill.write(df)
+                held = []
+        record_rows(rows_in=rows_in)
+
+        if spill is None:
+            if not held:
+                return 0
+            with phase('transform'):
+                df = pd.concat(held, ignore_index=True).drop(columns=SEQUENCE_COLUMN)
+                held = []
+                cleaned = df.drop_duplicates(subset=data_columns(df.columns))
+            return rows_in - write_table(conn, table_name, [cleaned], dtype=dtype, mapping=mapping)
+
+        spill.close()
+        check_cancelled(progress)
+        # The merge holds one block of every bucket and sorts their union, which has to fit in the budget
+        block_rows = max(1, int(budget / (DEDUP_MEMORY_FACTOR * len(spill.paths) * row_bytes)))
+        with phase('dedup'):
+            survivors = _dedup_buckets(spill.paths, spill.columns, workers, block_rows, progress)
+        return rows_in - write_table(conn, table_name, merge_in_order(survivors), dtype=dtype, mapping=mapping)
+    finally:
+        if spill is not None:
+            spill.close()
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,270 @@
+import logging
+
+import pandas as pd
+import sqlalchemy as sal
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from bulk_loaders import bulk_load
+from database_operations import (
+    ROW_HASH_COLUMN, ROW_HASH_COLUMNS, ROW_KEY_COLUMN, begin_transaction, describe_table,
+    quote_identifier, write_table
+)
+from excel_import import DEFAULT_CHUNK_SIZE, infer_excel_schema, prepare_excel_chunks
+from instrumentation import phase, record_rows, timed_iter
+from progress import check_cancelled, track
+from row_hashing import row_hashes
+from schema_inference import sql_dtypes
+
+# The bookkeeping columns hold 16 hex digits of hash plus, for repeated rows, an occurrence counter
+ROW_HASH_LENGTH = 40
+# Keys looked up or removed per ... WHERE _row_key IN (...) statement
+KEY_BATCH_SIZE = 1000
+# Temporary table collecting the row keys of the workbook while it is compared with the table
+SEEN_KEYS_TABLE = '_sqlmanager_seen_keys'
+
+
+def hashed_chunks(chunks, key_columns=None):
+    """
+    Yield the DataFrames of chunks with the ROW_KEY_COLUMN and ROW_HASH_COLUMN bookkeeping columns added.
+
+    ROW_HASH_COLUMN hashes the whole row. ROW_KEY_COLUMN identifies the row: the hash of key_columns if given,
+    otherwise the row hash with a counter appended to the second and later copies of a repeated row.
+    """
+    occurrences = {}
+    for df in chunks:
+        content = row_hashes(df, list(df.columns))
+        if key_columns:
+            keys = row_hashes(df, key_columns)
+        else:
+            keys = []
+            for value in content:
+                count = occurrences.get(value, 0)
+                occurrences[value] = count + 1
+                keys.append(f'{value}.{count}' if count else value)
+        df[ROW_KEY_COLUMN] = keys
+        df[ROW_HASH_COLUMN] = content
+        yield df
+
+
+def _records(df):
+    """
+    Convert a DataFrame to a list of row dictionaries of plain Python values for SQLAlchemy.
+    """
+    records = df.astype(object).where(df.notna(), None).to_dict('records')
+    dates = [col for col in df.columns if pd.api.types.is_datetime64_any_dtype(df[col])]
+    for record in records:
+        for col in dates:
+            if record[col] is not None:
+                record[col] = record[col].to_pydatetime()
+    return records
+
+
+def _key_index_name(table_name):
+    """
+    Return the name of the unique index on a table's ROW_KEY_COLUMN.
+    """
+    return f'{table_name[:48]}__row_key'
+
+
+def ensure_key_index(conn, table_name):
+    """
+    Create the unique index on ROW_KEY_COLUMN that upserts rely on, if the table does not have one yet.
+    """
+    for index in sal.inspect(conn).get_indexes(table_name):
+        if index['unique'] and index['column_names'] == [ROW_KEY_COLUMN]:
+            return
+    conn.exec_driver_sql(
+        f'CREATE UNIQUE INDEX {quote_identifier(conn, _key_index_name(table_name))} '
+        f'ON {quote_identifier(conn, table_name)} ({quote_identifier(conn, ROW_KEY_COLUMN)})'
+    )
+
+
+def has_row_hashes(conn, table_name, columns):
+    """
+    Return True if a table can be updated incrementally: it exists and its columns are exactly columns plus
+    the bookkeeping columns.
+
+    That is not the case, for example, for a table created by a full import.
+    """
+    reflected = describe_table(conn, table_name)
+    return reflected is not None and {col['name'] for col in reflected} == set(columns) | set(ROW_HASH_COLUMNS)
+
+
+def _batches(keys):
+    """
+    Yield keys in lists of at most KEY_BATCH_SIZE.
+    """
+    keys = list(keys)
+    for start in range(0, len(keys), KEY_BATCH_SIZE):
+        yield keys[start:start + KEY_BATCH_SIZE]
+
+
+def stored_hashes(conn, table, keys):
+    """
+    Return the {row key: row hash} mapping stored in table for those of keys it holds.
+    """
+    stored = {}
+    query = sal.select(table.c[ROW_KEY_COLUMN], table.c[ROW_HASH_COLUMN])
+    for batch in _batches(keys):
+        stored.update(conn.execute(query.where(table.c[ROW_KEY_COLUMN].in_(batch))).all())
+    return stored
+
+
+def seen_keys(conn, seen, keys):
+    """
+    Return the set of keys already collected in the seen keys table.
+    """
+    found = set()
+    query = sal.select(seen.c[ROW_KEY_COLUMN])
+    for batch in _batches(keys):
+        found.update(conn.execute(query.where(seen.c[ROW_KEY_COLUMN].in_(batch))).scalars())
+    return found
+
+
+def create_seen_keys_table(conn):
+    """
+    Create an empty temporary table for the row keys of the workbook being imported and return it.
+
+    Temporary tables are private to the connection. One left behind by an import that failed on MySQL, where
+    creating a temporary table is not undone by a rollback, is dropped first.
+    """
+    if conn.dialect.name == 'mssql':
+        name, prefixes = f'#{SEEN_KEYS_TABLE}', []
+    else:
+        name, prefixes = SEEN_KEYS_TABLE, ['TEMPORARY']
+    table = sal.Table(
+        name, sal.MetaData(), sal.Column(ROW_KEY_COLUMN, sal.String(ROW_HASH_LENGTH), primary_key=True),
+        prefixes=prefixes
+    )
+    table.drop(conn, checkfirst=True)
+    table.create(conn)
+    return table
+
+
+def supports_upsert(dialect):
+    """
+    Return True if the dialect has an INSERT that updates the row on a key conflict.
+    """
+    if dialect.name == 'sqlite':
+        # INSERT ... ON CONFLICT DO UPDATE arrived in SQLite 3.24
+        return (dialect.server_version_info or (0,)) >= (3, 24, 0)
+    return dialect.name in ('mysql', 'postgresql')
+
+
+def upsert_rows(conn, table, df):
+    """
+    Write rows whose ROW_KEY_COLUMN already exists in table, replacing the stored rows.
+
+    Uses INSERT ... ON DUPLICATE KEY UPDATE on MySQL and INSERT ... ON CONFLICT DO UPDATE on PostgreSQL and
+    SQLite; other dialects delete the old rows and insert the new ones.
+    """
+    records = _records(df)
+    updated = [col for col in df.columns if col != ROW_KEY_COLUMN]
+    dialect = conn.dialect
+    if not supports_upsert(dialect):
+        delete_keys(conn, table, list(df[ROW_KEY_COLUMN]))
+        conn.execute(table.insert(), records)
+        return
+    if dialect.name == 'mysql':
+        statement = mysql.insert(table)
+        statement = statement.on_duplicate_key_update({col: statement.inserted[col] for col in updated})
+    else:
+        statement = (postgresql if dialect.name == 'postgresql' else sqlite).insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[ROW_KEY_COLUMN], set_={col: statement.excluded[col] for col in updated}
+        )
+    conn.execute(statement, records)
+
+
+def delete_keys(conn, table, keys):
+    """
+    Delete the rows with the given ROW_KEY_COLUMN values, KEY_BATCH_SIZE keys per statement.
+    """
+    for batch in _batches(keys):
+        conn.execute(table.delete().where(table.c[ROW_KEY_COLUMN].in_(batch)))
+
+
+def import_excel_incremental(conn, file_path, table_name, key_columns=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                             progress=None, schema=None, use_cache=True):
+    """
+    Bring table_name in line with an Excel workbook by writing only the rows that changed.
+
+    Every row is identified by a hash of its values, or of key_columns if given, and stored with that hash
+    in the table. A re-import looks up the stored hashes of each chunk by key, bulk loads the new rows,
+    upserts the rows whose values changed and deletes the rows that are gone from the workbook, all in one
+    transaction, so its cost follows the size of the change. The keys of the workbook are collected in a
+    temporary table that the deletion is checked against, so neither the stored hashes nor the keys are
+    held in memory. Without key_columns a changed row counts as one deleted and one inserted row. If the
+    table does not exist yet, or its columns do not match the workbook, it is replaced with a full import
+    that adds the hashes.
+
+    Returns a dictionary with the numbers of rows inserted, updated, deleted and unchanged, and whether
+    the table was replaced.
+    """
+    key_columns = list(key_columns or [])
+    if schema is None:
+        with phase('infer'):
+            schema = infer_excel_schema(file_path, use_cache=use_cache)
+    missing = [col for col in key_columns if col not in schema]
+    if missing:
+        raise ValueError(f'Key columns not found in the workbook: {", ".join(missing)}')
+    reserved = [col for col in schema if col in ROW_HASH_COLUMNS]
+    if reserved:
+        raise ValueError(f'The workbook uses reserved column names: {", ".join(reserved)}')
+
+    with phase('parse'):
+        # Parsed before any transaction opens, so the database is only locked while rows are written
+        schema, chunks = prepare_excel_chunks(file_path, chunk_size, progress, schema, use_cache)
+        chunks = hashed_chunks(chunks, key_columns)
+    dtype = sql_dtypes(schema)
+    dtype.update({col: sal.String(ROW_HASH_LENGTH) for col in ROW_HASH_COLUMNS})
+    counts = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0, 'replaced': False}
+
+    with phase('diff'):
+        incremental = has_row_hashes(conn, table_name, list(schema))
+    if not incremental:
+        logging.warning(f'Table "{table_name}" has no matching row hashes, replacing it with a full import')
+        counts['inserted'] = write_table(conn, table_name, chunks, dtype=dtype, progress=progress)
+        counts['replaced'] = True
+        with phase('index'), begin_transaction(conn):
+            ensure_key_index(conn, table_name)
+        return counts
+
+    rows_in = 0
+    with begin_transaction(conn):
+        ensure_key_index(conn, table_name)
+        table = sal.Table(table_name, sal.MetaData(), autoload_with=conn)
+        seen = create_seen_keys_table(conn)
+        for df in timed_iter(chunks, 'read'):
+            keys = df[ROW_KEY_COLUMN]
+            with phase('diff'):
+                duplicated = keys.duplicated() | keys.isin(seen_keys(conn, seen, keys))
+                if duplicated.any():
+                    example = df.loc[duplicated, key_columns].iloc[0].to_dict()
+                    raise ValueError(f'Key columns {", ".join(key_columns)} are not unique, e.g. {example}')
+                if len(keys):
+                    conn.execute(seen.insert(), [{ROW_KEY_COLUMN: key} for key in keys])
+                stored = keys.map(stored_hashes(conn, table, keys))
+            new_rows = df[stored.isna()]
+            changed = df[stored.notna() & (stored != df[ROW_HASH_COLUMN])]
+            with phase('write'):
+                if len(new_rows):
+                    bulk_load(conn, table_name, new_rows, dtype)
+                if len(changed):
+                    upsert_rows(conn, table, changed)
+            counts['inserted'] += len(new_rows)
+            counts['updated'] += len(changed)
+            counts['unchanged'] += len(df) - len(new_rows) - len(changed)
+            rows_in += len(df)
+            track(progress, len(df))
+
+        check_cancelled(progress)
+        with phase('delete'):
+            removed = conn.execute(
+                table.delete().where(table.c[ROW_KEY_COLUMN].not_in(sal.select(seen.c[ROW_KEY_COLUMN])))
+            )
+            seen.drop(conn)
+        counts['deleted'] = removed.rowcount
+
+    record_rows(rows_in=rows_in, rows_affected=counts['inserted'] + counts['updated'] + counts['deleted'])
+    return counts
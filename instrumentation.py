@@ -0,0 +1,269 @@
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import sqlalchemy as sal
+
+from progress import OperationCancelled
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Metrics are written as one JSON object per line to the same log file as the errors
+metrics_logger = logging.getLogger('metrics')
+metrics_logger.setLevel(logging.INFO)
+
+# Set this environment variable to 1 to profile every operation with cProfile and tracemalloc
+PROFILE_ENV_VAR = 'SQLMANAGER_PROFILE'
+PROFILE_DIR = 'profiles'
+PROFILE_TOP_STATS = 10
+
+# How often the resident set size is sampled while an operation runs
+RSS_SAMPLE_SECONDS = 0.05
+
+_current_metrics = contextvars.ContextVar('current_metrics', default=None)
+
+
+def _process_peak_rss_mb():
+    """
+    Return the peak resident set size of the whole process so far in megabytes, or None where it is not available.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024) / 2 ** 20
+
+
+def _current_rss_mb():
+    """
+    Return the current resident set size of the process in megabytes, or None where it cannot be read.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+@contextmanager
+def _sample_rss(metrics):
+    """
+    Measure the memory used by the block and store it in metrics.
+
+    Where the current RSS can be read, it is sampled every RSS_SAMPLE_SECONDS on a background thread, giving
+    the peak during the block and its growth over the value at entry. Elsewhere only ru_maxrss is available,
+    and the growth is how far the block raised the process high-water mark, which is zero when an earlier
+    operation peaked higher.
+    """
+    entry = _current_rss_mb()
+    if entry is None:
+        entry_peak = _process_peak_rss_mb()
+        try:
+            yield
+        finally:
+            metrics.process_peak_rss_mb = _process_peak_rss_mb()
+            if entry_peak is not None:
+                metrics.rss_growth_mb = metrics.process_peak_rss_mb - entry_peak
+        return
+
+    peak = entry
+    stop = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not stop.wait(RSS_SAMPLE_SECONDS):
+            peak = max(peak, _current_rss_mb() or 0)
+
+    sampler = threading.Thread(target=sample, name='rss-sampler', daemon=True)
+    sampler.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        sampler.join()
+        metrics.peak_rss_mb = max(peak, _current_rss_mb() or 0)
+        metrics.rss_growth_mb = metrics.peak_rss_mb - entry
+        metrics.process_peak_rss_mb = _process_peak_rss_mb()
+
+
+def _round_mb(value):
+    """
+    Round a size in megabytes for the JSON record, leaving None as it is.
+    """
+    return None if value is None else round(value, 1)
+
+
+class OperationMetrics:
+    """
+    Timings, row counts, statement counts and memory use collected while one operation runs.
+    """
+
+    def __init__(self, operation, table_name=None):
+        self.operation = operation
+        self.table_name = table_name
+        self.status = 'running'
+        self.phases = {}
+        self.rows_in = None
+        self.rows_out = None
+        self.rows_affected = None
+        self.statements = 0
+        self.seconds = 0.0
+        self.peak_rss_mb = None
+        self.rss_growth_mb = None
+        self.process_peak_rss_mb = None
+        self.peak_traced_mb = None
+        self.profile_path = None
+        self.top_allocations = None
+
+    def add_phase(self, name, seconds):
+        """
+        Add seconds to the running total of a phase.
+        """
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_rows(self, rows_in=None, rows_out=None, rows_affected=None):
+        """
+        Add to the row counters that are given.
+        """
+        if rows_in is not None:
+            self.rows_in = (self.rows_in or 0) + rows_in
+        if rows_out is not None:
+            self.rows_out = (self.rows_out or 0) + rows_out
+        if rows_affected is not None:
+            self.rows_affected = (self.rows_affected or 0) + rows_affected
+
+    def to_record(self):
+        """
+        Return the metrics as a JSON-serialisable dictionary.
+        """
+        record = {
+            'event': 'operation', 'operation': self.operation, 'table': self.table_name, 'status': self.status,
+            'seconds': round(self.seconds, 4), 'phases': {name: round(value, 4) for name, value in self.phases.items()},
+            'rows_in': self.rows_in, 'rows_out': self.rows_out, 'rows_affected': self.rows_affected,
+            'statements': self.statements, 'peak_rss_mb': _round_mb(self.peak_rss_mb),
+            'rss_growth_mb': _round_mb(self.rss_growth_mb), 'process_peak_rss_mb': _round_mb(self.process_peak_rss_mb),
+        }
+        if self.peak_traced_mb is not None:
+            record.update(peak_traced_mb=round(self.peak_traced_mb, 1), profile=self.profile_path,
+                          top_allocations=self.top_allocations)
+        return record
+
+    def summary(self):
+        """
+        Return a one-line summary for the status bar.
+        """
+        parts = [f'{self.operation} took {self.seconds:.2f}s']
+        if self.phases:
+            parts.append(' / '.join(f'{name} {value:.2f}s' for name, value in self.phases.items()))
+        if self.rows_in is not None:
+            parts.append(f'{self.rows_in:,} rows in')
+        if self.rows_out is not None:
+            parts.append(f'{self.rows_out:,} rows out')
+        if self.rows_affected is not None:
+            parts.append(f'{self.rows_affected:,} rows affected')
+        parts.append(f'{self.statements} SQL statements')
+        if self.peak_rss_mb is not None:
+            parts.append(f'peak {self.peak_rss_mb:,.0f} MB (+{self.rss_growth_mb:,.0f} MB)')
+        elif self.rss_growth_mb is not None:
+            parts.append(f'process peak +{self.rss_growth_mb:,.0f} MB')
+        return ', '.join(parts)
+
+
+def profiling_enabled():
+    """
+    Return True if the profiling hook has been switched on through the environment.
+    """
+    return os.environ.get(PROFILE_ENV_VAR, '').lower() in ('1', 'true', 'yes')
+
+
+@contextmanager
+def instrument(conn, operation, table_name=None, profile=None):
+    """
+    Collect OperationMetrics for the operation run inside the block and log them as JSON when it ends.
+
+    Statements executed on conn are counted. With profile (by default taken from SQLMANAGER_PROFILE), the
+    block also runs under cProfile, whose stats are saved under PROFILE_DIR, and tracemalloc, whose peak
+    and top allocation sites are added to the record.
+    """
+    metrics = OperationMetrics(operation, table_name)
+    profile = profiling_enabled() if profile is None else profile
+
+    def count_statement(*args):
+        metrics.statements += 1
+
+    sal.event.listen(conn, 'before_cursor_execute', count_statement)
+    token = _current_metrics.set(metrics)
+    profiler = None
+    if profile:
+        profiler = cProfile.Profile()
+        tracemalloc.start()
+        profiler.enable()
+    started = time.perf_counter()
+    try:
+        with _sample_rss(metrics):
+            yield metrics
+        metrics.status = 'ok'
+    except BaseException as e:
+        metrics.status = 'cancelled' if isinstance(e, OperationCancelled) else 'failed'
+        raise
+    finally:
+        metrics.seconds = time.perf_counter() - started
+        if profiler is not None:
+            profiler.disable()
+            _, peak = tracemalloc.get_traced_memory()
+            metrics.peak_traced_mb = peak / 2 ** 20
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            metrics.top_allocations = [str(stat) for stat in snapshot.statistics('lineno')[:PROFILE_TOP_STATS]]
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            metrics.profile_path = os.path.join(PROFILE_DIR, f'{operation.replace(" ", "_")}-{time.strftime("%Y%m%d-%H%M%S")}.prof')
+            profiler.dump_stats(metrics.profile_path)
+        _current_metrics.reset(token)
+        sal.event.remove(conn, 'before_cursor_execute', count_statement)
+        metrics_logger.info(json.dumps(metrics.to_record()))
+
+
+@contextmanager
+def phase(name):
+    """
+    Time the block as a named phase of the operation being instrumented, if there is one.
+    """
+    metrics = _current_metrics.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            metrics.add_phase(name, time.perf_counter() - started)
+
+
+def timed_iter(iterable, name):
+    """
+    Iterate over iterable, counting the time spent producing each item as the named phase.
+    """
+    iterator = iter(iterable)
+    while True:
+        with phase(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def record_rows(rows_in=None, rows_out=None, rows_affected=None):
+    """
+    Add row counts to the operation being instrumented, if there is one.
+    """
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.add_rows(rows_in, rows_out, rows_affected)
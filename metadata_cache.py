@@ -0,0 +1,234 @@
+import threading
+import time
+
+import sqlalchemy as sal
+
+from database_operations import quote_identifier, reflect_columns
+
+# Seconds the table list and reflected columns are trusted before they are read again. Changes made through
+# the app are picked up at once through invalidate; this bounds how long changes made elsewhere go unseen
+METADATA_TTL_SECONDS = 300
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+class TableMetadata:
+    """
+    What is known about one table: an estimate of its row count and, once reflected, its columns.
+
+    row_estimate is None when the database keeps no estimate for the table. columns is the ordered
+    {name: reflected column} dictionary of reflect_columns, or None until the table has been reflected.
+    """
+
+    def __init__(self, name, row_estimate=None, columns=None, reflected_at=None):
+        self.name = name
+        self.row_estimate = row_estimate
+        self.columns = columns
+        self.reflected_at = reflected_at
+
+    def describe(self):
+        """
+        Describe the table in a few words, e.g. "about 1,000 rows, 5 columns".
+        """
+        parts = []
+        if self.row_estimate is not None:
+            parts.append(f'about {self.row_estimate:,} rows')
+        if self.columns is not None:
+            parts.append(f'{len(self.columns)} columns')
+        return ', '.join(parts)
+
+
+def _sqlite_row_estimates(conn, table_names):
+    """
+    Return {table name: estimated row count} for SQLite tables.
+
+    Tables analysed with ANALYZE have their count in sqlite_stat1. For the others the largest rowid is used,
+    which is read from the end of the table's B-tree without scanning it; it overestimates after deletes.
+    """
+    estimates = {}
+    if conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'").first():
+        for table_name, stat in conn.exec_driver_sql('SELECT tbl, stat FROM sqlite_stat1'):
+            if table_name in table_names and stat:
+                estimates.setdefault(table_name, int(stat.split()[0]))
+    for table_name in table_names:
+        if table_name in estimates:
+            continue
+        try:
+            estimates[table_name] = conn.exec_driver_sql(
+                f'SELECT MAX(rowid) FROM {quote_identifier(conn, table_name)}'
+            ).scalar() or 0
+        except sal.exc.OperationalError:
+            # WITHOUT ROWID tables have no rowid
+            pass
+    return estimates
+
+
+def estimate_row_counts(conn, table_names):
+    """
+    Return {table name: estimated row count} for table_names from the database catalog, without counting rows.
+
+    MySQL keeps estimates in information_schema.TABLES and PostgreSQL in pg_class, where they are refreshed by
+    ANALYZE and autovacuum; SQLite is handled by _sqlite_row_estimates. Tables without an estimate are left out.
+    """
+    table_names = set(table_names)
+    if conn.dialect.name == 'mysql':
+        rows = conn.exec_driver_sql(
+            "SELECT TABLE_NAME, TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE'"
+        )
+    elif conn.dialect.name == 'postgresql':
+        # reltuples is -1 for tables that were never analysed
+        rows = conn.exec_driver_sql(
+            "SELECT c.relname, c.reltuples FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = current_schema() AND c.relkind IN ('r', 'p') AND c.reltuples >= 0"
+        )
+    elif conn.dialect.name == 'sqlite':
+        return _sqlite_row_estimates(conn, table_names)
+    else:
+        return {}
+    return {name: int(count) for name, count in rows if name in table_names and count is not None}
+
+
+class MetadataCache:
+    """
+    The table names, row count estimates and columns of one database, read once and kept for ttl seconds.
+
+    The table list and the estimates are read together with a couple of catalog queries, and the columns of a
+    table are reflected the first time they are asked for. After changing a table, callers invalidate it, and
+    only that table is read again on the next lookup. The cache is shared by the GUI thread and the workers,
+    so every method is thread-safe; the cached_* methods never touch the database.
+    """
+
+    def __init__(self, ttl=METADATA_TTL_SECONDS):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.tables = {}  # Table name -> TableMetadata
+        self.loaded_at = None  # When the table list was read, or None if it has to be read
+        self.stale = set()  # Tables changed since they were read
+        self.invalidations = {}  # Table name -> times it was invalidated, so a read racing a change is not trusted
+
+    def _expired(self, when):
+        """
+        Return True if something read at monotonic time when (None for never) is older than the TTL.
+        """
+        return when is None or time.monotonic() - when > self.ttl
+
+    def invalidate(self, table_name=None):
+        """
+        Forget what is cached about a table that was changed, created or dropped, or about every table.
+        """
+        with self.lock:
+            if table_name is None:
+                self.tables = {}
+                self.stale.clear()
+                self.loaded_at = None
+            else:
+                self.stale.add(table_name)
+                self.invalidations[table_name] = self.invalidations.get(table_name, 0) + 1
+
+    def refresh(self, conn):
+        """
+        Read the table list and the row count estimates, keeping the columns of unchanged tables.
+        """
+        with self.lock:
+            invalidations = dict(self.invalidations)
+        names = sal.inspect(conn).get_table_names()
+        estimates = estimate_row_counts(conn, names)
+        with self.lock:
+            # Tables invalidated while the catalog was being read stay stale
+            changed = {name for name in self.stale if self.invalidations.get(name) != invalidations.get(name)}
+            tables = {}
+            for name in names:
+                previous = self.tables.get(name)
+                if previous is not None and name not in self.stale:
+                    tables[name] = TableMetadata(name, estimates.get(name), previous.columns, previous.reflected_at)
+                else:
+                    tables[name] = TableMetadata(name, estimates.get(name))
+            self.tables = tables
+            self.stale = changed
+            self.loaded_at = time.monotonic()
+
+    def _reflect_table(self, conn, table_name):
+        """
+        Read the columns and row count estimate of one table and return its TableMetadata, or None if it does not exist.
+        """
+        with self.lock:
+            invalidations = self.invalidations.get(table_name)
+        if sal.inspect(conn).has_table(table_name):
+            info = TableMetadata(table_name, estimate_row_counts(conn, [table_name]).get(table_name),
+                                 reflect_columns(conn, table_name), time.monotonic())
+        else:
+            info = None
+        with self.lock:
+            if self.invalidations.get(table_name) == invalidations:
+                self.stale.discard(table_name)
+            if info is None:
+                self.tables.pop(table_name, None)
+            else:
+                self.tables[table_name] = info
+        return info
+
+    def _load(self, conn):
+        """
+        Read the table list if it expired, and read the tables invalidated since, so the list is current.
+        """
+        with self.lock:
+            expired = self._expired(self.loaded_at)
+            stale = list(self.stale)
+        if expired:
+            self.refresh(conn)
+        else:
+            for table_name in stale:
+                self._reflect_table(conn, table_name)
+
+    def table_names(self, conn):
+        """
+        Return the sorted names of the tables in the database, reading only what is not cached.
+        """
+        self._load(conn)
+        return self.cached_table_names()
+
+    def table(self, conn, table_name):
+        """
+        Return the TableMetadata of a table with its columns reflected, or None if the table does not exist.
+        """
+        self._load(conn)
+        with self.lock:
+            info = self.tables.get(table_name)
+            if (info is not None and info.columns is not None and table_name not in self.stale
+                    and not self._expired(info.reflected_at)):
+                return info
+        # A name missing from the list is looked up too, as the table may have been created elsewhere since
+        return self._reflect_table(conn, table_name)
+
+    def cached_table_names(self):
+        """
+        Return the sorted names of the cached tables.
+        """
+        with self.lock:
+            return sorted(self.tables)
+
+    def cached_table(self, table_name):
+        """
+        Return the cached TableMetadata of a table if it is current and its columns are known, otherwise None.
+        """
+        with self.lock:
+            info = self.tables.get(table_name)
+            if info is None or info.columns is None or table_name in self.stale or self._expired(info.reflected_at):
+                return None
+            return info
+
+
+def get_metadata_cache(engine):
+    """
+    Return the MetadataCache of an engine, creating it the first time the engine is seen.
+
+    Engines from get_engine live for the whole process and so do their caches, so reconnecting to a database
+    finds the columns of its unchanged tables still cached.
+    """
+    with _caches_lock:
+        cache = _caches.get(engine)
+        if cache is None:
+            cache = _caches[engine] = MetadataCache()
+    return cache
@@ -0,0 +1,299 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # pyarrow is optional; without it workbooks are parsed on every import
+    pa = None
+
+from schema_inference import ColumnSchema
+
+# Set this environment variable to keep the cache somewhere other than DEFAULT_CACHE_DIR
+CACHE_DIR_ENV_VAR = 'SQLMANAGER_CACHE_DIR'
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.sqlmanager', 'parse_cache')
+# Least recently used entries are evicted once the cache grows past this size
+CACHE_MAX_BYTES = 2 * 2 ** 30
+HASH_BLOCK_BYTES = 2 ** 20
+INDEX_FILE = 'index.json'
+# Column kinds whose values are stored as Arrow strings
+TEXT_KINDS = ('category', 'string', 'text')
+# Arrow schema metadata key under which a cache file records the schema its data was parsed with
+SCHEMA_METADATA_KEY = b'sqlmanager.schema'
+
+
+def enabled():
+    """
+    Return True if pyarrow is installed, which the cache needs.
+    """
+    return pa is not None
+
+
+def cache_dir():
+    """
+    Return the cache directory, creating it if needed.
+    """
+    directory = os.environ.get(CACHE_DIR_ENV_VAR) or DEFAULT_CACHE_DIR
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _write_atomically(path, data):
+    """
+    Write bytes to path through a temporary file, so readers never see a partial file.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def _file_hash(file_path):
+    """
+    Return the BLAKE2 digest of a file's contents.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        while block := f.read(HASH_BLOCK_BYTES):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_key(file_path):
+    """
+    Return the cache key of a workbook: the hash of its contents.
+
+    Hashes are remembered in the index by path, size and modification time, so an unchanged file is
+    only hashed the first time it is seen.
+    """
+    directory = cache_dir()
+    path = os.path.abspath(file_path)
+    stat = os.stat(path)
+    stat_key = f'{path}|{stat.st_size}|{stat.st_mtime_ns}'
+    index_path = os.path.join(directory, INDEX_FILE)
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    if stat_key in index:
+        return index[stat_key]
+
+    key = _file_hash(path)
+    # Forget earlier versions of the same file
+    index = {name: value for name, value in index.items() if not name.startswith(f'{path}|')}
+    index[stat_key] = key
+    _write_atomically(index_path, json.dumps(index).encode())
+    return key
+
+
+def schema_fingerprint(schema):
+    """
+    Return a short digest that changes whenever any column of schema does.
+    """
+    columns = json.dumps([vars(column) for column in schema.values()], sort_keys=True, default=str)
+    return hashlib.blake2b(columns.encode(), digest_size=8).hexdigest()
+
+
+def evict(directory, max_bytes=CACHE_MAX_BYTES, keep=None):
+    """
+    Delete the least recently used cache files until the cache fits in max_bytes, sparing keep.
+    """
+    entries = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name == INDEX_FILE or name.endswith('.tmp') or path == keep:
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # Evicted by another process in the meantime
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    if keep and os.path.exists(keep):
+        total += os.path.getsize(keep)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            # Already gone, or still mapped by a reader on Windows
+            continue
+        total -= size
+
+
+def _touch(path):
+    """
+    Mark a cache file as recently used.
+    """
+    os.utime(path)
+
+
+def _dump_schema(schema):
+    """
+    Serialize a {name: ColumnSchema} mapping to JSON bytes.
+    """
+    return json.dumps([vars(column) for column in schema.values()]).encode()
+
+
+def _parse_schema(data):
+    """
+    Deserialize a {name: ColumnSchema} mapping serialized by _dump_schema.
+    """
+    return {record['name']: ColumnSchema(**record) for record in json.loads(data)}
+
+
+def load_schema(file_path):
+    """
+    Return the schema cached for an unchanged workbook, or None.
+    """
+    path = os.path.join(cache_dir(), f'{content_key(file_path)}.schema.json')
+    if not os.path.exists(path):
+        return None
+    _touch(path)
+    with open(path, 'rb') as f:
+        return _parse_schema(f.read())
+
+
+def store_schema(file_path, schema):
+    """
+    Cache the schema inferred for a workbook.
+    """
+    directory = cache_dir()
+    path = os.path.join(directory, f'{content_key(file_path)}.schema.json')
+    _write_atomically(path, _dump_schema(schema))
+    evict(directory, keep=path)
+
+
+def _data_path(file_path, schema):
+    """
+    Return the path of the Arrow file holding a workbook parsed with schema.
+    """
+    return os.path.join(cache_dir(), f'{content_key(file_path)}-{schema_fingerprint(schema)}.arrow')
+
+
+def _nullable_types():
+    """
+    Map Arrow types to the nullable pandas dtypes the Excel importer produces.
+    """
+    return {
+        pa.int8(): pd.Int8Dtype(), pa.int16(): pd.Int16Dtype(), pa.int32(): pd.Int32Dtype(),
+        pa.int64(): pd.Int64Dtype(), pa.bool_(): pd.BooleanDtype(),
+    }
+
+
+def _read_chunks(source, table, schema, chunk_size):
+    """
+    Yield a memory-mapped Arrow table as DataFrames of at most chunk_size rows, closing source at the end.
+    """
+    types = _nullable_types()
+    try:
+        # Yield at least one (possibly empty) DataFrame, like the Excel reader
+        for start in range(0, max(table.num_rows, 1), chunk_size):
+            df = table.slice(start, chunk_size).to_pandas(types_mapper=types.get)
+            for name, column in schema.items():
+                if column.kind == 'category' and name in df.columns:
+                    df[name] = df[name].astype('category')
+            yield df
+    finally:
+        source.close()
+
+
+def cached_chunks(file_path, schema, chunk_size, progress=None):
+    """
+    Return the schema the cached DataFrames of a workbook imported with schema were parsed with and an
+    iterator over them, or None on a miss.
+
+    The parsed schema differs from schema when columns were widened to hold the whole sheet. The Arrow file
+    is memory-mapped, so only the batch being converted is held in memory. If progress is given, its total
+    is set to the number of cached rows.
+    """
+    path = _data_path(file_path, schema)
+    if not os.path.exists(path):
+        return None
+    try:
+        source = pa.memory_map(path)
+        table = pa.ipc.open_file(source).read_all()
+        metadata = table.schema.metadata or {}
+        parsed_schema = _parse_schema(metadata[SCHEMA_METADATA_KEY]) if SCHEMA_METADATA_KEY in metadata else schema
+    except (OSError, pa.ArrowException, KeyError, TypeError, ValueError) as e:
+        logging.warning(f'Discarding unreadable parse cache entry {path}: {e}')
+        # Another worker may have evicted or discarded the entry already
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        return None
+    _touch(path)
+    if progress is not None:
+        progress.set_total(table.num_rows)
+    return parsed_schema, _read_chunks(source, table, parsed_schema, chunk_size)
+
+
+def _to_arrow(df, schema, target=None):
+    """
+    Convert a DataFrame parsed with schema to an Arrow table, cast to target if given.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if target is None:
+        # Text is stored as plain strings: categoricals get a different dictionary in every batch, and a
+        # batch of empty cells would otherwise be typed as null
+        target = pa.schema([
+            pa.field(field.name, pa.string() if schema[field.name].kind in TEXT_KINDS or pa.types.is_null(field.type)
+                     else field.type)
+            for field in table.schema
+        ])
+    return table.cast(target)
+
+
+def cache_chunks(file_path, schema, chunks, parsed_schema=None):
+    """
+    Yield the DataFrames of chunks unchanged while writing them to the cache as one Arrow IPC file.
+
+    The file is found by cached_chunks under schema, and records parsed_schema, the schema chunks were
+    actually parsed with, which defaults to schema. It only becomes visible once every chunk has been
+    written; if the iteration stops early or writing fails, nothing is cached and the import carries on.
+    """
+    parsed_schema = parsed_schema or schema
+    directory = cache_dir()
+    path = _data_path(file_path, schema)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    writer = None
+    target = None
+    failed = False
+    complete = False
+    try:
+        for df in chunks:
+            if not failed:
+                try:
+                    table = _to_arrow(df, parsed_schema, target)
+                    if writer is None:
+                        target = table.schema
+                        writer = pa.ipc.new_file(
+                            temp_path, target.with_metadata({SCHEMA_METADATA_KEY: _dump_schema(parsed_schema)})
+                        )
+                    writer.write_table(table)
+                except (OSError, pa.ArrowException) as e:
+                    logging.warning(f'Not caching parsed workbook {file_path}: {e}')
+                    failed = True
+            yield df
+        complete = True
+    finally:
+        if writer is not None:
+            writer.close()
+        if complete and not failed and writer is not None:
+            os.replace(temp_path, path)
+            evict(directory, keep=path)
+        else:
+            os.remove(temp_path)
@@ -0,0 +1,208 @@
+from database_operations import (
+    PUSHDOWN_DIALECTS, begin_transaction, build_header_mapping, can_rename_columns, data_columns,
+    drop_duplicate_frame_rows, execute_renames, null_condition, quote_identifier, rebuild_table, reflect_columns,
+    rewrite_with_pandas, row_number_delete, supports_windowed_delete
+)
+from external_dedup import remove_duplicates_out_of_core
+from instrumentation import phase, record_rows
+from progress import check_cancelled
+
+# Transforms that can be queued, with the labels shown on page 2
+TRANSFORMS = {
+    'lowercase_headers': 'Lowercase Headers',
+    'replace_spaces': 'Replace Spaces in Headers',
+    'drop_na': 'Drop NA',
+    'remove_duplicates': 'Remove Duplicates',
+}
+
+HEADER_TRANSFORMS = {
+    'lowercase_headers': str.lower,
+    'replace_spaces': lambda col: col.replace(' ', '_'),
+}
+
+
+def compose_header_transform(transforms):
+    """
+    Combine the queued header transforms into one function that applies them in queue order.
+    """
+    functions = [HEADER_TRANSFORMS[name] for name in transforms if name in HEADER_TRANSFORMS]
+
+    def transform(col):
+        for function in functions:
+            col = function(col)
+        return col
+
+    return transform
+
+
+class ExecutionPlan:
+    """
+    A queue of transforms compiled against one table.
+
+    Header transforms collapse into a single {old: new} rename mapping and the row filters into one
+    statement, so executing the plan scans the table at most once. columns maps the current column names
+    to their reflected definitions. strategy is one of:
+
+    - 'noop': nothing to change
+    - 'sql': rename columns in place, then one DELETE for all row filters
+    - 'rebuild': one INSERT ... SELECT into a staging table that renames and filters, swapped in for the table
+    - 'pandas': one read, all transforms in memory, one write (dialects without SQL pushdown)
+    """
+
+    def __init__(self, table_name, transforms, columns, mapping, drop_na, remove_duplicates, strategy):
+        self.table_name = table_name
+        self.transforms = list(transforms)
+        self.columns = columns
+        self.mapping = mapping
+        self.drop_na = drop_na
+        self.remove_duplicates = remove_duplicates
+        self.strategy = strategy
+
+    def _filter_description(self):
+        """
+        Describe the queued row filters in words.
+        """
+        filters = []
+        if self.drop_na:
+            filters.append('rows with NULLs')
+        if self.remove_duplicates:
+            filters.append('duplicate rows')
+        return ' and '.join(filters)
+
+    def steps(self):
+        """
+        Return the plan as a list of human-readable steps.
+        """
+        renames = ', '.join(f'"{old}" -> "{new}"' for old, new in self.mapping.items())
+        if self.strategy == 'noop':
+            return ['Nothing to do: the table already satisfies every queued transform']
+        if self.strategy == 'pandas':
+            if self.remove_duplicates:
+                return [f'Stream "{self.table_name}" once, apply {len(self.transforms)} transforms and remove duplicates '
+                        f'in memory, or in hash-partitioned spill files if it exceeds the memory budget, and write it back once']
+            return [f'Read "{self.table_name}" once, apply {len(self.transforms)} transforms in memory and write it back once']
+        if self.strategy == 'rebuild':
+            details = []
+            if not self.remove_duplicates:
+                select = 'SELECT'
+            elif len(data_columns(self.columns)) < len(self.columns):
+                # As in rebuild_table, whose duplicates differ in the incremental import bookkeeping columns
+                select = 'SELECT ... GROUP BY'
+                details.append('grouping on the data columns and keeping the smallest row hashes')
+            else:
+                select = 'SELECT DISTINCT'
+            step = f'Rebuild "{self.table_name}" with one INSERT ... {select} into a staging table'
+            if self.mapping:
+                details.append(f'renaming {renames}')
+            if self.drop_na:
+                details.append('skipping rows with NULLs')
+            if details:
+                step += f' ({"; ".join(details)})'
+            return [step, 'Swap the staging table in for the original with an atomic rename']
+
+        steps = []
+        if self.mapping:
+            steps.append(f'Rename {len(self.mapping)} columns in one metadata change: {renames}')
+        if self.drop_na or self.remove_duplicates:
+            steps.append(f'Delete {self._filter_description()} with one DELETE statement')
+        return steps
+
+    def describe(self):
+        """
+        Format the plan for display before it runs.
+        """
+        lines = [f'Plan for "{self.table_name}" ({len(self.transforms)} queued transforms):']
+        lines += [f'{i}. {step}' for i, step in enumerate(self.steps(), start=1)]
+        return '\n'.join(lines)
+
+    def apply_row_transforms(self, df):
+        """
+        Apply the renames and the NULL filter, which only look at one row at a time, to a DataFrame.
+        """
+        df = df.rename(columns=self.mapping)
+        if self.drop_na:
+            df = df.dropna()
+        return df
+
+    def apply_to_dataframe(self, df):
+        """
+        Apply the whole plan to an in-memory DataFrame.
+        """
+        df = self.apply_row_transforms(df)
+        if self.remove_duplicates:
+            df = drop_duplicate_frame_rows(df)
+        return df
+
+
+def compile_plan(conn, table_name, transforms, columns=None):
+    """
+    Compile a queue of transform names into an ExecutionPlan for table_name.
+
+    columns are the reflected columns of the table, as returned by reflect_columns; they are reflected if not
+    given. With columns, only conn.dialect is used, so an Engine can stand in for the connection.
+    """
+    unknown = [name for name in transforms if name not in TRANSFORMS]
+    if unknown:
+        raise ValueError(f'Unknown transforms: {", ".join(unknown)}')
+
+    if columns is None:
+        columns = reflect_columns(conn, table_name)
+    mapping = build_header_mapping(list(columns), compose_header_transform(transforms))
+    drop_na = 'drop_na' in transforms
+    remove_duplicates = 'remove_duplicates' in transforms
+    dialect = conn.dialect
+
+    if not (mapping or drop_na or remove_duplicates):
+        strategy = 'noop'
+    elif dialect.name not in PUSHDOWN_DIALECTS:
+        strategy = 'pandas'
+    elif (mapping and not can_rename_columns(dialect)) or (remove_duplicates and not supports_windowed_delete(dialect, columns)):
+        strategy = 'rebuild'
+    else:
+        strategy = 'sql'
+    return ExecutionPlan(table_name, transforms, columns, mapping, drop_na, remove_duplicates, strategy)
+
+
+def execute_plan(conn, plan, progress=None):
+    """
+    Execute a compiled plan and return the number of rows removed.
+    """
+    check_cancelled(progress)
+    if plan.strategy == 'noop':
+        return 0
+    if plan.strategy == 'pandas':
+        if plan.remove_duplicates:
+            # Duplicates can be anywhere in the table, so stream it and deduplicate out of core if it is too big
+            return remove_duplicates_out_of_core(conn, plan.table_name, progress, plan.apply_row_transforms,
+                                                 plan.mapping)
+        return rewrite_with_pandas(conn, plan.table_name, plan.apply_to_dataframe, progress, plan.mapping)
+
+    with begin_transaction(conn):
+        if plan.strategy == 'rebuild':
+            nulls = null_condition(conn, plan.columns) if plan.drop_na else None
+            return rebuild_table(conn, plan.table_name, plan.mapping, distinct=plan.remove_duplicates,
+                                 where=f'NOT ({nulls})' if nulls else None)
+
+        if plan.mapping:
+            with phase('alter'):
+                execute_renames(conn, plan.table_name, plan.mapping)
+        columns = [plan.mapping.get(col, col) for col in plan.columns]
+        removed = 0
+        with phase('delete'):
+            if plan.remove_duplicates:
+                nulls = null_condition(conn, columns) if plan.drop_na else None
+                removed = conn.exec_driver_sql(row_number_delete(conn, plan.table_name, data_columns(columns), nulls)).rowcount
+            elif plan.drop_na:
+                table = quote_identifier(conn, plan.table_name)
+                removed = conn.exec_driver_sql(f'DELETE FROM {table} WHERE {null_condition(conn, columns)}').rowcount
+        record_rows(rows_affected=removed)
+        return removed
+
+
+def run_pipeline(conn, table_name, transforms, progress=None):
+    """
+    Compile transforms against the current table schema, execute the plan and return (plan, rows removed).
+    """
+    with phase('compile'):
+        plan = compile_plan(conn, table_name, transforms)
+    return plan, execute_plan(conn, plan, progress)
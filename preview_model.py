@@ -0,0 +1,235 @@
+import itertools
+import math
+from collections import OrderedDict
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt, QTimer, pyqtSignal
+
+from task_runner import DatabaseTask
+
+# Pages kept in memory; the page shown least recently is dropped first
+PAGE_CACHE_PAGES = 64
+# Page boundaries remembered on top of the anchors, least recently learnt dropped first
+BOUNDARY_CACHE_SIZE = 10000
+# Pages read ahead of the scroll position, in the direction of scrolling
+PREFETCH_PAGES = 4
+# Page reads running at once; further requests wait for one of them to finish
+MAX_RUNNING_READS = 2
+# Shown in cells whose page is still being read
+LOADING_TEXT = '…'
+
+
+class PreviewTableModel(QAbstractTableModel):
+    """
+    A read-only table model that shows a database table through a KeysetPager, one page at a time.
+
+    Cells of pages that are not in memory show LOADING_TEXT while the page is read on the worker pool, so the
+    view never waits for the database. Pages requested together and the PREFETCH_PAGES pages ahead of the
+    scroll position are read as consecutive runs with one query each, and at most PAGE_CACHE_PAGES pages
+    are kept, so memory stays flat however large the table is. The sparse anchors of the pager are
+    collected in the background when the model is created, after which a jump to any page is a short seek.
+    """
+    failed = pyqtSignal(object)
+
+    def __init__(self, engine, pager, thread_pool, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.pager = pager
+        self.thread_pool = thread_pool
+        self.pages = OrderedDict()
+        self.boundaries = OrderedDict()
+        self.anchors = {}
+        self.wanted = set()  # Pages requested by the view since the last dispatch
+        self.pending = set()  # Pages being read
+        self.tasks = set()
+        self.running_reads = 0
+        self.last_page = 0
+        self.direction = 1
+        self.closed = False
+        self.page_count = math.ceil(pager.row_count / pager.page_size)
+
+        # Cells ask for their page one by one while the view paints, so requests are gathered and
+        # dispatched together once control returns to the event loop
+        self.fetch_timer = QTimer(self)
+        self.fetch_timer.setSingleShot(True)
+        self.fetch_timer.setInterval(0)
+        self.fetch_timer.timeout.connect(self.fetch_wanted)
+
+        self.start_task(lambda conn, progress: pager.read_anchors(conn, progress=progress), self.anchors_read)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.pager.row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.pager.columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.pager.columns[section]
+        return str(section + 1)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        page, offset = divmod(index.row(), self.pager.page_size)
+        if page != self.last_page:
+            self.scrolled_to(page)
+        rows = self.pages.get(page)
+        if rows is None:
+            self.request(page)
+            return LOADING_TEXT if role == Qt.DisplayRole else None
+        self.pages.move_to_end(page)
+        if offset >= len(rows):
+            # The table shrank since it was counted
+            return None
+        return rows[offset][index.column()]
+
+    def scrolled_to(self, page):
+        """
+        Note the page the view shows now and the direction of scrolling, and read ahead of it.
+        """
+        self.direction = 1 if page > self.last_page else -1
+        self.last_page = page
+        if not self.closed:
+            self.fetch_timer.start()
+
+    def request(self, page):
+        """
+        Ask for a page that is not in memory to be read.
+        """
+        if page in self.pending or self.closed:
+            return
+        self.wanted.add(page)
+        self.fetch_timer.start()
+
+    def nearest_boundary(self, page):
+        """
+        Return (page, boundary key) for the closest page at or before page whose boundary is known.
+        """
+        known = [p for p in itertools.chain(self.boundaries, self.anchors) if p <= page]
+        anchor_page = max(known, default=0)
+        if anchor_page in self.boundaries:
+            return anchor_page, self.boundaries[anchor_page]
+        return anchor_page, self.anchors.get(anchor_page)
+
+    def fetch_wanted(self):
+        """
+        Read the wanted pages and the pages ahead of the scroll position, as runs of consecutive pages.
+        """
+        if self.closed:
+            return
+        ahead = [self.last_page + self.direction * i for i in range(1, PREFETCH_PAGES + 1)]
+        # Pages the view scrolled past while reads were running are no longer worth reading
+        nearby = [page for page in self.wanted if abs(page - self.last_page) <= PREFETCH_PAGES]
+        self.wanted.clear()
+        missing = sorted({
+            page for page in nearby + ahead
+            if 0 <= page < self.page_count and page not in self.pages and page not in self.pending
+        })
+        runs = []
+        for page in missing:
+            if runs and runs[-1][0] + runs[-1][1] == page:
+                runs[-1][1] += 1
+            else:
+                runs.append([page, 1])
+        # Read the run holding the page the view asked for last first
+        runs.sort(key=lambda run: not run[0] <= self.last_page < run[0] + run[1])
+        for first, count in runs:
+            if self.running_reads >= MAX_RUNNING_READS:
+                self.wanted.update(range(first, first + count))
+                continue
+            self.read_run(first, count)
+
+    def read_run(self, first, count):
+        """
+        Read count pages from first on the worker pool.
+        """
+        anchor_page, anchor_key = self.nearest_boundary(first)
+        pages = range(first, first + count)
+        self.pending.update(pages)
+        self.running_reads += 1
+        self.start_task(
+            lambda conn, progress: self.pager.read_pages(conn, first, count, anchor_page, anchor_key),
+            lambda result: self.pages_read(pages, result),
+            lambda error: self.read_failed(pages, error)
+        )
+
+    def pages_read(self, pages, result):
+        """
+        Store pages read on the worker pool and refresh the cells that show them.
+        """
+        self.running_reads -= 1
+        self.pending.difference_update(pages)
+        if self.closed:
+            return
+        rows_by_page, boundaries = result
+        for page, key in boundaries.items():
+            self.boundaries[page] = key
+            self.boundaries.move_to_end(page)
+        while len(self.boundaries) > BOUNDARY_CACHE_SIZE:
+            self.boundaries.popitem(last=False)
+        for page in pages:
+            # Pages past the end of a table that shrank are stored empty, so they are not read again
+            rows = rows_by_page.get(page, [])
+            self.pages[page] = rows
+            self.pages.move_to_end(page)
+            if rows:
+                first_row = page * self.pager.page_size
+                self.dataChanged.emit(self.index(first_row, 0),
+                                      self.index(first_row + len(rows) - 1, self.columnCount() - 1))
+        while len(self.pages) > PAGE_CACHE_PAGES:
+            self.pages.popitem(last=False)
+        if self.wanted:
+            self.fetch_timer.start()
+
+    def read_failed(self, pages, error):
+        """
+        Forget a failed read so its pages can be asked for again, and report the error.
+        """
+        self.running_reads -= 1
+        self.pending.difference_update(pages)
+        if not self.closed:
+            self.failed.emit(error)
+
+    def anchors_read(self, anchors):
+        """
+        Keep the anchors collected on the worker pool.
+        """
+        if not self.closed:
+            self.anchors = anchors
+
+    def start_task(self, operation, on_success, on_failure=None):
+        """
+        Run operation(conn, progress) on the worker pool and pass its result to on_success.
+        """
+        task = DatabaseTask(self.engine, operation, 'Reading preview', self.pager.table_name, instrumented=False)
+        self.tasks.add(task)
+        task.signals.finished.connect(lambda result: (self.task_done(task), on_success(result)))
+        task.signals.failed.connect(lambda error: (self.task_done(task), (on_failure or self.failed.emit)(error)))
+        task.signals.cancelled.connect(lambda: self.task_done(task))
+        self.thread_pool.start(task)
+
+    def task_done(self, task):
+        """
+        Forget a finished task; a closed model is deleted once its last task is done.
+        """
+        self.tasks.discard(task)
+        if self.closed and not self.tasks:
+            self.deleteLater()
+
+    def close(self):
+        """
+        Stop reading pages, cancel the anchor scan and release the cached pages.
+
+        The model deletes itself once the reads still running have finished, since they hold on to it.
+        """
+        self.closed = True
+        self.fetch_timer.stop()
+        for task in self.tasks:
+            task.cancel()
+        self.pages.clear()
+        self.boundaries.clear()
+        self.anchors = {}
+        if not self.tasks:
+            self.deleteLater()
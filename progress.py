@@ -0,0 +1,103 @@
+import time
+
+
+class OperationCancelled(Exception):
+    """
+    Raised inside a running operation when the user has asked for it to be cancelled.
+    """
+
+
+class ProgressTracker:
+    """
+    Track rows processed by a long-running operation and support cooperative cancellation.
+
+    Operations call update() as they make progress; the tracker computes throughput and ETA, forwards a
+    formatted message to the callback at most every min_interval seconds, and raises OperationCancelled
+    once cancel_event is set.
+    """
+
+    def __init__(self, callback=None, cancel_event=None, total=None, min_interval=0.2):
+        self.callback = callback
+        self.cancel_event = cancel_event
+        self.total = total
+        self.min_interval = min_interval
+        self.processed = 0
+        self.started = time.monotonic()
+        self.last_report = 0.0
+
+    def set_total(self, total):
+        """
+        Set the expected number of rows, or None if it is unknown.
+        """
+        self.total = total
+
+    def check_cancelled(self):
+        """
+        Raise OperationCancelled if cancellation was requested.
+        """
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise OperationCancelled()
+
+    def update(self, rows, message=None):
+        """
+        Record rows as processed, report progress and stop the operation if it was cancelled.
+        """
+        self.processed += rows
+        self.check_cancelled()
+        now = time.monotonic()
+        if self.callback and now - self.last_report >= self.min_interval:
+            self.last_report = now
+            self.callback(message or self.describe())
+
+    def report(self, message):
+        """
+        Forward a free-form status message, for phases that cannot count rows.
+        """
+        self.check_cancelled()
+        if self.callback:
+            self.callback(message)
+
+    def rate(self):
+        """
+        Return the throughput in rows per second so far.
+        """
+        elapsed = time.monotonic() - self.started
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def eta(self):
+        """
+        Return the estimated seconds remaining, or None if the total is unknown.
+        """
+        rate = self.rate()
+        if not self.total or not rate:
+            return None
+        return max(self.total - self.processed, 0) / rate
+
+    def describe(self):
+        """
+        Format rows processed, throughput and ETA for the status bar.
+        """
+        text = f'{self.processed:,}'
+        if self.total:
+            text += f' / {self.total:,}'
+        text += f' rows, {self.rate():,.0f} rows/s'
+        eta = self.eta()
+        if eta is not None:
+            text += f', ETA {eta:.0f}s'
+        return text
+
+
+def track(progress, rows):
+    """
+    Report rows to an optional progress tracker.
+    """
+    if progress is not None:
+        progress.update(rows)
+
+
+def check_cancelled(progress):
+    """
+    Raise OperationCancelled if an optional progress tracker was cancelled.
+    """
+    if progress is not None:
+        progress.check_cancelled()
@@ -0,0 +1,72 @@
+import datetime
+import decimal
+import math
+import numbers
+
+import numpy as np
+import pandas as pd
+
+# Marker for missing values when rows are hashed, a control character that cannot appear in sheet text. It must
+# not be NUL, as pandas hashes strings only up to their first NUL, which would make it hash like ''
+HASH_NULL = '\x1f'
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+def _canonical_value(value):
+    """
+    Render one value of an object column so that values comparing equal in Python get the same text.
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, datetime.datetime):
+        return value.strftime(DATETIME_FORMAT)
+    if isinstance(value, (numbers.Number, decimal.Decimal)) and not isinstance(value, complex):
+        # True == 1 == 1.0 == Decimal('1'), and pandas treats them as duplicates of each other
+        if math.isfinite(value) and value == int(value):
+            return str(int(value))
+        return repr(float(value))
+    return str(value)
+
+
+def _canonical_strings(series):
+    """
+    Render a column as strings that do not depend on its dtype, so hashes survive changes such as Int16 to Int32.
+    """
+    if pd.api.types.is_bool_dtype(series):
+        text = series.map({True: '1', False: '0'})
+    elif pd.api.types.is_integer_dtype(series):
+        text = series.astype('Int64').astype(str)
+    elif pd.api.types.is_float_dtype(series):
+        values = series.astype('float64')
+        # Whole numbers hash like integers, so a column that gains or loses decimals keeps its hashes
+        whole = values.notna() & (values == values.round()) & (values.abs() < 2 ** 53)
+        text = values.map(repr).astype(object)
+        text[whole] = values[whole].astype('int64').astype(str)
+    elif pd.api.types.is_datetime64_any_dtype(series):
+        text = series.dt.strftime(DATETIME_FORMAT)
+    elif pd.api.types.is_string_dtype(series) and not pd.api.types.is_object_dtype(series):
+        text = series.astype(object)
+    else:
+        text = series.astype(object).map(lambda value: value if pd.isna(value) else _canonical_value(value))
+    return text.astype(object).where(series.notna(), HASH_NULL)
+
+
+def hash_rows(df, columns):
+    """
+    Return a stable 64-bit hash of the values in columns for every row of a DataFrame, as a uint64 array.
+
+    Columns are hashed in name order, so reordering the columns of a table does not change the hashes, and
+    values are hashed by what they are rather than by their dtype, so rows that pandas considers duplicates
+    always hash alike.
+    """
+    if not columns:
+        return np.zeros(len(df), dtype=np.uint64)
+    strings = pd.DataFrame({col: _canonical_strings(df[col]) for col in sorted(columns)}, index=df.index)
+    return pd.util.hash_pandas_object(strings, index=False).to_numpy(dtype=np.uint64)
+
+
+def row_hashes(df, columns):
+    """
+    Return a stable hexadecimal hash of the values in columns for every row of a DataFrame.
+    """
+    return [f'{value:016x}' for value in hash_rows(df, columns)]
@@ -0,0 +1,69 @@
+from PyQt5.QtGui import QFont
+from PyQt5.QtWidgets import (
+    QAbstractItemView, QComboBox, QDialog, QDialogButtonBox, QHeaderView, QLabel, QTableWidget, QTableWidgetItem,
+    QVBoxLayout
+)
+
+from schema_inference import KINDS, SAMPLE_ROWS
+
+
+class SchemaDialog(QDialog):
+    """
+    Show the column types inferred for an import and let the user override them before it runs.
+    """
+
+    def __init__(self, schema, dialect, table_name, parent=None):
+        super().__init__(parent)
+        self.schema = schema
+        self.dialect = dialect
+        self.kind_combos = {}
+        self.setWindowTitle(f'Review Schema for "{table_name}"')
+        self.resize(640, 480)
+
+        fully_sampled = all(column.fully_sampled for column in schema.values())
+        source = 'every row of the sheet' if fully_sampled else f'the first {SAMPLE_ROWS:,} rows of the sheet'
+        note = QLabel(f'Column types were inferred from {source}. Change any type before importing.')
+        note.setFont(QFont('Arial', 12))
+        note.setStyleSheet("color: #1565C0;")
+        note.setWordWrap(True)
+
+        self.table = QTableWidget(len(schema), 3)
+        self.table.setHorizontalHeaderLabels(['Column', 'Type', 'SQL Type'])
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        for row, (name, column) in enumerate(schema.items()):
+            self.table.setItem(row, 0, QTableWidgetItem(name))
+            combo = QComboBox()
+            for kind, label in KINDS.items():
+                combo.addItem(label, kind)
+            combo.setCurrentIndex(combo.findData(column.kind))
+            combo.currentIndexChanged.connect(lambda _, row=row, name=name: self.update_sql_type(row, name))
+            self.kind_combos[name] = combo
+            self.table.setCellWidget(row, 1, combo)
+            self.table.setItem(row, 2, QTableWidgetItem())
+            self.update_sql_type(row, name)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.button(QDialogButtonBox.Ok).setText('Import')
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout = QVBoxLayout()
+        layout.addWidget(note)
+        layout.addWidget(self.table)
+        layout.addWidget(buttons)
+        self.setLayout(layout)
+
+    def selected_schema(self):
+        """
+        Return the schema with the types chosen in the dialog.
+        """
+        return {name: column.with_kind(self.kind_combos[name].currentData()) for name, column in self.schema.items()}
+
+    def update_sql_type(self, row, name):
+        """
+        Show the SQL type a column will be created with for its currently selected kind.
+        """
+        column = self.schema[name].with_kind(self.kind_combos[name].currentData())
+        self.table.item(row, 2).setText(column.sql_type().compile(dialect=self.dialect))
@@ -0,0 +1,307 @@
+import datetime
+import logging
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as sal
+from sqlalchemy.dialects import mysql
+
+# Rows read from the top of a sheet to infer its column types
+SAMPLE_ROWS = 10000
+# Text columns with at most this many distinct values, most of them repeated, become categoricals
+CATEGORY_MAX_VALUES = 255
+CATEGORY_MAX_RATIO = 0.5
+# Longest text stored as VARCHAR; longer columns become TEXT
+VARCHAR_MAX_LENGTH = 255
+# Factor applied to the longest sampled text when the sample does not cover the whole sheet
+PARTIAL_SAMPLE_HEADROOM = 2
+
+# Column kinds the user can choose between, with their labels
+KINDS = {
+    'integer': 'Integer',
+    'float': 'Decimal Number',
+    'boolean': 'Boolean',
+    'datetime': 'Date and Time',
+    'date': 'Date',
+    'category': 'Category',
+    'string': 'Short Text',
+    'text': 'Long Text',
+}
+
+# Integer sizes from smallest to largest: pandas dtype, value range and SQL type
+INTEGER_SIZES = [
+    ('Int8', np.iinfo(np.int8), lambda: sal.SmallInteger().with_variant(mysql.TINYINT(), 'mysql')),
+    ('Int16', np.iinfo(np.int16), sal.SmallInteger),
+    ('Int32', np.iinfo(np.int32), sal.Integer),
+    ('Int64', np.iinfo(np.int64), sal.BigInteger),
+]
+
+
+class ColumnSchema:
+    """
+    The type of one imported column: a kind from KINDS and what the sample showed about its values.
+
+    minimum and maximum bound integer columns, max_length is the longest text, categories are the distinct
+    values of a category column and single_precision marks floats that survive a round trip through float32.
+    fully_sampled is False when the sample did not reach the end of the sheet, in which case integer and
+    text columns get headroom, floats stay double precision and categories are not turned into ENUMs, and
+    the column is widened by widen if later rows hold values that do not fit it.
+    """
+
+    def __init__(self, name, kind, minimum=None, maximum=None, max_length=None, categories=None,
+                 single_precision=False, fully_sampled=True):
+        self.name = name
+        self.kind = kind
+        self.minimum = minimum
+        self.maximum = maximum
+        self.max_length = max_length
+        self.categories = categories
+        self.single_precision = single_precision
+        self.fully_sampled = fully_sampled
+
+    def with_kind(self, kind):
+        """
+        Return a copy of the column with its kind overridden.
+        """
+        return ColumnSchema(self.name, kind, self.minimum, self.maximum, self.max_length, self.categories,
+                            self.single_precision, self.fully_sampled)
+
+    def _integer_size(self):
+        """
+        Return the smallest INTEGER_SIZES entry that holds the sampled range, one size up for partial samples.
+        """
+        if self.minimum is None or self.maximum is None:
+            return INTEGER_SIZES[-1]
+        index = next((i for i, (_, info, _) in enumerate(INTEGER_SIZES)
+                      if info.min <= self.minimum and self.maximum <= info.max), len(INTEGER_SIZES) - 1)
+        if not self.fully_sampled:
+            index = min(index + 1, len(INTEGER_SIZES) - 1)
+        return INTEGER_SIZES[index]
+
+    def varchar_length(self):
+        """
+        Return the VARCHAR length for a text column, or None if it needs TEXT.
+        """
+        if not self.max_length:
+            return None
+        length = self.max_length if self.fully_sampled else self.max_length * PARTIAL_SAMPLE_HEADROOM
+        return length if length <= VARCHAR_MAX_LENGTH else None
+
+    def _single_precision(self):
+        """
+        Return True if the column can be stored as float32, which is only safe when every value was sampled.
+        """
+        return self.single_precision and self.fully_sampled
+
+    def _enum_values(self):
+        """
+        Return the values for a MySQL ENUM, or None if the column cannot safely be one.
+        """
+        if not (self.fully_sampled and self.categories):
+            return None
+        # ENUM values are compared case-insensitively and lose trailing spaces
+        folded = {value.casefold() for value in self.categories}
+        if len(folded) < len(self.categories) or any(value != value.rstrip() for value in self.categories):
+            return None
+        return self.categories
+
+    def pandas_dtype(self):
+        """
+        Return the in-memory dtype of the column, or None for text and dates, which keep the dtype they parse to.
+        """
+        if self.kind == 'integer':
+            return self._integer_size()[0]
+        if self.kind == 'float':
+            return 'float32' if self._single_precision() else 'float64'
+        if self.kind == 'boolean':
+            return 'boolean'
+        if self.kind == 'category':
+            return 'category'
+        return None
+
+    def sql_type(self):
+        """
+        Return the SQLAlchemy type the column is created with.
+        """
+        if self.kind == 'integer':
+            return self._integer_size()[2]()
+        if self.kind == 'float':
+            return sal.Float(precision=24) if self._single_precision() else sal.Double()
+        if self.kind == 'boolean':
+            return sal.Boolean()
+        if self.kind == 'datetime':
+            return sal.DateTime()
+        if self.kind == 'date':
+            return sal.Date()
+        length = self.varchar_length() if self.kind in ('category', 'string') else None
+        if length is None:
+            return sal.Text()
+        if self.kind == 'category' and self._enum_values():
+            return sal.String(length).with_variant(mysql.ENUM(*self._enum_values()), 'mysql')
+        return sal.String(length)
+
+    def _parse(self, series):
+        """
+        Parse a column of raw sheet values, returning the parsed values and a mask of those that fit the type.
+        """
+        if self.kind in ('integer', 'float'):
+            numbers = pd.to_numeric(series, errors='coerce')
+            valid = numbers.notna() & ~series.map(lambda value: isinstance(value, bool))
+            if self.kind == 'integer':
+                _, info, _ = self._integer_size()
+                valid &= (numbers == numbers.round()) & numbers.between(info.min, info.max)
+            return numbers, valid
+        if self.kind == 'boolean':
+            return series, series.map(lambda value: isinstance(value, (bool, np.bool_)))
+        if self.kind in ('datetime', 'date'):
+            values = pd.to_datetime(series, errors='coerce')
+            valid = values.notna()
+            if self.kind == 'date':
+                valid &= values == values.dt.normalize()
+            return values, valid
+
+        text = series.map(_text)
+        length = self.varchar_length() if self.kind in ('category', 'string') else None
+        if length is None:
+            return text, pd.Series(True, index=series.index)
+        return text, text.str.len() <= length
+
+    def convert(self, series):
+        """
+        Cast a column of raw sheet values to the column's in-memory dtype.
+
+        Raise ValueError if a value does not fit the type, e.g. text in a column the user made an Integer.
+        """
+        values, valid = self._parse(series)
+        bad = series.notna() & ~valid
+        if bad.any():
+            raise ValueError(
+                f'Column "{self.name}" has values that do not fit its type {KINDS[self.kind]} '
+                f'(e.g. {series[bad].iloc[0]!r}); choose another type for it'
+            )
+        if self.kind in ('integer', 'float', 'boolean'):
+            return values.astype(self.pandas_dtype())
+        return values.astype('category') if self.kind == 'category' else values
+
+    def _merged(self, values):
+        """
+        Return a column that holds both the values that fit this one and values, which do not.
+        """
+        other = infer_column(self.name, values, self.fully_sampled)
+        kinds = {self.kind, other.kind}
+        if kinds == {'integer'} and self.minimum is not None:
+            return ColumnSchema(self.name, 'integer', minimum=min(self.minimum, other.minimum),
+                                maximum=max(self.maximum, other.maximum), fully_sampled=self.fully_sampled)
+        if kinds <= {'integer', 'float'}:
+            return ColumnSchema(self.name, 'float', fully_sampled=self.fully_sampled)
+        if kinds <= {'date', 'datetime'}:
+            return ColumnSchema(self.name, 'datetime', fully_sampled=self.fully_sampled)
+        if self.kind in ('category', 'string'):
+            longest = max(len(_text(value)) for value in values)
+            column = ColumnSchema(self.name, self.kind, max_length=max(self.max_length or 0, longest),
+                                  categories=self.categories, fully_sampled=self.fully_sampled)
+            if column.varchar_length() is not None:
+                return column
+        # Anything can be stored as text
+        return ColumnSchema(self.name, 'text', fully_sampled=self.fully_sampled)
+
+    def widen(self, series):
+        """
+        Return a column whose type holds every raw value of series, which is this column if they all fit.
+
+        Only partially sampled columns are widened: integers grow to a larger size or to floats, dates to
+        date and time, short text to longer or long text, and columns holding a mix of types become Long Text.
+        Fully sampled columns are returned unchanged, so convert reports values that do not fit a type the
+        user chose.
+        """
+        if self.fully_sampled:
+            return self
+        _, valid = self._parse(series)
+        bad = series.notna() & ~valid
+        if not bad.any():
+            return self
+        values = series[bad].tolist()
+        column = self._merged(values)
+        target = '' if column.kind == self.kind else f' to {KINDS[column.kind]}'
+        logging.warning(f'Column "{self.name}" has values after the sampled rows that do not fit its type '
+                        f'{KINDS[self.kind]} (e.g. {values[0]!r}), widening it{target}')
+        # The merged type is inferred from the values that did not fit, so check the whole series against it
+        return column.widen(series)
+
+
+def _text(value):
+    """
+    Return a raw sheet value as text, writing whole numbers without the ".0" pandas gives them next to blanks.
+    """
+    if isinstance(value, str) or pd.isna(value):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def infer_column(name, values, fully_sampled=True):
+    """
+    Infer a ColumnSchema from the sampled raw values of one column.
+    """
+    present = [value for value in values if value is not None]
+    if not present:
+        return ColumnSchema(name, 'text', fully_sampled=fully_sampled)
+    if all(isinstance(value, bool) for value in present):
+        return ColumnSchema(name, 'boolean', fully_sampled=fully_sampled)
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        _, largest, _ = INTEGER_SIZES[-1]
+        # Whole numbers beyond the largest integer size, e.g. 6.02e23, are stored as floats
+        if (all(isinstance(value, int) or value.is_integer() for value in present)
+                and largest.min <= min(present) and max(present) <= largest.max):
+            return ColumnSchema(name, 'integer', minimum=int(min(present)), maximum=int(max(present)),
+                                fully_sampled=fully_sampled)
+        single = all(float(np.float32(value)) == value for value in present)
+        return ColumnSchema(name, 'float', single_precision=single, fully_sampled=fully_sampled)
+    if all(isinstance(value, datetime.datetime) for value in present):
+        midnight = all(value.time() == datetime.time() for value in present)
+        return ColumnSchema(name, 'date' if midnight else 'datetime', fully_sampled=fully_sampled)
+    if all(isinstance(value, datetime.date) for value in present):
+        return ColumnSchema(name, 'date', fully_sampled=fully_sampled)
+
+    texts = [value if isinstance(value, str) else str(value) for value in present]
+    max_length = max(len(text) for text in texts)
+    distinct = set(texts)
+    column = ColumnSchema(name, 'string', max_length=max_length, fully_sampled=fully_sampled)
+    if len(distinct) <= CATEGORY_MAX_VALUES and len(distinct) <= len(texts) * CATEGORY_MAX_RATIO:
+        column.kind = 'category'
+        column.categories = sorted(distinct)
+    elif column.varchar_length() is None:
+        column.kind = 'text'
+    return column
+
+
+def infer_schema(columns, rows, fully_sampled=True):
+    """
+    Infer an ordered {name: ColumnSchema} mapping from sampled rows of raw values.
+    """
+    return {name: infer_column(name, [row[i] for row in rows], fully_sampled) for i, name in enumerate(columns)}
+
+
+def widen_schema(schema, df):
+    """
+    Return a copy of schema with its columns widened to hold the raw sheet values of a DataFrame.
+    """
+    return {name: column.widen(df[name]) if name in df.columns else column for name, column in schema.items()}
+
+
+def apply_schema(df, schema):
+    """
+    Cast the columns of a DataFrame of raw sheet values to the dtypes of schema.
+    """
+    for name, column in schema.items():
+        if name in df.columns:
+            df[name] = column.convert(df[name])
+    return df
+
+
+def sql_dtypes(schema):
+    """
+    Return the {name: SQLAlchemy type} mapping the columns of schema are created with.
+    """
+    return {name: column.sql_type() for name, column in schema.items()}
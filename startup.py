@@ -0,0 +1,94 @@
+import importlib
+import logging
+import os
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# Modules imported in the background once the window is shown; between them they load pandas and SQLAlchemy
+PREWARM_MODULES = (
+    'database_operations', 'metadata_cache', 'excel_import', 'incremental_import', 'pipeline', 'schema_dialog',
+    'task_runner', 'table_pager', 'preview_model',
+)
+# Set this environment variable to have the app print its startup milestones and quit once it is ready
+STARTUP_PROBE_ENV_VAR = 'SQLMANAGER_STARTUP_PROBE'
+# Printed before the name of each milestone, e.g. "startup:first_paint"
+STARTUP_PROBE_PREFIX = 'startup:'
+
+
+def probing():
+    """
+    Return True if the app runs under the startup benchmark.
+    """
+    return bool(os.environ.get(STARTUP_PROBE_ENV_VAR))
+
+
+def report_milestone(name):
+    """
+    Print a startup milestone for the startup benchmark if STARTUP_PROBE_ENV_VAR is set.
+    """
+    if probing():
+        print(f'{STARTUP_PROBE_PREFIX}{name}', flush=True)
+
+
+def load_dbapi(dialect, driver=''):
+    """
+    Import the DBAPI module SQLAlchemy uses for a dialect and driver, e.g. pymysql for mysql and pymysql.
+    """
+    from sqlalchemy.dialects import registry
+
+    registry.load(f'{dialect}.{driver}' if driver else dialect).import_dbapi()
+
+
+class Prewarmer(QObject):
+    """
+    Import modules on a background thread, so they are loaded by the time the GUI thread first needs them.
+
+    A GUI-thread import of a module that is still being loaded waits for the background import to finish, so
+    code can import lazily whether or not the prewarm is done. finished is delivered on the GUI thread.
+    """
+    finished = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.drivers = set()  # (dialect, driver) pairs loaded or being loaded
+
+    def start(self, modules=PREWARM_MODULES):
+        """
+        Import modules on a background thread and emit finished when they are all loaded.
+        """
+        threading.Thread(target=self.run, args=(modules,), name='prewarm', daemon=True).start()
+
+    def run(self, modules):
+        """
+        Import modules one by one on the current thread, then emit finished.
+        """
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                # The same error is raised again where the module is used
+                logging.error(f'Error preloading {name}: {e}')
+        self.finished.emit()
+
+    def load_driver(self, dialect, driver=''):
+        """
+        Import the DBAPI module for a dialect and driver on a background thread, once per pair.
+
+        Call this after finished, so SQLAlchemy is not imported by two threads at once.
+        """
+        if (dialect, driver) in self.drivers:
+            return
+        self.drivers.add((dialect, driver))
+        threading.Thread(target=self.run_load_driver, args=(dialect, driver), name='prewarm-driver',
+                         daemon=True).start()
+
+    def run_load_driver(self, dialect, driver):
+        """
+        Import the DBAPI module for a dialect and driver on the current thread, ignoring errors.
+        """
+        try:
+            load_dbapi(dialect, driver)
+        except Exception as e:
+            # The fields may hold a half-typed name; connect_to_database reports a real problem
+            logging.debug(f'Could not preload the {dialect} {driver} driver: {e}')
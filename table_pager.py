@@ -0,0 +1,203 @@
+import datetime
+
+import sqlalchemy as sal
+
+from database_operations import count_rows
+from progress import track
+
+# Rows read per page of a preview
+PAGE_SIZE = 200
+# Row identifiers that a dialect keeps for tables without a primary key
+ROWID_COLUMNS = {'sqlite': 'rowid', 'postgresql': 'ctid'}
+# Every ANCHOR_STRIDE-th row identifier is collected up front, so a jump to any page skips fewer rows than this
+ANCHOR_STRIDE = PAGE_SIZE * 100
+# Longest text shown in a preview cell
+MAX_CELL_LENGTH = 200
+
+
+class TupleId(sal.types.UserDefinedType):
+    """
+    PostgreSQL's tid type, the type of the ctid row identifier, so bound ctids are compared as tids.
+    """
+    cache_ok = True
+
+    def get_col_spec(self, **kw):
+        return 'TID'
+
+
+def row_identifier(conn, table_name):
+    """
+    Return the columns that order and identify the rows of a table, or None if it has none.
+
+    The primary key is used if there is one, then a unique index over non-nullable columns, then the
+    dialect's implicit row identifier from ROWID_COLUMNS, which is returned as a one-element tuple.
+    """
+    inspector = sal.inspect(conn)
+    primary_key = (inspector.get_pk_constraint(table_name) or {}).get('constrained_columns')
+    if primary_key:
+        return list(primary_key)
+    nullable = {col['name']: col['nullable'] for col in inspector.get_columns(table_name)}
+    for index in inspector.get_indexes(table_name):
+        columns = index['column_names']
+        if index['unique'] and all(columns) and not any(nullable.get(col, True) for col in columns):
+            return list(columns)
+    if conn.dialect.name in ROWID_COLUMNS:
+        return (ROWID_COLUMNS[conn.dialect.name],)
+    return None
+
+
+def supports_row_values(dialect):
+    """
+    Return True if the dialect can compare row values, as in (a, b) > (1, 2).
+    """
+    if dialect.name == 'sqlite':
+        # Row values arrived in SQLite 3.15
+        return (dialect.server_version_info or (0,)) >= (3, 15, 0)
+    return dialect.name in ('mysql', 'postgresql')
+
+
+def format_value(value):
+    """
+    Return the text a preview cell shows for a value.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime) and value.time() == datetime.time():
+        value = value.date()
+    if isinstance(value, bytes):
+        return f'<{len(value)} bytes>'
+    text = str(value)
+    return text if len(text) <= MAX_CELL_LENGTH else text[:MAX_CELL_LENGTH - 1] + '…'
+
+
+class KeysetPager:
+    """
+    Read a table page by page with keyset (seek) pagination on its row identifier.
+
+    A page is read with WHERE (key) > (last key of the previous page) ORDER BY key LIMIT n, which is an index
+    range scan however deep into the table the page lies. The key of the row just before a page, its
+    boundary, is learnt from the page before it, found from the nearest known boundary by skipping rows on
+    the key alone, or taken from the sparse anchors collected by read_anchors. Tables without a row
+    identifier fall back to LIMIT/OFFSET, whose cost grows with the offset.
+
+    A pager holds no connection and its state does not change after it is built, so pages can be read on
+    several worker connections at once.
+    """
+
+    def __init__(self, conn, table_name, page_size=PAGE_SIZE):
+        self.table_name = table_name
+        self.page_size = page_size
+        self.table = sal.Table(table_name, sal.MetaData(), autoload_with=conn)
+        self.columns = [col.name for col in self.table.columns]
+        self.key_columns = row_identifier(conn, table_name)
+        self.row_values = supports_row_values(conn.dialect)
+        self.row_count = count_rows(conn, table_name)
+        if self.key_columns is None:
+            self.keys = []
+        elif isinstance(self.key_columns, tuple):
+            self.keys = [sal.literal_column(self.key_columns[0])]
+        else:
+            self.keys = [self.table.c[col] for col in self.key_columns]
+
+    def describe(self):
+        """
+        Return a short description of how the table is paged.
+        """
+        if self.key_columns is None:
+            return 'no row identifier, paged by offset'
+        return f'paged by {", ".join(self.key_columns)}'
+
+    def _bind(self, value):
+        """
+        Return a bound key value, cast to tid for PostgreSQL's ctid.
+        """
+        if self.key_columns == ('ctid',):
+            return sal.cast(sal.literal(value, sal.String()), TupleId())
+        return sal.literal(value)
+
+    def _after(self, key):
+        """
+        Return the condition selecting the rows that come after key in key order.
+        """
+        values = [self._bind(value) for value in key]
+        if len(self.keys) == 1:
+            return self.keys[0] > values[0]
+        if self.row_values:
+            return sal.tuple_(*self.keys) > sal.tuple_(*values)
+        # (a, b) > (x, y) spelt out as a > x OR (a = x AND b > y) for dialects without row values
+        conditions = []
+        for i, column in enumerate(self.keys):
+            equal = [self.keys[j] == values[j] for j in range(i)]
+            conditions.append(sal.and_(*equal, column > values[i]))
+        return sal.or_(*conditions)
+
+    def _key_select(self, *columns, after=None):
+        """
+        Return a SELECT of columns in key order, starting after key after if given.
+        """
+        query = sal.select(*columns).select_from(self.table).order_by(*self.keys)
+        if after is not None:
+            query = query.where(self._after(after))
+        return query
+
+    def seek(self, conn, after, skip):
+        """
+        Return the key of the row skip rows past after (None for the start of the table), reading the key only.
+
+        Returns None if the table has fewer rows.
+        """
+        if skip <= 0:
+            return after
+        query = self._key_select(*self.keys, after=after).limit(1).offset(skip - 1)
+        row = conn.execute(query).first()
+        return tuple(row) if row is not None else None
+
+    def read_pages(self, conn, first_page, count, anchor_page=0, anchor_key=None):
+        """
+        Read count consecutive pages starting at first_page with one query.
+
+        anchor_key is the boundary of anchor_page, the nearest page at or before first_page whose boundary is
+        known. Returns ({page: list of row tuples}, {page: boundary key}) with the boundaries learnt along the
+        way, including that of the page after the last one read. Cell values are formatted with format_value.
+        """
+        pages = {}
+        boundaries = {}
+        limit = count * self.page_size
+        if self.key_columns is None:
+            query = sal.select(self.table).limit(limit).offset(first_page * self.page_size)
+            rows = [tuple(format_value(value) for value in row) for row in conn.execute(query)]
+        else:
+            after = self.seek(conn, anchor_key, (first_page - anchor_page) * self.page_size)
+            if after is None and first_page > 0:
+                return pages, boundaries
+            boundaries[first_page] = after
+            labelled = [key.label(f'_key{i}') for i, key in enumerate(self.keys)]
+            query = self._key_select(*self.table.columns, *labelled, after=after).limit(limit)
+            width = len(self.columns)
+            rows = []
+            for row in conn.execute(query):
+                rows.append(tuple(format_value(value) for value in row[:width]))
+                if len(rows) % self.page_size == 0:
+                    boundaries[first_page + len(rows) // self.page_size] = tuple(row[width:])
+        for start in range(0, len(rows), self.page_size):
+            pages[first_page + start // self.page_size] = rows[start:start + self.page_size]
+        return pages, boundaries
+
+    def read_anchors(self, conn, stride=ANCHOR_STRIDE, progress=None):
+        """
+        Return {page: boundary key} for every stride rows of the table, found by chained seeks on the key.
+
+        stride must be a multiple of the page size. Each seek skips stride rows of the key index, so the whole
+        table is walked once without reading any other column. Returns an empty dictionary for tables paged
+        by offset.
+        """
+        anchors = {}
+        if self.key_columns is None:
+            return anchors
+        key = None
+        rows = 0
+        while (key := self.seek(conn, key, stride)) is not None:
+            rows += stride
+            anchors[rows // self.page_size] = key
+            track(progress, stride)
+        return anchors
@@ -0,0 +1,63 @@
+import contextlib
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from instrumentation import instrument
+from progress import OperationCancelled, ProgressTracker
+
+
+class TaskSignals(QObject):
+    """
+    Signals a DatabaseTask emits back to the GUI thread.
+    """
+    progress = pyqtSignal(str)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+    cancelled = pyqtSignal()
+
+
+class DatabaseTask(QRunnable):
+    """
+    Run a database operation on a QThreadPool worker with its own connection.
+
+    operation is called as operation(conn, progress) where progress is a ProgressTracker; its return value
+    is delivered through the finished signal. The run is instrumented under name, and its OperationMetrics
+    are available as the metrics attribute once any of the outcome signals has been emitted. Small, frequent
+    reads such as preview pages pass instrumented=False to stay out of the metrics log.
+    """
+
+    def __init__(self, engine, operation, name, table_name=None, instrumented=True):
+        super().__init__()
+        self.engine = engine
+        self.operation = operation
+        self.name = name
+        self.table_name = table_name
+        self.instrumented = instrumented
+        self.metrics = None
+        self.signals = TaskSignals()
+        self.cancel_event = threading.Event()
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        """
+        Ask the operation to stop at its next progress checkpoint.
+        """
+        self.cancel_event.set()
+
+    def run(self):
+        """
+        Execute the operation and report the outcome through the task signals.
+        """
+        progress = ProgressTracker(callback=self.signals.progress.emit, cancel_event=self.cancel_event)
+        try:
+            with self.engine.connect() as conn, (instrument(conn, self.name, self.table_name) if self.instrumented
+                                                 else contextlib.nullcontext()) as metrics:
+                self.metrics = metrics
+                result = self.operation(conn, progress)
+        except OperationCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(e)
+        else:
+            self.signals.finished.emit(result)
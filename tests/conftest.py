@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+import sqlalchemy as sal
+
+# The modules live at the top of the repository rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """
+    An engine for an empty SQLite database in a temporary directory.
+    """
+    engine = sal.create_engine(f'sqlite:///{tmp_path / "test.db"}')
+    yield engine
+    engine.dispose()
+
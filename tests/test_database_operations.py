@@ -0,0 +1,41 @@
+from database_operations import _parse_mysql_column_definitions, remove_duplicate_rows
+
+
+def test_parse_mysql_column_definitions():
+    create_table = '\n'.join([
+        'CREATE TABLE `t` (',
+        "  `id` int NOT NULL AUTO_INCREMENT COMMENT 'the row''s id, unique',",
+        '  `we``ird` varchar(20) CHARACTER SET latin1 COLLATE latin1_bin DEFAULT NULL,',
+        '  `updated` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,',
+        '  `total` int GENERATED ALWAYS AS ((`id` * 2)) VIRTUAL,',
+        '  PRIMARY KEY (`id`),',
+        '  KEY `idx` (`updated`)',
+        ') ENGINE=InnoDB DEFAULT CHARSET=utf8mb4',
+    ])
+
+    assert _parse_mysql_column_definitions(create_table) == {
+        'id': "int NOT NULL AUTO_INCREMENT COMMENT 'the row''s id, unique'",
+        'we`ird': 'varchar(20) CHARACTER SET latin1 COLLATE latin1_bin DEFAULT NULL',
+        'updated': 'timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP',
+        'total': 'int GENERATED ALWAYS AS ((`id` * 2)) VIRTUAL',
+    }
+
+
+def test_remove_duplicate_rows(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE t (a INTEGER, b TEXT)')
+        conn.exec_driver_sql("INSERT INTO t VALUES (1, 'x'), (2, 'y'), (1, 'x'), (NULL, 'z'), (NULL, 'z')")
+
+    with engine.connect() as conn:
+        assert remove_duplicate_rows(conn, 't') == 2
+        assert conn.exec_driver_sql('SELECT a, b FROM t ORDER BY rowid').all() == [(1, 'x'), (2, 'y'), (None, 'z')]
+
+
+def test_remove_duplicate_rows_without_rowid(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE t (a INTEGER, b TEXT, PRIMARY KEY (a, b)) WITHOUT ROWID')
+        conn.exec_driver_sql("INSERT INTO t VALUES (1, 'x'), (2, 'y')")
+
+    with engine.connect() as conn:
+        assert remove_duplicate_rows(conn, 't') == 0
+        assert conn.exec_driver_sql('SELECT a, b FROM t ORDER BY a').all() == [(1, 'x'), (2, 'y')]
@@ -0,0 +1,70 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from database_operations import drop_duplicate_frame_rows, rewrite_with_pandas
+from external_dedup import remove_duplicates_out_of_core
+
+
+def sample_frame(rows=3000, seed=0):
+    """
+    Return a DataFrame with many duplicate rows, NULLs and a column of every common type.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'id': rng.integers(0, rows // 4, rows),
+        'label': rng.choice(['a', 'b', 'c', None], rows),
+        'amount': rng.integers(0, 3, rows).astype(float),
+        'day': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 3, rows), 'D'),
+    })
+    df.loc[rng.random(rows) < 0.1, 'amount'] = np.nan
+    return df
+
+
+def read_table(conn, table_name):
+    return pd.read_sql_query(f'SELECT * FROM "{table_name}" ORDER BY rowid', conn)
+
+
+@pytest.mark.parametrize('budget', [64 * 2 ** 10, 2 ** 30], ids=['spilled', 'in-memory'])
+def test_matches_in_memory_dedup(engine, caplog, budget):
+    df = sample_frame()
+    with engine.begin() as conn:
+        df.to_sql('expected', conn, index=False)
+        df.to_sql('actual', conn, index=False)
+
+    with caplog.at_level(logging.INFO), engine.connect() as conn:
+        expected_removed = rewrite_with_pandas(conn, 'expected', drop_duplicate_frame_rows)
+        removed = remove_duplicates_out_of_core(conn, 'actual', budget=budget, workers=2)
+        expected = read_table(conn, 'expected')
+        actual = read_table(conn, 'actual')
+
+    assert ('out of core' in caplog.text) == (budget < 2 ** 20)
+    assert removed == expected_removed > 0
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_applies_transform_and_renames(engine):
+    df = sample_frame(rows=1000, seed=1)
+    with engine.begin() as conn:
+        df.to_sql('t', conn, index=False)
+
+    mapping = {'label': 'Label'}
+    with engine.connect() as conn:
+        removed = remove_duplicates_out_of_core(conn, 't', transform=lambda chunk: chunk.rename(columns=mapping),
+                                                mapping=mapping, budget=16 * 2 ** 10, workers=1)
+        actual = read_table(conn, 't')
+
+    expected = df.rename(columns=mapping).drop_duplicates().reset_index(drop=True)
+    assert removed == len(df) - len(expected)
+    assert list(actual.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(actual[['id', 'Label']], expected[['id', 'Label']])
+
+
+def test_empty_table(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE t (a INTEGER, b TEXT)')
+
+    with engine.connect() as conn:
+        assert remove_duplicates_out_of_core(conn, 't', budget=1) == 0
@@ -0,0 +1,137 @@
+import datetime
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from database_operations import ROW_HASH_COLUMNS
+from excel_import import import_excel_file
+from incremental_import import import_excel_incremental
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """
+    Keep the parse cache of the tests out of the user's home directory.
+    """
+    monkeypatch.setenv('SQLMANAGER_CACHE_DIR', str(tmp_path / 'cache'))
+
+
+def write_workbook(path, rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['id', 'name', 'amount', 'day'])
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return str(path)
+
+
+def sample_rows(count=50):
+    return [[i, f'name {i}', i * 1.5 if i % 4 else None, datetime.datetime(2024, 1, 1 + i % 28)]
+            for i in range(count)]
+
+
+def read_data(conn, table_name):
+    """
+    Read the data columns of a table in id order, without the row hash bookkeeping.
+    """
+    df = pd.read_sql_table(table_name, conn)
+    df = df.drop(columns=[col for col in ROW_HASH_COLUMNS if col in df.columns])
+    return df.sort_values(['id', 'name'], ignore_index=True)
+
+
+def edit(rows):
+    """
+    Change, remove and add a row.
+    """
+    rows = [list(row) for row in rows]
+    rows[3][1] = 'renamed'
+    del rows[10]
+    rows.append([1000, 'new', 2.5, datetime.datetime(2024, 2, 1)])
+    return rows
+
+
+def test_first_import_replaces_then_reimport_changes_nothing(engine, tmp_path):
+    path = write_workbook(tmp_path / 'data.xlsx', sample_rows())
+
+    with engine.connect() as conn:
+        first = import_excel_incremental(conn, path, 't', key_columns=['id'])
+        again = import_excel_incremental(conn, path, 't', key_columns=['id'])
+
+    assert first == {'inserted': 50, 'updated': 0, 'deleted': 0, 'unchanged': 0, 'replaced': True}
+    assert again == {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 50, 'replaced': False}
+
+
+@pytest.mark.parametrize('key_columns, counts', [
+    (['id'], {'inserted': 1, 'updated': 1, 'deleted': 1, 'unchanged': 48}),
+    # Without a key a changed row is a different row
+    (None, {'inserted': 2, 'updated': 0, 'deleted': 2, 'unchanged': 48}),
+])
+def test_diff_matches_full_import(engine, tmp_path, key_columns, counts):
+    rows = sample_rows()
+    original = write_workbook(tmp_path / 'original.xlsx', rows)
+    edited = write_workbook(tmp_path / 'edited.xlsx', edit(rows))
+
+    with engine.connect() as conn:
+        import_excel_incremental(conn, original, 't', key_columns=key_columns)
+        result = import_excel_incremental(conn, edited, 't', key_columns=key_columns)
+        import_excel_file(conn, edited, 'expected')
+        actual = read_data(conn, 't')
+        expected = read_data(conn, 'expected')
+
+    assert result == {**counts, 'replaced': False}
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_repeated_rows_without_key(engine, tmp_path):
+    rows = sample_rows(5)
+    original = write_workbook(tmp_path / 'original.xlsx', rows + [rows[0]])
+    fewer = write_workbook(tmp_path / 'fewer.xlsx', rows)
+
+    with engine.connect() as conn:
+        import_excel_incremental(conn, original, 't')
+        result = import_excel_incremental(conn, fewer, 't')
+        assert len(read_data(conn, 't')) == 5
+
+    assert result == {'inserted': 0, 'updated': 0, 'deleted': 1, 'unchanged': 5, 'replaced': False}
+
+
+def test_duplicate_keys_leave_table_unchanged(engine, tmp_path):
+    rows = sample_rows()
+    original = write_workbook(tmp_path / 'original.xlsx', rows)
+    duplicated = write_workbook(tmp_path / 'duplicated.xlsx', edit(rows) + [rows[0]])
+
+    with engine.connect() as conn:
+        import_excel_incremental(conn, original, 't', key_columns=['id'])
+        before = read_data(conn, 't')
+        with pytest.raises(ValueError, match='not unique'):
+            import_excel_incremental(conn, duplicated, 't', key_columns=['id'])
+        pd.testing.assert_frame_equal(read_data(conn, 't'), before)
+
+
+def test_unknown_key_column(engine, tmp_path):
+    path = write_workbook(tmp_path / 'data.xlsx', sample_rows())
+
+    with engine.connect() as conn, pytest.raises(ValueError, match='not found'):
+        import_excel_incremental(conn, path, 't', key_columns=['missing'])
+
+
+def test_small_chunks_find_duplicates_and_deletions_across_chunks(engine, tmp_path):
+    rows = sample_rows()
+    original = write_workbook(tmp_path / 'original.xlsx', rows)
+    edited = write_workbook(tmp_path / 'edited.xlsx', edit(rows))
+    duplicated = write_workbook(tmp_path / 'duplicated.xlsx', rows + [rows[0]])
+
+    with engine.connect() as conn:
+        import_excel_incremental(conn, original, 't', key_columns=['id'], chunk_size=7)
+        with pytest.raises(ValueError, match='not unique'):
+            import_excel_incremental(conn, duplicated, 't', key_columns=['id'], chunk_size=7)
+        # The seen keys table of the failed import does not get in the way of the next one
+        result = import_excel_incremental(conn, edited, 't', key_columns=['id'], chunk_size=7)
+        import_excel_file(conn, edited, 'expected')
+        actual = read_data(conn, 't')
+        expected = read_data(conn, 'expected')
+
+    assert result == {'inserted': 1, 'updated': 1, 'deleted': 1, 'unchanged': 48, 'replaced': False}
+    pd.testing.assert_frame_equal(actual, expected)
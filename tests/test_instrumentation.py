@@ -0,0 +1,20 @@
+import sqlalchemy as sal
+
+from instrumentation import instrument
+
+
+def test_instrument_measures_memory_of_the_operation(engine):
+    with engine.connect() as conn:
+        with instrument(conn, 'allocate') as metrics:
+            block = bytearray(64 * 2 ** 20)
+            block[::4096] = b'x' * len(block[::4096])
+            conn.execute(sal.text('SELECT 1'))
+        del block
+
+    assert metrics.status == 'ok'
+    assert metrics.statements == 1
+    assert metrics.rss_growth_mb >= 32
+    assert metrics.process_peak_rss_mb is not None
+    record = metrics.to_record()
+    assert record['peak_rss_mb'] == round(metrics.peak_rss_mb, 1)
+    assert '(+' in metrics.summary()
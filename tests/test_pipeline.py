@@ -0,0 +1,90 @@
+import pandas as pd
+import pytest
+
+from database_operations import ROW_HASH_COLUMNS
+from pipeline import compile_plan, execute_plan
+
+TRANSFORMS = ['lowercase_headers', 'replace_spaces', 'drop_na', 'remove_duplicates']
+
+
+def sample_frame():
+    return pd.DataFrame({
+        'Name A': ['x', 'y', 'x', None, 'z', 'y', 'z'],
+        'Val': [1, 2, 1, 3, None, 2, 4],
+    })
+
+
+def read_table(conn, table_name):
+    return pd.read_sql_query(f'SELECT * FROM "{table_name}" ORDER BY rowid', conn)
+
+
+def load(engine, df, primary_key=None):
+    with engine.begin() as conn:
+        if primary_key:
+            conn.exec_driver_sql('CREATE TABLE t ("id" INTEGER, "Name A" TEXT, "Val" INTEGER, PRIMARY KEY ("id"))')
+            df.to_sql('t', conn, index=False, if_exists='append')
+        else:
+            df.to_sql('t', conn, index=False)
+
+
+@pytest.mark.parametrize('strategy', ['sql', 'rebuild'])
+def test_fused_plan_matches_pandas(engine, strategy):
+    df = sample_frame()
+    load(engine, df)
+
+    with engine.connect() as conn:
+        plan = compile_plan(conn, 't', TRANSFORMS)
+        assert plan.strategy == 'sql'
+        plan.strategy = strategy
+        removed = execute_plan(conn, plan)
+        actual = read_table(conn, 't')
+
+    expected = plan.apply_to_dataframe(df).reset_index(drop=True)
+    assert removed == len(df) - len(expected) == 4
+    assert list(actual.columns) == ['name_a', 'val']
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_sqlite_tables_with_a_primary_key_are_rebuilt(engine):
+    df = sample_frame()
+    df.insert(0, 'id', range(len(df)))
+    load(engine, df, primary_key='id')
+
+    with engine.connect() as conn:
+        plan = compile_plan(conn, 't', TRANSFORMS)
+        assert plan.strategy == 'rebuild'
+        assert 'SELECT DISTINCT' in plan.describe()
+        # Every row has its own id, so only the rows with NULLs go
+        assert execute_plan(conn, plan) == 2
+        assert conn.exec_driver_sql('SELECT id FROM t ORDER BY id').scalars().all() == [0, 1, 2, 5, 6]
+
+
+def test_rebuild_groups_rows_that_differ_in_bookkeeping_columns(engine):
+    df = sample_frame().dropna()
+    df[ROW_HASH_COLUMNS[0]] = [f'k{i}' for i in range(len(df))]
+    df[ROW_HASH_COLUMNS[1]] = [f'h{i}' for i in range(len(df))]
+    load(engine, df)
+
+    with engine.connect() as conn:
+        plan = compile_plan(conn, 't', ['remove_duplicates'])
+        plan.strategy = 'rebuild'
+        assert 'SELECT ... GROUP BY' in plan.describe()
+        assert execute_plan(conn, plan) == 2
+        actual = pd.read_sql_query(f'SELECT * FROM t ORDER BY "{ROW_HASH_COLUMNS[0]}"', conn)
+
+    assert actual[ROW_HASH_COLUMNS[0]].tolist() == ['k0', 'k1', 'k4']
+    assert actual[ROW_HASH_COLUMNS[1]].tolist() == ['h0', 'h1', 'h4']
+
+
+def test_plan_description(engine):
+    load(engine, sample_frame())
+
+    with engine.connect() as conn:
+        plan = compile_plan(conn, 't', TRANSFORMS)
+        noop = compile_plan(conn, 't', [])
+
+    assert plan.steps() == [
+        'Rename 2 columns in one metadata change: "Name A" -> "name_a", "Val" -> "val"',
+        'Delete rows with NULLs and duplicate rows with one DELETE statement',
+    ]
+    assert noop.strategy == 'noop'
@@ -0,0 +1,40 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from row_hashing import hash_rows, row_hashes
+
+
+def test_hashes_ignore_dtype_and_column_order():
+    df = pd.DataFrame({'a': pd.array([1, 2, None], dtype='Int16'), 'b': ['x', 'y', None]})
+    widened = pd.DataFrame({'b': ['x', 'y', None], 'a': pd.array([1, 2, None], dtype='Int32')})
+    as_float = pd.DataFrame({'a': [1.0, 2.0, np.nan], 'b': pd.array(['x', 'y', None], dtype='string')})
+
+    expected = hash_rows(df, ['a', 'b'])
+    np.testing.assert_array_equal(hash_rows(widened, ['b', 'a']), expected)
+    np.testing.assert_array_equal(hash_rows(as_float, ['a', 'b']), expected)
+
+
+def test_values_pandas_treats_as_duplicates_hash_alike():
+    df = pd.DataFrame({'a': [1, 1.0, True, 2.5], 'b': [datetime.datetime(2024, 1, 1)] * 2 + [None, 'x']}, dtype=object)
+    df.loc[2, 'b'] = datetime.datetime(2024, 1, 1)
+
+    hashes = hash_rows(df, ['a', 'b'])
+    assert df.duplicated().tolist() == [False, True, True, False]
+    assert hashes[0] == hashes[1] == hashes[2] != hashes[3]
+
+
+def test_missing_values_differ_from_text():
+    df = pd.DataFrame({'a': [None, '', 'None', '\x01']}, dtype=object)
+
+    assert len(set(hash_rows(df, ['a']))) == 4
+
+
+def test_only_listed_columns_are_hashed():
+    df = pd.DataFrame({'key': [1, 1, 2], 'value': ['x', 'y', 'x']})
+
+    hashes = row_hashes(df, ['key'])
+    assert hashes[0] == hashes[1] != hashes[2]
+    assert all(len(value) == 16 for value in hashes)
+    assert not hash_rows(df, []).any()
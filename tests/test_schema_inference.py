@@ -0,0 +1,66 @@
+import datetime
+
+import pandas as pd
+import pytest
+import sqlalchemy as sal
+from openpyxl import Workbook
+
+from excel_import import import_excel_file, infer_excel_schema
+from schema_inference import ColumnSchema, infer_column
+
+
+def test_single_precision_needs_a_full_sample():
+    assert infer_column('x', [0.5, 1.25]).pandas_dtype() == 'float32'
+    partial = infer_column('x', [0.5, 1.25], fully_sampled=False)
+    assert partial.pandas_dtype() == 'float64'
+    assert isinstance(partial.sql_type(), sal.Double)
+
+
+def test_whole_numbers_beyond_int64_are_floats():
+    column = infer_column('x', [1, 6.02e23])
+    assert column.kind == 'float'
+    assert ColumnSchema('x', 'integer', minimum=0, maximum=2 ** 70).pandas_dtype() == 'Int64'
+
+
+@pytest.mark.parametrize('column, values, kind', [
+    (ColumnSchema('x', 'integer', minimum=0, maximum=100, fully_sampled=False), [5, 10 ** 6], 'integer'),
+    (ColumnSchema('x', 'integer', minimum=0, maximum=100, fully_sampled=False), [5, 0.5], 'float'),
+    (ColumnSchema('x', 'integer', minimum=0, maximum=100, fully_sampled=False), [5, 'n/a'], 'text'),
+    (ColumnSchema('x', 'date', fully_sampled=False), [datetime.datetime(2024, 1, 1, 12)], 'datetime'),
+    (ColumnSchema('x', 'string', max_length=5, fully_sampled=False), ['abc', 'x' * 50], 'string'),
+    (ColumnSchema('x', 'string', max_length=5, fully_sampled=False), ['abc', 'x' * 500], 'text'),
+])
+def test_widen(column, values, kind):
+    series = pd.Series(values, dtype=object)
+    widened = column.widen(series)
+    assert widened.kind == kind
+    widened.convert(series)
+
+
+def test_fully_sampled_columns_are_not_widened():
+    column = ColumnSchema('x', 'integer', minimum=0, maximum=100)
+    series = pd.Series([5, 'n/a'], dtype=object)
+    assert column.widen(series) is column
+    with pytest.raises(ValueError, match='do not fit'):
+        column.convert(series)
+
+
+def test_import_widens_columns_past_the_sample(engine, tmp_path, monkeypatch):
+    monkeypatch.setenv('SQLMANAGER_CACHE_DIR', str(tmp_path / 'cache'))
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['small', 'code'])
+    for i in range(30):
+        sheet.append([i, i])
+    sheet.append([10 ** 6, 'n/a'])
+    path = str(tmp_path / 'data.xlsx')
+    workbook.save(path)
+
+    schema = infer_excel_schema(path, sample_rows=10)
+    assert [column.kind for column in schema.values()] == ['integer', 'integer']
+    with engine.connect() as conn:
+        for use_cache in (True, True, False):
+            assert import_excel_file(conn, path, 't', schema=schema, use_cache=use_cache) == 31
+            df = pd.read_sql_table('t', conn)
+            assert df['small'].iloc[-1] == 10 ** 6
+            assert df['code'].tolist() == [str(i) for i in range(30)] + ['n/a']
@@ -0,0 +1,80 @@
+import datetime
+
+import pytest
+
+from table_pager import KeysetPager, format_value, row_identifier
+
+
+@pytest.fixture
+def conn(engine):
+    """
+    A connection to a database with a rowid table and a composite-key WITHOUT ROWID table of 1,000 rows each.
+    """
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE plain (name TEXT, value INTEGER)')
+        conn.exec_driver_sql('CREATE TABLE keyed (a INTEGER, b TEXT, value INTEGER, PRIMARY KEY (a, b)) WITHOUT ROWID')
+        # Insert out of key order, so only the pager's ORDER BY puts the rows in order
+        for i in reversed(range(1000)):
+            conn.exec_driver_sql('INSERT INTO plain VALUES (?, ?)', (f'row {i}', i))
+            conn.exec_driver_sql('INSERT INTO keyed VALUES (?, ?, ?)', (i // 7, f'{i % 7}', i))
+    with engine.connect() as conn:
+        yield conn
+
+
+def expected_pages(conn, table_name, order_by, page_size):
+    rows = [tuple(format_value(value) for value in row)
+            for row in conn.exec_driver_sql(f'SELECT * FROM {table_name} ORDER BY {order_by}')]
+    return {page: rows[start:start + page_size] for page, start in enumerate(range(0, len(rows), page_size))}
+
+
+def test_row_identifier(conn):
+    assert row_identifier(conn, 'plain') == ('rowid',)
+    assert row_identifier(conn, 'keyed') == ['a', 'b']
+
+
+@pytest.mark.parametrize('table_name, order_by', [('plain', 'rowid'), ('keyed', 'a, b')])
+@pytest.mark.parametrize('row_values', [True, False], ids=['row-values', 'expanded'])
+def test_pages_follow_key_order(conn, table_name, order_by, row_values):
+    pager = KeysetPager(conn, table_name, page_size=30)
+    pager.row_values = row_values
+    expected = expected_pages(conn, table_name, order_by, 30)
+    assert pager.row_count == 1000
+
+    # Read the table front to back, each batch starting from the boundary the previous one learnt
+    pages = {}
+    boundaries = {0: None}
+    page = 0
+    while page in boundaries:
+        batch, learnt = pager.read_pages(conn, page, 3, page, boundaries[page])
+        if not batch:
+            break
+        pages.update(batch)
+        boundaries.update(learnt)
+        page += 3
+    assert pages == expected
+
+
+@pytest.mark.parametrize('table_name, order_by', [('plain', 'rowid'), ('keyed', 'a, b')])
+def test_jumps_from_anchors(conn, table_name, order_by):
+    pager = KeysetPager(conn, table_name, page_size=20)
+    expected = expected_pages(conn, table_name, order_by, 20)
+
+    anchors = pager.read_anchors(conn, stride=100)
+    assert sorted(anchors) == [5, 10, 15, 20, 25, 30, 35, 40, 45, 50]
+    for page in (0, 7, 33, 49):
+        anchor_page = max((known for known in anchors if known <= page), default=0)
+        batch, _ = pager.read_pages(conn, page, 1, anchor_page, anchors.get(anchor_page))
+        assert batch == {page: expected[page]}
+
+    # The last anchor is the boundary after the last row
+    pages, _ = pager.read_pages(conn, 50, 1, 50, anchors[50])
+    assert pages == {}
+
+
+def test_format_value():
+    assert format_value(None) == ''
+    assert format_value(datetime.datetime(2024, 5, 1)) == '2024-05-01'
+    assert format_value(datetime.datetime(2024, 5, 1, 12, 30)) == '2024-05-01 12:30:00'
+    assert format_value(b'\x00\x01') == '<2 bytes>'
+    long = format_value('x' * 500)
+    assert len(long) == 200 and long.endswith('…')
@@ -0,0 +1,98 @@
+import threading
+
+import pandas as pd
+import pytest
+import sqlalchemy as sal
+
+from database_operations import write_table
+from progress import OperationCancelled, ProgressTracker
+
+
+@pytest.fixture
+def conn(engine):
+    """
+    A connection to a database with a table t that has a primary key, an index and a unique index.
+    """
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE t (id INTEGER NOT NULL, name TEXT, code TEXT, PRIMARY KEY (id))')
+        conn.exec_driver_sql('CREATE INDEX t_name ON t (name)')
+        conn.exec_driver_sql('CREATE UNIQUE INDEX t_code ON t (code)')
+        conn.exec_driver_sql("INSERT INTO t VALUES (1, 'old', 'a'), (2, 'old', 'b')")
+    with engine.connect() as conn:
+        yield conn
+
+
+def new_rows(start, count):
+    return pd.DataFrame({'id': range(start, start + count), 'name': 'new', 'code': [f'c{i}' for i in range(start, start + count)]})
+
+
+def rows(conn):
+    return conn.exec_driver_sql('SELECT id, name, code FROM t ORDER BY id').all()
+
+
+def test_swap_keeps_keys_and_indexes(conn):
+    assert write_table(conn, 't', [new_rows(0, 3), new_rows(3, 2)]) == 5
+
+    inspector = sal.inspect(conn)
+    assert inspector.get_table_names() == ['t']
+    assert inspector.get_pk_constraint('t')['constrained_columns'] == ['id']
+    indexes = {index['name']: (index['column_names'], bool(index['unique'])) for index in inspector.get_indexes('t')}
+    assert indexes == {'t_name': (['name'], False), 't_code': (['code'], True)}
+    assert rows(conn) == [(i, 'new', f'c{i}') for i in range(5)]
+
+
+def test_write_creates_missing_table(conn):
+    assert write_table(conn, 'fresh', [new_rows(0, 2)]) == 2
+
+    assert sorted(sal.inspect(conn).get_table_names()) == ['fresh', 't']
+    assert conn.exec_driver_sql('SELECT COUNT(*) FROM fresh').scalar() == 2
+
+
+def failing_chunks():
+    yield new_rows(0, 3)
+    raise RuntimeError('parse failed')
+
+
+def test_failed_write_leaves_table_intact(conn):
+    with pytest.raises(RuntimeError, match='parse failed'):
+        write_table(conn, 't', failing_chunks())
+
+    assert sal.inspect(conn).get_table_names() == ['t']
+    assert rows(conn) == [(1, 'old', 'a'), (2, 'old', 'b')]
+
+
+def test_constraint_violation_leaves_table_intact(conn):
+    duplicated = pd.concat([new_rows(0, 2), new_rows(0, 1)])
+
+    with pytest.raises(sal.exc.IntegrityError):
+        write_table(conn, 't', [duplicated])
+
+    assert sal.inspect(conn).get_table_names() == ['t']
+    assert rows(conn) == [(1, 'old', 'a'), (2, 'old', 'b')]
+
+
+def test_cancelled_write_leaves_table_intact(conn):
+    cancel = threading.Event()
+    progress = ProgressTracker(cancel_event=cancel)
+
+    def chunks():
+        yield new_rows(0, 3)
+        cancel.set()
+        yield new_rows(3, 3)
+
+    with pytest.raises(OperationCancelled):
+        write_table(conn, 't', chunks(), progress=progress)
+
+    assert sal.inspect(conn).get_table_names() == ['t']
+    assert rows(conn) == [(1, 'old', 'a'), (2, 'old', 'b')]
+
+
+def test_failed_index_build_restores_original_indexes(conn):
+    clashing = new_rows(0, 3).assign(code='same')
+
+    with pytest.raises(sal.exc.IntegrityError):
+        write_table(conn, 't', [clashing])
+
+    assert sal.inspect(conn).get_table_names() == ['t']
+    assert sorted(index['name'] for index in sal.inspect(conn).get_indexes('t')) == ['t_code', 't_name']
+    assert rows(conn) == [(1, 'old', 'a'), (2, 'old', 'b')]